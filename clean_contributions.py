@@ -3,26 +3,40 @@ import re
 import numpy as np
 from pathlib import Path
 
+from od_lib.helper_functions import classify
+from od_lib.helper_functions.build_cache import ProgressJournal, write_pickle
+from od_lib.helper_functions.clean_text import remove_names
+from od_lib.helper_functions.instrumentation import StageReport, count_input, count_output
+from od_lib.helper_functions.person_names import split_names
+
 def clean_name_headers(text, names, remove_all=False):
-    """Remove speaker names from text"""
+    """Remove speaker names from text, with remove_all the names are those of
+    header_names"""
     if not isinstance(text, str):
         return text
 
-    # Simple implementation to remove names from text
+    if remove_all:
+        # One scan over the text with a trie of the names
+        return remove_names(text, names)
+
     for name in names:
         if not name or len(str(name)) <= 3:  # Skip very short names to avoid false positives
             continue
 
+        # Replace only at beginning or end of lines
         name_str = str(name).strip()
-        if remove_all:
-            text = text.replace(name_str, "")
-        else:
-            # Replace only at beginning or end of lines
-            text = re.sub(r'(^|\n)' + re.escape(name_str) + r'($|\n)', r'\1\2', text)
-            text = re.sub(r'(^|\n)' + re.escape(name_str) + r':', r'\1:', text)
+        text = re.sub(r'(^|\n)' + re.escape(name_str) + r'($|\n)', r'\1\2', text)
+        text = re.sub(r'(^|\n)' + re.escape(name_str) + r':', r'\1:', text)
 
     return text
 
+def header_names(names):
+    """The stripped names to remove, skips very short names to avoid false
+    positives."""
+    return tuple(
+        str(name).strip() for name in np.unique(names) if name and len(str(name)) > 3
+    )
+
 def main():
     # Use a simpler, relative path structure
     ROOT_DIR = Path.cwd()  # Current working directory
@@ -57,44 +71,17 @@ def main():
 
     print("Cleaning contributions data...")
 
-    # Define faction patterns for matching
-    faction_patterns = {
-        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?",
-        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",
-        "BP": r"^\[?BP\]?",
-        "DA": r"^\[?DA\]?",
-        "DP": r"^\[?DP\]?",
-        "DIE LINKE.": r"DIE ?LINKE|LINKEN|\[DIE ?LINKE.\]",
-        "DPB": r"^\[?DPB\]?",
-        "DRP": r"\[?DRP(\-Hosp\.)?\]?|^\[?SRP\]?|^\[?DBP\]?",
-        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
-        "Fraktionslos": r"(?:fraktionslos|Parteilos)",
-        "FU": r"^\[?FU\]?",
-        "FVP": r"^\[?FVP\]?",
-        "Gast": r"\[?Gast\]?",
-        "GB/BHE": r"\[?(?:GB[/-]\s*)?BHE(?:-DG)?\]?",
-        "KPD": r"^\[?KPD\]?",
-        "NR": r"^\[?NR\]?$",
-        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
-        "SSW": r"^\[?SSW\]?",
-        "SRP": r"^\[?SRP\]?",
-        "WAV": r"^\[?WAV\]?",
-        "Z": r"^\[?Z\]?$",
-        "AfD": r"^\[?AfD\]?$",
-        "DBP": r"^\[?DBP\]?$",
-    }
-
-    # Function to match faction abbreviation
-    def get_faction_abbrev(faction, patterns):
-        for faction_abbrev, faction_pattern in patterns.items():
-            if re.search(faction_pattern, faction, re.IGNORECASE):
-                return faction_abbrev
-        return None
+    # Define the faction classifier for matching, ignoring the case
+    faction_classifier = classify.classifier("contributions", ignore_case=True)
 
     # Process each electoral term folder
     term_count = 0
     processed_term_count = 0
+    report = StageReport("clean_contributions")
+
+    # Files cleaned before an interruption are taken from the journal.
+    journal = ProgressJournal(CONTRIBUTIONS_EXTENDED_STAGE_02, code=[__file__])
+    failed = False
 
     for folder_path in sorted(CONTRIBUTIONS_EXTENDED_STAGE_01.glob("electoral_term_*")):
         if not folder_path.is_dir():
@@ -119,19 +106,29 @@ def main():
 
         # Process each contributions file in this term
         for contrib_file in folder_path.glob("*.pkl"):
+            output_file = term_output_dir / contrib_file.name
+            unit = f"{folder_path.name}/{contrib_file.name}"
+            key = journal.key(contrib_file, factions_path)
+            if journal.is_done(unit, key) and output_file.exists():
+                processed_count += 1
+                continue
+
+            report.start(contrib_file.stem)
             try:
                 # Read the contributions data
                 contributions_data = pd.read_pickle(contrib_file)
+                count_input(contrib_file)
 
                 # Check if we have valid data
                 if contributions_data is None or len(contributions_data) == 0:
                     print(f"  Warning: Empty data in {contrib_file.name}")
                     # Save an empty DataFrame
-                    pd.DataFrame(columns=[
+                    write_pickle(pd.DataFrame(columns=[
                         "id", "type", "name_raw", "faction", "constituency",
                         "content", "text_position", "faction_id", "last_name",
                         "first_name", "acad_title"
-                    ]).to_pickle(term_output_dir / contrib_file.name)
+                    ]), output_file)
+                    journal.complete(unit, key)
                     processed_count += 1
                     continue
 
@@ -161,7 +158,7 @@ def main():
                 if "name_raw" in contributions_extended.columns:
                     names = contributions_extended["name_raw"].tolist()
                     contributions_extended["content"] = contributions_extended["content"].apply(
-                        clean_name_headers, args=(np.unique(names), True)
+                        clean_name_headers, args=(header_names(names), True)
                     )
 
                     # Clean name_raw column
@@ -175,95 +172,28 @@ def main():
                         r"  +", " ", regex=True
                     )
 
-                    # Define academic titles for extraction
-                    titles = [
-                        "Dr",
-                        "Frau",
-                        "D",
-                        "-Ing",
-                        "von",
-                        "und",
-                        "zu",
-                        "van",
-                        "de",
-                        "Baron",
-                        "Freiherr",
-                        "Prinz",
-                        "h",
-                        "c",
-                    ]
-
-                    # Create lists to hold processed data
-                    first_names = []
-                    last_names = []
-                    acad_titles = []
-
-                    # Process each row
-                    for idx, row in contributions_extended.iterrows():
-                        name_raw = str(row["name_raw"]).strip()
-                        if not name_raw or name_raw == "":
-                            first_names.append([])
-                            last_names.append("")
-                            acad_titles.append([])
-                            continue
-
-                        # Split name into parts
-                        name_parts = name_raw.split()
-
-                        # Extract academic titles
-                        row_acad_titles = [part for part in name_parts if part in titles]
-                        acad_titles.append(row_acad_titles)
-
-                        # Remove titles from name parts
-                        name_parts = [part for part in name_parts if part not in titles]
-
-                        # Extract first and last names
-                        if len(name_parts) == 1:
-                            first_names.append([])
-                            last_names.append(name_parts[0])
-                        elif len(name_parts) >= 2:
-                            first_names.append(name_parts[:-1])
-                            last_names.append(name_parts[-1])
-                        else:
-                            first_names.append([])
-                            last_names.append("")
-
-                    # Assign the processed data back to the DataFrame
-                    contributions_extended["first_name"] = first_names
-                    contributions_extended["last_name"] = last_names
-                    contributions_extended["acad_title"] = acad_titles
+                    # Split names into academic titles, first names and last name
+                    split = split_names(contributions_extended["name_raw"])
+                    contributions_extended["first_name"] = split["first_name"]
+                    contributions_extended["last_name"] = split["last_name"]
+                    contributions_extended["acad_title"] = split["acad_title"]
 
                 # Process faction information
                 if "faction" in contributions_extended.columns:
-                    faction_ids = []
-                    factions_updated = []
-
-                    for faction in contributions_extended["faction"]:
-                        faction_str = str(faction)
-                        faction_id = -1
-                        faction_updated = faction_str
-
-                        if faction_str and faction_str != "":
-                            faction_abbrev = get_faction_abbrev(faction_str, faction_patterns)
-
-                            if faction_abbrev:
-                                faction_updated = faction_abbrev
-                                try:
-                                    matching_factions = factions.loc[factions["abbreviation"] == faction_abbrev, "id"]
-                                    if not matching_factions.empty:
-                                        faction_id = int(matching_factions.iloc[0])
-                                except Exception as e:
-                                    print(f"    Warning: Error matching faction '{faction_abbrev}': {e}")
-
-                        faction_ids.append(faction_id)
-                        factions_updated.append(faction_updated)
+                    # Each distinct faction is classified once
+                    faction_strs = contributions_extended["faction"].astype(str)
+                    faction_abbrevs = faction_classifier.factions_of(faction_strs)
 
                     # Assign the processed data back to the DataFrame
-                    contributions_extended["faction_id"] = faction_ids
-                    contributions_extended["faction"] = factions_updated
+                    contributions_extended["faction_id"] = classify.faction_ids(faction_abbrevs, factions)
+                    contributions_extended["faction"] = faction_abbrevs.where(
+                        faction_abbrevs.notna(), faction_strs
+                    )
 
                 # Save the processed contributions
-                contributions_extended.to_pickle(term_output_dir / contrib_file.name)
+                write_pickle(contributions_extended, output_file)
+                count_output(output_file, len(contributions_extended))
+                journal.complete(unit, key)
 
                 processed_count += 1
                 if processed_count % 10 == 0 or processed_count == file_count:
@@ -273,11 +203,15 @@ def main():
                 print(f"  Error processing {contrib_file.name}: {e}")
                 import traceback
                 traceback.print_exc()
+                failed = True
 
         if processed_count > 0:
             processed_term_count += 1
         print(f"Completed term {term_number}: {processed_count} files processed")
 
+    if not failed:
+        journal.finish()
+    report.save()
     print(f"Cleaned contributions for {processed_term_count} of {term_count} electoral terms")
     return True
 
@@ -1,21 +1,30 @@
 import pandas as pd
-import regex as re
 import numpy as np
 from pathlib import Path
 import sys
 import os
 
+from od_lib.helper_functions import classify
+from od_lib.helper_functions.build_cache import ProgressJournal, write_pickle
+from od_lib.helper_functions.clean_text import remove_names
+from od_lib.helper_functions.instrumentation import StageReport, count_input, count_output
+from od_lib.helper_functions.person_names import TITLES as NAME_TITLES, split_names
+
+# Academic titles for extraction, the speeches also have "Prof"
+TITLES = NAME_TITLES + ["Prof"]
+
+def header_names(names):
+    """The names to remove from the speeches, only names longer than 3 chars
+    to avoid false positives."""
+    return tuple(name for name in np.unique(names) if len(name) > 3)
+
 def clean_name_headers(text, names):
     """Remove speaker names from header/footer of text"""
     if not isinstance(text, str):
         return text
 
-    # Simple implementation to remove names from text
-    for name in names:
-        if len(name) > 3:  # Only remove names longer than 3 chars to avoid false positives
-            text = text.replace(name, "")
-
-    return text
+    # One scan over the text with a trie of the names, built once per name set
+    return remove_names(text, names)
 
 def main():
     # Use a simpler, relative path structure
@@ -47,105 +56,36 @@ def main():
     else:
         factions = pd.read_pickle(factions_path)
 
-    # Define faction patterns
-    faction_patterns = {
-        "Bündnis 90/DIE GRÜNEN": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/DIE GRÜNEN|DIE GRÜNEN|GRÜNEN",
-        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)? | CDU/CSU?|CSU|CDU",
-        "BP": r"^BP",
-        "DA": r"^DA",
-        "DP": r"^DP",
-        "DIE LINKE.": r"DIE LINKE|LINKE|Die Linke|Linke",
-        "DPB": r"(?:^DPB)",
-        "DRP": r"DRP(\-Hosp\.)?|SRP",
-        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?|FDP",
-        "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
-        "FU": r"^FU",
-        "FVP": r"^FVP",
-        "Gast": r"Gast",
-        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
-        "KPD": r"^KPD",
-        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?|SPD",
-        "SSW": r"^SSW",
-        "SRP": r"^SRP",
-        "WAV": r"^WAV",
-        "Z": r"^Z$",
-        "DBP": r"^DBP$",
-        "NR": r"^NR$",
-        "AfD": r"AfD|Alternative für Deutschland",
-        "BSW": r"BSW|Bündnis Sahra Wagenknecht",
-    }
-
-    def get_faction_abbrev(faction, patterns):
-        """matches the given faction and returns an id"""
-        if not faction or not isinstance(faction, str):
-            return None
-
-        # First try exact matches
-        for faction_abbrev in patterns.keys():
-            if faction_abbrev.lower() == faction.lower():
-                return faction_abbrev
-
-        # Then try pattern matching
-        for faction_abbrev, faction_pattern in patterns.items():
-            if re.search(faction_pattern, faction, re.IGNORECASE):
-                return faction_abbrev
-        return None
-
-    def get_position_short_and_long(position):
-        """matches the given position and returns the long and short version"""
-        if position in faction_patterns.keys() or re.match(
-            r"^[Bb]erichterstatter(in)?(\s|$|,|.)", position
-        ):
-            return (
-                "Member of Parliament",
-                None if position in faction_patterns.keys() else position,
-            )
-        elif (
-            re.match(r"^[Bb]undestagspräsident(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Aa]lterspräsident(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Vv]izebundestagspräsident(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Ss]chriftführer(in)?(\s|$|,|.)", position)
-            or position.lower()
-            in [
-                "präsidentin",
-                "präsident",
-                "präsident des deutschen bundestages",
-                "präsidentin des deutschen bundestages",
-                "vizepräsidentin",
-                "vizepräsident",
-            ]
-        ):
-            return "Presidium of Parliament", position
-        elif (
-            re.match(r"^[Bb]undespräsident(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Ss]taatsminister(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Ss]enator(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Pp]räsident(in)?(\s|$|,|.)", position)
-            or re.match(r"^[Gg]ast", position)
-        ):
-            return "Guest", position
-        elif re.match(r"^[Bb]undeskanzler(in)?(\s|$|,|.)", position):
-            return "Chancellor", None
-        elif re.match(r"^(Bundes)?[Mm]inister(in)?(\s|$|,|.)", position):
-            return "Minister", position
-        elif re.match(r"^([Pp]arl\s*\.\s+)?[Ss]taatssekretär(in)?(\s|$|,|.)", position):
-            return "Secretary of State", position
-        else:
-            return "Not found", None
+    # Define the faction classifier, matched ignoring the case. A position_raw
+    # equal to a faction abbreviation is that faction before any pattern is tried.
+    faction_classifier = classify.classifier("speeches_extended", ignore_case=True, exact=True)
 
     # Check if folder contains session files or all_raw_speeches.pkl
+    report = StageReport("clean_speeches")
+    # Batches and sessions cleaned before an interruption are skipped while
+    # their input and the factions are unchanged.
+    journal = ProgressJournal(SPEECH_CONTENT_OUTPUT, code=[__file__])
+    failed = False
     if (SPEECH_CONTENT_INPUT / "all_raw_speeches.pkl").exists():
         # Process the combined speeches file
         print("Found all_raw_speeches.pkl - processing combined file...")
 
         speech_content = pd.read_pickle(SPEECH_CONTENT_INPUT / "all_raw_speeches.pkl")
+        count_input(SPEECH_CONTENT_INPUT / "all_raw_speeches.pkl")
 
         # Process in batches to avoid memory issues
         batch_size = 1000
         num_batches = (len(speech_content) + batch_size - 1) // batch_size
 
+        key = journal.key(SPEECH_CONTENT_INPUT / "all_raw_speeches.pkl", factions_path)
+
         for batch_idx in range(num_batches):
+            batch_name = f"speeches_batch_{batch_idx+1:03d}"
+            output_file = SPEECH_CONTENT_OUTPUT / f"{batch_name}.pkl"
+            if journal.is_done(batch_name, key) and output_file.exists():
+                continue
+
+            report.start(batch_name)
             start_idx = batch_idx * batch_size
             end_idx = min((batch_idx + 1) * batch_size, len(speech_content))
 
@@ -177,7 +117,7 @@ def main():
             # Clean speaker names from text
             names = batch["name_raw"].to_list()
             batch["speech_content"] = batch["speech_content"].apply(
-                clean_name_headers, args=(np.unique(names),)
+                clean_name_headers, args=(header_names(names),)
             )
 
             # Clean name_raw column
@@ -190,74 +130,26 @@ def main():
                 r"  +", " ", regex=True
             ).str.strip()
 
-            # Define academic titles for extraction
-            titles = [
-                "Dr",
-                "Frau",
-                "D",
-                "-Ing",
-                "von",
-                "und",
-                "zu",
-                "van",
-                "de",
-                "Baron",
-                "Freiherr",
-                "Prinz",
-                "h",
-                "c",
-                "Prof"
-            ]
-
-            # Split names and extract components
-            first_last_titles = batch["name_raw"].apply(str.split)
-
-            # Extract academic titles
-            batch["acad_title"] = [
-                " ".join([acad_title for acad_title in title_list if acad_title in titles])
-                for title_list in first_last_titles
-            ]
-
-            # Remove titles from names
-            for index, title_list in first_last_titles.items():
-                first_last_titles.at[index] = [name for name in title_list if name not in titles]
-
-            # Extract first and last names
-            for index, first_last in first_last_titles.items():
-                if len(first_last) == 1:
-                    batch.at[index, "first_name"] = ""
-                    batch.at[index, "last_name"] = first_last[0] if first_last else ""
-                elif len(first_last) >= 2:
-                    batch.at[index, "first_name"] = " ".join(first_last[:-1])
-                    batch.at[index, "last_name"] = first_last[-1]
-                else:
-                    batch.at[index, "first_name"] = ""
-                    batch.at[index, "last_name"] = ""
+            # Split names into academic titles, first names and last name
+            split = split_names(batch["name_raw"], titles=TITLES)
+            batch["acad_title"] = split["acad_title"].str.join(" ")
+            batch["first_name"] = split["first_name"].str.join(" ")
+            batch["last_name"] = split["last_name"]
 
             # Determine faction and position information
-            for index, position_raw in batch["position_raw"].items():
-                faction_abbrev = get_faction_abbrev(str(position_raw), faction_patterns)
-                (
-                    batch.at[index, "position_short"],
-                    batch.at[index, "position_long"],
-                ) = get_position_short_and_long(
-                    faction_abbrev if faction_abbrev else re.sub("\n+", " ", position_raw)
-                )
-
-                if faction_abbrev:
-                    matching_factions = factions.loc[factions["abbreviation"] == faction_abbrev, "id"]
-                    if not matching_factions.empty:
-                        batch.at[index, "faction_id"] = int(matching_factions.iloc[0])
+            speakers = faction_classifier.speakers_of(batch["position_raw"])
+            batch["position_short"] = speakers["position_short"]
+            batch["position_long"] = speakers["position_long"]
+            batch["faction_id"] = classify.faction_ids(speakers["faction"], factions)
 
             # Make sure position_long is a string, not None
             batch["position_long"] = batch["position_long"].fillna("")
 
-            # Save batch to pickle file
-            output_file = SPEECH_CONTENT_OUTPUT / f"speeches_batch_{batch_idx+1:03d}.pkl"
-
             # Remove original raw columns before saving
             batch = batch.drop(columns=["position_raw", "name_raw", "pattern_type", "speaker_name", "party", "speech_text"])
-            batch.to_pickle(output_file)
+            write_pickle(batch, output_file)
+            count_output(output_file, len(batch))
+            journal.complete(batch_name, key)
 
             print(f"  + Saved batch {batch_idx+1} with {len(batch)} speeches")
 
@@ -269,13 +161,21 @@ def main():
         session_files = list(SPEECH_CONTENT_INPUT.glob("*.pkl"))
 
         for i, speech_content_file in enumerate(session_files):
+            output_file = SPEECH_CONTENT_OUTPUT / speech_content_file.name
+            key = journal.key(speech_content_file, factions_path)
+            if journal.is_done(speech_content_file.name, key) and output_file.exists():
+                continue
+
+            report.start(speech_content_file.stem)
             print(f"Processing file {i+1}/{len(session_files)}: {speech_content_file.name}")
 
             # read the content
             try:
                 speech_content = pd.read_pickle(speech_content_file)
+                count_input(speech_content_file)
             except Exception as e:
                 print(f"Error reading {speech_content_file}: {e}")
+                failed = True
                 continue
 
             # Insert acad_title column and extract plain name and titles
@@ -294,7 +194,7 @@ def main():
             # Clean all the names still remaining from PDF Header
             names = speech_content["name_raw"].to_list()
             speech_content["speech_content"] = speech_content["speech_content"].apply(
-                clean_name_headers, args=(np.unique(names),)
+                clean_name_headers, args=(header_names(names),)
             )
 
             speech_content.reset_index(inplace=True, drop=True)
@@ -309,77 +209,32 @@ def main():
                 r"  +", " ", regex=True
             ).str.strip()
 
-            # Define academic titles for extraction
-            titles = [
-                "Dr",
-                "Frau",
-                "D",
-                "-Ing",
-                "von",
-                "und",
-                "zu",
-                "van",
-                "de",
-                "Baron",
-                "Freiherr",
-                "Prinz",
-                "h",
-                "c",
-                "Prof"
-            ]
-
-            # Split the name column into components at space character
-            first_last_titles = speech_content["name_raw"].apply(str.split)
-
-            # Extract acad_title, if it is in the titles list
-            speech_content["acad_title"] = [
-                " ".join([acad_title for acad_title in title_list if acad_title in titles])
-                for title_list in first_last_titles
-            ]
-
-            # Remove titles from the first_last_name list
-            for index, title_list in first_last_titles.items():
-                first_last_titles.at[index] = [name for name in title_list if name not in titles]
-
-            # Get the first and last name based on the amount of elements
-            for index, first_last in first_last_titles.items():
-                if len(first_last) == 1:
-                    speech_content.at[index, "first_name"] = ""
-                    speech_content.at[index, "last_name"] = first_last[0] if first_last else ""
-                elif len(first_last) >= 2:
-                    speech_content.at[index, "first_name"] = " ".join(first_last[:-1])
-                    speech_content.at[index, "last_name"] = first_last[-1]
-                else:
-                    speech_content.at[index, "first_name"] = ""
-                    speech_content.at[index, "last_name"] = ""
+            # Split names into academic titles, first names and last name
+            split = split_names(speech_content["name_raw"], titles=TITLES)
+            speech_content["acad_title"] = split["acad_title"].str.join(" ")
+            speech_content["first_name"] = split["first_name"].str.join(" ")
+            speech_content["last_name"] = split["last_name"]
 
             # Look for factions in the position_raw column
-            for index, position_raw in speech_content["position_raw"].items():
-                faction_abbrev = get_faction_abbrev(str(position_raw), faction_patterns)
-                (
-                    speech_content.at[index, "position_short"],
-                    speech_content.at[index, "position_long"],
-                ) = get_position_short_and_long(
-                    faction_abbrev if faction_abbrev else re.sub("\n+", " ", position_raw)
-                )
-
-                if faction_abbrev:
-                    matching_factions = factions.loc[factions["abbreviation"] == faction_abbrev, "id"]
-                    if not matching_factions.empty:
-                        speech_content.at[index, "faction_id"] = int(matching_factions.iloc[0])
+            speakers = faction_classifier.speakers_of(speech_content["position_raw"])
+            speech_content["position_short"] = speakers["position_short"]
+            speech_content["position_long"] = speakers["position_long"]
+            speech_content["faction_id"] = classify.faction_ids(speakers["faction"], factions)
 
             # Make sure position_long is a string, not None
             speech_content["position_long"] = speech_content["position_long"].fillna("")
 
-            # Save processed file
-            output_file = SPEECH_CONTENT_OUTPUT / speech_content_file.name
-
             # Remove original raw columns before saving
             speech_content = speech_content.drop(columns=["position_raw", "name_raw"])
-            speech_content.to_pickle(output_file)
+            write_pickle(speech_content, output_file)
+            count_output(output_file, len(speech_content))
+            journal.complete(speech_content_file.name, key)
 
             print(f"  + Processed and saved {len(speech_content)} speeches from {speech_content_file.name}")
 
+    if not failed:
+        journal.finish()
+    report.save()
     print("Processing complete!")
     return True
 
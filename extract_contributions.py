@@ -1,24 +1,107 @@
 import pandas as pd
 import re
+import regex
 import copy
 from pathlib import Path
 
+from od_lib.helper_functions import patterns
+from od_lib.helper_functions.build_cache import write_pickle
+from od_lib.helper_functions.instrumentation import StageReport, count_input, count_output
+
+# Patterns for party identification, matched ignoring the case
+PARTIES = {
+    "AfD": r"Alternative für Deutschland|AfD",
+    "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",
+    "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+    "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+    "BÜNDNIS 90/DIE GRÜNEN": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|BÜNDNISSES 90/DIE GRÜNEN|Grünen|BÜNDNISSES 90/ DIE GRÜNEN|BÜNDNIS 90/DIE GRÜNEN",
+    "DIE LINKE": r"DIE LIN\s?KEN?|LIN\s?KEN",
+    "PDS/Linke Liste": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+    "fraktionslos": r"(fraktionslos|Parteilos)",
+    "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+    "DP": "DP",
+    "KPD": "KPD",
+    "Z": r"Z\s|Zentrum",
+    "BP": "BP|Bayernpartei",
+    "FU": "FU",
+    "WAV": "WAV",
+    "DRP": r"DRP(\-Hosp\.)?",
+    "FVP": "FVP",
+    "SSW": "SSW",
+    "SRP": "SRP",
+    "DA": "DA",
+    "Gast": "Gast",
+    "DBP": "DBP",
+    "NR": "NR",
+}
+party_patterns = patterns.register_all(
+    "contributions_extended.party", PARTIES, regex.IGNORECASE
+)
+
+# Contribution types and the initiators named after them, e.g. "Beifall bei der SPD"
+type_patterns = patterns.register_all(
+    "contributions_extended.type",
+    {
+        "beifall": r"(?i)beifall",
+        "zuruf": r"(?i)zuruf|gegenruf|ruf",
+        "heiterkeit": r"(?i)heiterkeit",
+        "widerspruch": r"(?i)widerspruch",
+        "unterbrechung": r"(?i)unterbrechung",
+        "unruhe": r"(?i)unruhe",
+        "lachen": r"(?i)lachen",
+        "zustimmung": r"(?i)zustimmung|sehr richtig|sehr wahr|bravo",
+    },
+)
+initiator_patterns = patterns.register_all(
+    "contributions_extended.initiator",
+    {
+        "beifall": r"(?i)beifall\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+        "zuruf": r"(?i)(?:von|des|der)\s+([^:)]+)",
+        "heiterkeit": r"(?i)heiterkeit\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+        "widerspruch": r"(?i)widerspruch\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+        "unruhe": r"(?i)unruhe\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+        "lachen": r"(?i)lachen\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+        "zustimmung": r"(?i)(?:zustimmung|sehr richtig|sehr wahr|bravo)\s+(?:bei|im|der|des|vom)\s+([^)]+)",
+    },
+)
+shout_content_pattern = patterns.register(
+    "contributions_extended.shout_content",
+    r"(?i)(?:zuruf|gegenruf|ruf)(?:\s*:\s*|\s+von\s+)(.*?)(?:\s*\)|\s*$)",
+)
+person_pattern = patterns.register(
+    "contributions_extended.person", r"(?:Abg\s?\.\s?)([A-ZÄÖÜa-zäöüß\s]+?)(?:\s*\(|\s*$)"
+)
+
+bracket_pattern = patterns.register(
+    "contributions_extended.bracket", r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)"
+)
+newlines_pattern = patterns.register("contributions_extended.newlines", r"\n+")
+whitespace_pattern = patterns.register("contributions_extended.whitespace", r"\s+")
+
+newline_pattern = patterns.register("contributions_extended.newline", r"\n")
+shout_prefix_pattern = patterns.register(
+    "contributions_extended.shout_prefix",
+    r"(Gegenrufe?\sdes\s|Gegenrufe?\sder\s|Zurufe?\sdes\s|Zurufe?\sder\s)(Abg\s?\.\s)*",
+)
+member_pattern = patterns.register(
+    "contributions_extended.member", r"(Abg\s?\.\s?|Abgeordneten\s)"
+)
+pronoun_pattern = patterns.register(
+    "contributions_extended.pronoun", r"(^\s?der\s?|^\s?die\s?|^\s?das\s?|^\s?von\s?)"
+)
+
 def convert_to_string(string):
     return "" if string is None else str(string)
 
 def clean_person_name(name_raw):
     """Cleans the person name_raw"""
     # Remove any newlines from the name_raw
-    name_raw = re.sub(r"\n", " ", convert_to_string(name_raw))
+    name_raw = newline_pattern.sub(" ", convert_to_string(name_raw))
     # Remove any Additional stuff
-    name_raw = re.sub(
-        r"(Gegenrufe?\sdes\s|Gegenrufe?\sder\s|Zurufe?\sdes\s|Zurufe?\sder\s)(Abg\s?\.\s)*",
-        "",
-        name_raw,
-    )
-    name_raw = re.sub(r"(Abg\s?\.\s?|Abgeordneten\s)", "", name_raw)
+    name_raw = shout_prefix_pattern.sub("", name_raw)
+    name_raw = member_pattern.sub("", name_raw)
     # Remove any Pronouns
-    name_raw = re.sub(r"(^\s?der\s?|^\s?die\s?|^\s?das\s?|^\s?von\s?)", "", name_raw)
+    name_raw = pronoun_pattern.sub("", name_raw)
     # Remove whitespaces at the beginning and at the end
     name_raw = name_raw.lstrip(" ").rstrip(" ")
 
@@ -75,38 +158,11 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
     - contribution_simple: DataFrame with simplified contribution info
     - position_map: Dictionary mapping positions to original text
     """
-    # Define patterns for party identification
-    parties = {
-        "AfD": r"Alternative für Deutschland|AfD",
-        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",
-        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
-        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
-        "BÜNDNIS 90/DIE GRÜNEN": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|BÜNDNISSES 90/DIE GRÜNEN|Grünen|BÜNDNISSES 90/ DIE GRÜNEN|BÜNDNIS 90/DIE GRÜNEN",
-        "DIE LINKE": r"DIE LIN\s?KEN?|LIN\s?KEN",
-        "PDS/Linke Liste": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-        "fraktionslos": r"(fraktionslos|Parteilos)",
-        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
-        "DP": "DP",
-        "KPD": "KPD",
-        "Z": r"Z\s|Zentrum",
-        "BP": "BP|Bayernpartei",
-        "FU": "FU",
-        "WAV": "WAV",
-        "DRP": r"DRP(\-Hosp\.)?",
-        "FVP": "FVP",
-        "SSW": "SSW",
-        "SRP": "SRP",
-        "DA": "DA",
-        "Gast": "Gast",
-        "DBP": "DBP",
-        "NR": "NR",
-    }
-
     # Get electoral term from session
     electoral_term = session // 1000
 
     # Find all content in brackets - these are likely contributions
-    brackets = list(re.finditer(r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)", speech_text))
+    brackets = list(bracket_pattern.finditer(speech_text))
 
     # Initialize frames for storing contribution data
     frame = {
@@ -132,8 +188,8 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
 
         # Clean up the text inside bracket
         bracket_text = bracket.group()
-        bracket_text_clean = re.sub(r"\n+", " ", bracket_text)
-        bracket_text_clean = re.sub(r"\s+", " ", bracket_text_clean)
+        bracket_text_clean = newlines_pattern.sub(" ", bracket_text)
+        bracket_text_clean = whitespace_pattern.sub(" ", bracket_text_clean)
 
         # Save the bracket content to simplified contributions
         contributions_simplified["text_position"].append(pos)
@@ -149,21 +205,21 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
         )
 
         # Identify contribution type based on patterns
-        if re.search(r"(?i)beifall", bracket_text_clean):
+        if type_patterns["beifall"].search(bracket_text_clean):
             # Handle applause
-            initiator_match = re.search(r"(?i)beifall\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["beifall"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Beifall", "", party_name, "", bracket_text_clean, pos
                         )
 
                 # Check for person names
-                person_match = re.search(r"(?:Abg\s?\.\s?)([A-ZÄÖÜa-zäöüß\s]+?)(?:\s*\(|\s*$)", initiator_text)
+                person_match = person_pattern.search(initiator_text)
                 if person_match:
                     name_raw = person_match.group(1).strip()
                     frame = add_entry(
@@ -175,10 +231,10 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Beifall", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)zuruf|gegenruf|ruf", bracket_text_clean):
+        elif type_patterns["zuruf"].search(bracket_text_clean):
             # Handle interjections/comments
-            content_match = re.search(r"(?i)(?:zuruf|gegenruf|ruf)(?:\s*:\s*|\s+von\s+)(.*?)(?:\s*\)|\s*$)", bracket_text_clean)
-            initiator_match = re.search(r"(?i)(?:von|des|der)\s+([^:)]+)", bracket_text_clean)
+            content_match = shout_content_pattern.search(bracket_text_clean)
+            initiator_match = initiator_patterns["zuruf"].search(bracket_text_clean)
 
             if content_match:
                 content = content_match.group(1).strip()
@@ -189,14 +245,14 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Zuruf", "", party_name, "", content, pos
                         )
 
                 # Check for person names
-                person_match = re.search(r"(?:Abg\s?\.\s?)([A-ZÄÖÜa-zäöüß\s]+?)(?:\s*\(|\s*$)", initiator_text)
+                person_match = person_pattern.search(initiator_text)
                 if person_match:
                     name_raw = person_match.group(1).strip()
                     frame = add_entry(
@@ -208,15 +264,15 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Zuruf", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)heiterkeit", bracket_text_clean):
+        elif type_patterns["heiterkeit"].search(bracket_text_clean):
             # Handle cheerfulness/laughter
-            initiator_match = re.search(r"(?i)heiterkeit\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["heiterkeit"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Heiterkeit", "", party_name, "", bracket_text_clean, pos
                         )
@@ -226,15 +282,15 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Heiterkeit", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)widerspruch", bracket_text_clean):
+        elif type_patterns["widerspruch"].search(bracket_text_clean):
             # Handle objections
-            initiator_match = re.search(r"(?i)widerspruch\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["widerspruch"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Widerspruch", "", party_name, "", bracket_text_clean, pos
                         )
@@ -244,21 +300,21 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Widerspruch", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)unterbrechung", bracket_text_clean):
+        elif type_patterns["unterbrechung"].search(bracket_text_clean):
             # Handle interruptions
             frame = add_entry(
                 frame, identity, "Unterbrechung", "", "", "", bracket_text_clean, pos
             )
 
-        elif re.search(r"(?i)unruhe", bracket_text_clean):
+        elif type_patterns["unruhe"].search(bracket_text_clean):
             # Handle disturbances
-            initiator_match = re.search(r"(?i)unruhe\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["unruhe"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Unruhe", "", party_name, "", bracket_text_clean, pos
                         )
@@ -268,15 +324,15 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Unruhe", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)lachen", bracket_text_clean):
+        elif type_patterns["lachen"].search(bracket_text_clean):
             # Handle laughter
-            initiator_match = re.search(r"(?i)lachen\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["lachen"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Lachen", "", party_name, "", bracket_text_clean, pos
                         )
@@ -286,15 +342,15 @@ def extract_contributions(speech_text, session, identity, text_position=0, text_
                     frame, identity, "Lachen", "", "", "", bracket_text_clean, pos
                 )
 
-        elif re.search(r"(?i)zustimmung|sehr richtig|sehr wahr|bravo", bracket_text_clean):
+        elif type_patterns["zustimmung"].search(bracket_text_clean):
             # Handle approval
-            initiator_match = re.search(r"(?i)(?:zustimmung|sehr richtig|sehr wahr|bravo)\s+(?:bei|im|der|des|vom)\s+([^)]+)", bracket_text_clean)
+            initiator_match = initiator_patterns["zustimmung"].search(bracket_text_clean)
             if initiator_match:
                 initiator_text = initiator_match.group(1)
 
                 # Check for party mentions
-                for party_name, party_pattern in parties.items():
-                    if re.search(party_pattern, initiator_text, re.IGNORECASE):
+                for party_name, party_pattern in party_patterns.items():
+                    if party_pattern.search(initiator_text):
                         frame = add_entry(
                             frame, identity, "Zustimmung", "", party_name, "", bracket_text_clean, pos
                         )
@@ -345,6 +401,7 @@ def main():
     speech_id = 0
     simplified_list = []
     processed_terms = 0
+    report = StageReport("extract_contributions")
 
     # Process each electoral term folder
     for folder_path in sorted(SPEECH_CONTENT_STAGE_03.glob("electoral_term_*")):
@@ -371,9 +428,11 @@ def main():
         processed_count = 0
 
         for speech_file in folder_path.glob("*.pkl"):
+            report.start(speech_file.stem)
             try:
                 # Read the speech content
                 speech_content = pd.read_pickle(speech_file)
+                count_input(speech_file)
 
                 # Add speech_id column
                 speech_content.insert(0, "speech_id", 0)
@@ -405,8 +464,10 @@ def main():
                     contributions_extended = pd.concat(extended_list, sort=False)
 
                     # Save contributions and updated speech content
-                    contributions_extended.to_pickle(extended_output_dir / speech_file.name)
-                    speech_content.to_pickle(speech_output_dir / speech_file.name)
+                    write_pickle(contributions_extended, extended_output_dir / speech_file.name)
+                    write_pickle(speech_content, speech_output_dir / speech_file.name)
+                    count_output(extended_output_dir / speech_file.name, len(contributions_extended))
+                    count_output(speech_output_dir / speech_file.name)
 
                 processed_count += 1
                 if processed_count % 10 == 0 or processed_count == file_count:
@@ -417,6 +478,7 @@ def main():
 
         processed_terms += 1
         print(f"  Extracted contributions from {processed_count} speeches")
+    report.finish()
 
     # Combine all simplified contributions and save
     print("Creating simplified contributions file...")
@@ -424,9 +486,10 @@ def main():
         contributions_simplified = pd.concat(simplified_list, sort=False)
 
         # Save to final directory
-        contributions_simplified.to_pickle(FINAL_DIR / "contributions_simplified.pkl")
+        write_pickle(contributions_simplified, FINAL_DIR / "contributions_simplified.pkl")
         print(f"Saved simplified contributions to {FINAL_DIR / 'contributions_simplified.pkl'}")
 
+    report.save()
     print(f"Extracted contributions from speeches in {processed_terms} electoral terms")
     return True
 
@@ -1,13 +1,54 @@
 import pandas as pd
-import re
+import regex
 from pathlib import Path
-import os
+
+from od_lib.helper_functions import patterns
+from od_lib.helper_functions.build_cache import ProgressJournal, write_pickle
+from od_lib.helper_functions.instrumentation import StageReport, count_output
+from od_lib.helper_functions.text_store import TextStore, store_path
+
+# Speaker headers, one alternative per format, each with a name and a position
+# group. Where several formats match at the same place the first one wins.
+SPEAKER_PATTERNS = {
+    # Bundestag format with explicit name repetition
+    # Format: "AlexanderHoffmannCDU/CSUAlexander Hoffmann (CDU/CSU):"
+    "bundestag": r"(?:^|\n)\s*[A-Za-zäöüÄÖÜß\.]+(?P<name_raw>[^:]+)\((?P<position_raw>[^)]+)\):",
+    # Standard name-with-parentheses format, "Name (Party):"
+    "standard": r"(?:^|\n)\s*(?P<name_raw>[A-Za-zäöüÄÖÜß\.\-\s]+)\s*\((?P<position_raw>[^)]+)\):",
+    # Position format, "Name, Position:"
+    "position": r"(?:^|\n)\s*(?P<name_raw>[A-Za-zäöüÄÖÜß\.\-\s]+),\s+(?P<position_raw>[^:]+):",
+}
+speaker_pattern = patterns.register(
+    "extract_speeches.speaker",
+    "|".join(f"(?P<{kind}>{pattern})" for kind, pattern in SPEAKER_PATTERNS.items()),
+    regex.MULTILINE,
+)
+# Clean name at the end of the middle section of the bundestag format
+trailing_name_pattern = patterns.register(
+    "extract_speeches.trailing_name", r"([A-Za-zäöüÄÖÜß\.\s]+)$"
+)
+
+
+def remove_overlaps(speakers):
+    """Keeps the speakers, sorted by position in text, which do not overlap an
+    already kept one. Spans include both ends. As the speakers are sorted one
+    sweep with the largest kept end is enough."""
+    speakers = sorted(speakers, key=lambda x: x['span_begin'])
+    kept = []
+    kept_end = -1
+    for speaker in speakers:
+        if speaker['span_begin'] > kept_end:
+            kept.append(speaker)
+            kept_end = max(kept_end, speaker['span_end'])
+    return kept
+
 
 def main():
     # Use a simpler, relative path structure
     ROOT_DIR = Path.cwd()  # Current working directory
     DATA_DIR = ROOT_DIR / "data"
-    RAW_TXT_DIR = DATA_DIR / "raw_txt"  # Directory containing the raw text files from XML
+    RAW_TXT_DIR = DATA_DIR / "raw_txt"  # Directory containing the raw text store from XML
+    RAW_TXT_STORE = store_path(RAW_TXT_DIR, "sessions")
     CACHE_DIR = DATA_DIR / "cache"
     SPEECH_CONTENT_DIR = CACHE_DIR / "speech_content"
     SPEECH_CONTENT_STAGE_01 = SPEECH_CONTENT_DIR / "stage_01"
@@ -18,60 +59,56 @@ def main():
 
     print("Extracting speeches from raw text files...")
 
-    # Define standard name-with-parentheses pattern
-    standard_pattern = re.compile(
-        r'(?:^|\n)\s*([A-Za-zäöüÄÖÜß\.\-\s]+)\s*\(([^)]+)\):',
-        re.MULTILINE
-    )
-
-    # Define position pattern
-    position_pattern = re.compile(
-        r'(?:^|\n)\s*([A-Za-zäöüÄÖÜß\.\-\s]+),\s+([^:]+):',
-        re.MULTILINE
-    )
-
-    # Define bundestag format pattern with explicit name repetition
-    # Format: "AlexanderHoffmannCDU/CSUAlexander Hoffmann (CDU/CSU):"
-    bundestag_pattern = re.compile(
-        r'(?:^|\n)\s*([A-Za-zäöüÄÖÜß\.]+)([^:]+)\(([^)]+)\):',
-        re.MULTILINE
-    )
+    # Open the text store with all sessions written by process_xml.py
+    if not RAW_TXT_STORE.exists():
+        print(f"Error: No text store found at {RAW_TXT_STORE}")
+        return False
 
-    # Find all session directories in raw_txt
-    session_dirs = [d for d in RAW_TXT_DIR.glob("*") if d.is_dir()]
+    store = TextStore(RAW_TXT_STORE)
+    session_names = store.sessions()
 
-    if not session_dirs:
-        print(f"Error: No session directories found in {RAW_TXT_DIR}")
+    if not session_names:
+        print(f"Error: No sessions found in {RAW_TXT_STORE}")
         return False
 
-    print(f"Found {len(session_dirs)} session directories.")
+    print(f"Found {len(session_names)} sessions.")
 
-    # Process each session directory
+    # Process each session
     processed_count = 0
+    report = StageReport("extract_speeches")
 
-    for session_dir in session_dirs:
-        session_name = session_dir.name
-        print(f"Processing session {session_name}...")
+    # Sessions extracted before an interruption are taken from the journal,
+    # keyed by the content hashes in the text store.
+    journal = ProgressJournal(SPEECH_CONTENT_STAGE_01, code=[__file__])
+    failed = False
+
+    for session_name in session_names:
+        output_path = SPEECH_CONTENT_STAGE_01 / f"{session_name}.pkl"
+        key = [store.digest(session_name, part) for part in store.parts(session_name)]
+        if journal.is_done(session_name, key) and output_path.exists():
+            processed_count += 1
+            continue
 
-        # Read the session content file
-        session_content_file = session_dir / "session_content.txt"
+        report.start(session_name)
+        print(f"Processing session {session_name}...")
 
-        if not session_content_file.exists():
-            print(f"  ⚠️  Missing session content file in {session_name}")
+        # Read the session content
+        if "session_content" not in store.parts(session_name):
+            print(f"  ⚠️  Missing session content in {session_name}")
             continue
 
         try:
-            with open(session_content_file, "r", encoding="utf-8") as f:
-                content = f.read()
+            content = store.read(session_name, "session_content")
         except Exception as e:
-            print(f"  ❌ Error reading file {session_content_file}: {e}")
+            print(f"  ❌ Error reading session content of {session_name}: {e}")
+            failed = True
             continue
 
-        # Find all matches for each pattern
+        # Find all speaker headers in one scan
         speakers = []
 
-        # Track which patterns find what (for debugging)
-        pattern_counts = {"bundestag": 0, "standard": 0, "position": 0}
+        # Track which format each header of the scan has (for debugging)
+        pattern_counts = {kind: 0 for kind in SPEAKER_PATTERNS}
 
         # Track matches for specific parties
         party_matches = {
@@ -82,97 +119,59 @@ def main():
             "DIE LINKE": 0
         }
 
-        # 1. First try the bundestag specific pattern
-        for match in bundestag_pattern.finditer(content):
-            name_part = match.group(2).strip()
-            party = match.group(3).strip()
-
-            # Look for a clean name in the middle section
-            name_match = re.search(r'([A-Za-zäöüÄÖÜß\.\s]+)$', name_part)
-            if name_match:
-                name_raw = name_match.group(1).strip()
-            else:
-                name_raw = name_part
-
-            # Update party counts
-            for p in party_matches:
-                if p in party:
-                    party_matches[p] += 1
-
-            speakers.append({
-                'name_raw': name_raw,
-                'position_raw': party,
-                'span_begin': match.start(),
-                'span_end': match.end(),
-                'pattern_type': 'bundestag'
-            })
-            pattern_counts["bundestag"] += 1
+        try:
+            with patterns.located(session=session_name):
+                matches = list(speaker_pattern.finditer(content))
+        except patterns.PatternTimeout as e:
+            print(f"  ❌ Error scanning speakers of {session_name}: {e}")
+            failed = True
+            continue
 
-        # 2. Standard pattern (Name (Party):)
-        for match in standard_pattern.finditer(content):
-            name = match.group(1).strip()
-            party = match.group(2).strip()
+        for match in matches:
+            kind = next(kind for kind in SPEAKER_PATTERNS if match.group(kind) is not None)
+            name_raw = match.group("name_raw").strip()
+            position_raw = match.group("position_raw").strip()
 
-            # Update party counts
-            for p in party_matches:
-                if p in party:
-                    party_matches[p] += 1
+            if kind == "bundestag":
+                # Look for a clean name in the middle section
+                name_match = trailing_name_pattern.search(name_raw)
+                if name_match:
+                    name_raw = name_match.group(1).strip()
 
-            speakers.append({
-                'name_raw': name,
-                'position_raw': party,
-                'span_begin': match.start(),
-                'span_end': match.end(),
-                'pattern_type': 'standard'
-            })
-            pattern_counts["standard"] += 1
+            if kind != "position":
+                # Update party counts
+                for p in party_matches:
+                    if p in position_raw:
+                        party_matches[p] += 1
 
-        # 3. Position pattern
-        for match in position_pattern.finditer(content):
             speakers.append({
-                'name_raw': match.group(1).strip(),
-                'position_raw': match.group(2).strip(),
+                'name_raw': name_raw,
+                'position_raw': position_raw,
                 'span_begin': match.start(),
                 'span_end': match.end(),
-                'pattern_type': 'position'
+                'pattern_type': kind
             })
-            pattern_counts["position"] += 1
-
-        # Sort speakers by position in text
-        speakers.sort(key=lambda x: x['span_begin'])
+            pattern_counts[kind] += 1
 
         # Remove overlapping matches
-        non_overlapping_speakers = []
-        for speaker in speakers:
-            # Check if this speaker overlaps with any already included speaker
-            overlapping = False
-            for existing in non_overlapping_speakers:
-                if (speaker['span_begin'] <= existing['span_end'] and
-                    speaker['span_end'] >= existing['span_begin']):
-                    overlapping = True
-                    break
-            if not overlapping:
-                non_overlapping_speakers.append(speaker)
-
-        speakers = non_overlapping_speakers
+        speakers = remove_overlaps(speakers)
 
         if not speakers:
             print(f"  ⚠️  No speakers found in {session_name}")
             continue
 
-        print(f"  + Pattern matches: {pattern_counts}")
-        print(f"  + Party matches: {party_matches}")
+        print(f"  + Pattern matches (combined scan): {pattern_counts}")
+        print(f"  + Party matches (combined scan): {party_matches}")
 
         # Create DataFrame
         df = pd.DataFrame(speakers)
 
         # Get session date if available
         session_date = ""
-        meta_file = session_dir / "meta_data.xml"
-        if meta_file.exists():
+        if "meta_data" in store.parts(session_name):
             try:
                 import xml.etree.ElementTree as ET
-                tree = ET.parse(meta_file)
+                tree = ET.fromstring(store.read_bytes(session_name, "meta_data"))
                 date_elem = tree.find(".//date")
                 if date_elem is not None and date_elem.text:
                     session_date = date_elem.text
@@ -206,13 +205,18 @@ def main():
         print(f"  + Final party counts in position_raw: {party_counts}")
 
         # Save to pickle file
-        output_path = SPEECH_CONTENT_STAGE_01 / f"{session_name}.pkl"
-        df.to_pickle(output_path)
+        write_pickle(df, output_path)
+        count_output(output_path, len(df))
+        journal.complete(session_name, key)
         print(f"  + Saved {len(df)} speeches from session {session_name}")
         processed_count += 1
 
+    if not failed:
+        journal.finish()
+    report.save()
     print(f"\nSpeech extraction complete: {processed_count} sessions processed.")
     return True
 
+
 if __name__ == "__main__":
     main()
@@ -1,21 +1,21 @@
 import pandas as pd
 import re
-import xml.etree.ElementTree as et
 import time
 import datetime
 from pathlib import Path
 
+from od_lib.helper_functions.session_catalog import SessionCatalog
+
 def main():
     # Use a simpler, relative path structure
     ROOT_DIR = Path.cwd()  # Current working directory
     DATA_DIR = ROOT_DIR / "data"
 
     # Define subdirectories
-    RAW_DIR = DATA_DIR / "raw"
     CACHE_DIR = DATA_DIR / "cache"
     FINAL_DIR = DATA_DIR / "final"
 
-    RAW_XML_DIR = RAW_DIR / "xml"
+    SESSION_CATALOG = CACHE_DIR / "sessions.sqlite"
 
     SPEECH_CONTENT_DIR = CACHE_DIR / "speech_content"
     SPEECH_CONTENT_STAGE_04 = SPEECH_CONTENT_DIR / "stage_04"
@@ -93,22 +93,25 @@ def main():
         r"\.pkl", "", regex=True
     )
 
-    # Extract metadata from XML files
-    print("Extracting metadata from XML files...")
+    # Read the session dates from the catalog written by process_xml.py
+    print("Reading session dates from the session catalog...")
     meta_data = {}
 
-    for xml_file_path in sorted(RAW_XML_DIR.glob("**/*.xml")):
+    if SESSION_CATALOG.exists():
+        with SessionCatalog(SESSION_CATALOG) as catalog:
+            dates = catalog.dates()
+    else:
+        print(f"  {SESSION_CATALOG} is missing, run process_xml.py first.")
+        dates = {}
+    for document_number, date_str in dates.items():
         try:
-            tree = et.parse(xml_file_path)
-            date_str = tree.find("DATUM").text
             if date_str:
                 date = time.mktime(
                     datetime.datetime.strptime(date_str, "%d.%m.%Y").timetuple()
                 )
-                document_number = int(xml_file_path.stem)
                 meta_data[document_number] = date
         except Exception as e:
-            print(f"  Error extracting metadata from {xml_file_path}: {e}")
+            print(f"  Error reading the date of session {document_number}: {e}")
 
     # Add electoral term, date, and document URL columns
     speech_content_01_18.insert(1, "electoral_term", -1)
@@ -1,75 +1,301 @@
+import argparse
 import os
-import subprocess
+import time
 from pathlib import Path
 
+from od_lib.helper_functions.instrumentation import (
+    REGEX_REPORT,
+    REPORT_ENV,
+    RUN_REPORT,
+    SLOW_INPUTS_REPORT,
+    diff_runs,
+    load_run_report,
+    write_run_report,
+)
+from od_lib.helper_functions.patterns import STATS_ENV
+from od_lib.helper_functions.pipeline import Stage, build_graph, run_stages, select_stages
+
+# Base directories, as used by the scripts below
+DATA_DIR = Path("./data")
+RAW_XML_DIR = DATA_DIR / "raw_xml"
+RAW_TXT_DIR = DATA_DIR / "raw_txt"
+MP_BASE_DATA_DIR = DATA_DIR / "MP_BASE_DATA"
+CACHE_DIR = DATA_DIR / "cache"
+FINAL_DIR = DATA_DIR / "final"
+REPORTS_DIR = DATA_DIR / "reports"
+
+POLITICIANS_STAGE_01 = CACHE_DIR / "politicians" / "stage_01"
+POLITICIANS_STAGE_02 = CACHE_DIR / "politicians" / "stage_02"
+FACTIONS_STAGE_01 = CACHE_DIR / "factions" / "stage_01"
+SPEECH_CONTENT_STAGE_01 = CACHE_DIR / "speech_content" / "stage_01"
+SPEECH_CONTENT_STAGE_02 = CACHE_DIR / "speech_content" / "stage_02"
+SPEECH_CONTENT_STAGE_03 = CACHE_DIR / "speech_content" / "stage_03"
+SPEECH_CONTENT_STAGE_04 = CACHE_DIR / "speech_content" / "stage_04"
+CONTRIBUTIONS_EXTENDED_STAGE_01 = CACHE_DIR / "contributions_extended" / "stage_01"
+CONTRIBUTIONS_EXTENDED_STAGE_02 = CACHE_DIR / "contributions_extended" / "stage_02"
+CONTRIBUTIONS_EXTENDED_STAGE_03 = CACHE_DIR / "contributions_extended" / "stage_03"
+SESSION_CATALOG = CACHE_DIR / "sessions.sqlite"
+
+# Every script with the data it reads and writes. The execution order is derived
+# from these declarations, independent branches run in parallel.
+STAGES = [
+    Stage(
+        "download_data",
+        "download_data.py",
+        outputs=[RAW_XML_DIR, MP_BASE_DATA_DIR],
+    ),
+    Stage(
+        "process_xml",
+        "process_xml.py",
+        inputs=[RAW_XML_DIR],
+        outputs=[RAW_TXT_DIR, SESSION_CATALOG],
+    ),
+    Stage(
+        "process_mp_data",
+        "process_mp_data.py",
+        inputs=[MP_BASE_DATA_DIR],
+        outputs=[POLITICIANS_STAGE_01 / "mps.pkl", FINAL_DIR / "electoral_terms.csv"],
+    ),
+    Stage(
+        "scrape_government_members",
+        "scrape_government_members.py",
+        outputs=[POLITICIANS_STAGE_01 / "mgs.pkl"],
+    ),
+    # Factions and politicians
+    Stage(
+        "create_factions",
+        "create_factions.py",
+        inputs=[POLITICIANS_STAGE_01 / "mps.pkl"],
+        outputs=[FACTIONS_STAGE_01],
+    ),
+    Stage(
+        "add_abbreviations_and_ids",
+        "add_abbreviations_and_ids.py",
+        inputs=[FACTIONS_STAGE_01],
+        outputs=[FINAL_DIR / "factions.pkl"],
+    ),
+    Stage(
+        "add_faction_ids",
+        "add_faction_ids.py",
+        inputs=[POLITICIANS_STAGE_01 / "mps.pkl", FINAL_DIR / "factions.pkl"],
+        outputs=[POLITICIANS_STAGE_02],
+    ),
+    Stage(
+        "merge_government_members",
+        "merge_government_members.py",
+        inputs=[
+            POLITICIANS_STAGE_01 / "mgs.pkl",
+            POLITICIANS_STAGE_02 / "mps.pkl",
+            FINAL_DIR / "factions.pkl",
+        ],
+        outputs=[FINAL_DIR / "politicians.csv", FINAL_DIR / "politicians.pkl"],
+    ),
+    # Speech processing
+    Stage(
+        "extract_speeches",
+        "extract_speeches.py",
+        inputs=[RAW_TXT_DIR],
+        outputs=[SPEECH_CONTENT_STAGE_01],
+    ),
+    Stage(
+        "clean_speeches",
+        "clean_speeches.py",
+        inputs=[SPEECH_CONTENT_STAGE_01, FINAL_DIR / "factions.pkl"],
+        outputs=[SPEECH_CONTENT_STAGE_02],
+    ),
+    Stage(
+        "match_speeches",
+        "match_speeches.py",
+        inputs=[SPEECH_CONTENT_STAGE_02, FINAL_DIR / "politicians.csv"],
+        outputs=[
+            SPEECH_CONTENT_STAGE_03,
+            FINAL_DIR / "speeches_matched.csv",
+            FINAL_DIR / "speeches_matched_sample.csv",
+            FINAL_DIR / "speeches_streamlit.csv",
+        ],
+    ),
+    # Contributions processing
+    Stage(
+        "extract_contributions",
+        "extract_contributions.py",
+        inputs=[SPEECH_CONTENT_STAGE_03],
+        outputs=[
+            SPEECH_CONTENT_STAGE_04,
+            CONTRIBUTIONS_EXTENDED_STAGE_01,
+            FINAL_DIR / "contributions_simplified.pkl",
+        ],
+    ),
+    Stage(
+        "clean_contributions",
+        "clean_contributions.py",
+        inputs=[CONTRIBUTIONS_EXTENDED_STAGE_01, FINAL_DIR / "factions.pkl"],
+        outputs=[CONTRIBUTIONS_EXTENDED_STAGE_02],
+    ),
+    Stage(
+        "match_contributions",
+        "match_contributions.py",
+        inputs=[CONTRIBUTIONS_EXTENDED_STAGE_02, FINAL_DIR / "politicians.csv"],
+        outputs=[CONTRIBUTIONS_EXTENDED_STAGE_03],
+    ),
+    Stage(
+        "finalize_data",
+        "finalize_data.py",
+        inputs=[SPEECH_CONTENT_STAGE_04, CONTRIBUTIONS_EXTENDED_STAGE_03, SESSION_CATALOG],
+        outputs=[FINAL_DIR / "speech_content.pkl", FINAL_DIR / "contributions_extended.pkl"],
+    ),
+    Stage(
+        "export_to_sql",
+        "export_to_sql.py",
+        inputs=[
+            FINAL_DIR / "speech_content.pkl",
+            FINAL_DIR / "contributions_extended.pkl",
+            FINAL_DIR / "contributions_simplified.pkl",
+            FINAL_DIR / "factions.pkl",
+            FINAL_DIR / "politicians.csv",
+            FINAL_DIR / "electoral_terms.csv",
+        ],
+    ),
+]
+
+
+def print_result(stage, result):
+    print(f"\n{'='*50}")
+    print(f"Finished {stage.script}")
+    print(f"{'='*50}")
+
+    if isinstance(result, Exception):
+        print(f"Error executing {stage.script}: {result}")
+        return
+
+    # Print output
+    if result.stdout:
+        print(result.stdout.strip())
+
+    # Check for errors
+    if result.stderr:
+        print(f"Errors:\n{result.stderr}")
+        if result.returncode != 0:
+            print(f"Script {stage.script} failed with return code {result.returncode}.")
+        else:
+            print(f"Script {stage.script} completed with warnings.")
+    elif result.returncode != 0:
+        print(f"Script {stage.script} failed with return code {result.returncode}.")
+    else:
+        print(f"Script {stage.script} completed successfully.")
+
+
+def previous_run(report_dir):
+    """The latest run report in REPORTS_DIR before the given one."""
+    runs = [
+        path for path in sorted(REPORTS_DIR.glob("*"))
+        if (path / RUN_REPORT).exists() and path.resolve() != report_dir.resolve()
+    ]
+    return runs[-1] if runs else None
+
+
+def print_diff(old_dir, new_dir, metric="wall_seconds"):
+    """Prints the relative change of every stage between two runs and the
+    sessions which got slower the most."""
+    stages, sessions = diff_runs(load_run_report(old_dir), load_run_report(new_dir), metric)
+    print(f"\n{metric} of {new_dir} compared to {old_dir}:")
+    for row in sorted(stages, key=lambda row: row["change"] or 0, reverse=True):
+        old = "-" if row["old"] is None else f"{row['old']:.2f}"
+        new = "-" if row["new"] is None else f"{row['new']:.2f}"
+        change = "" if row["change"] is None else f"{row['change']:+.0%}"
+        print(f"  {row['stage']:<30}{old:>10}{new:>10}{change:>8}")
+        for session in sessions.get(row["stage"], []):
+            if session["increase"] > 0:
+                print(
+                    f"    {session['session']:<28}{session['old']:>10.2f}"
+                    f"{session['new']:>10.2f}{session['increase']:>+8.2f}"
+                )
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Run the Bundestag data processing pipeline.")
+    parser.add_argument(
+        "stages",
+        nargs="*",
+        help="Names of the stages to run (default: all). Order is taken from the stage graph.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Maximum number of stages running at the same time.",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="Print the stage graph and exit."
+    )
+    parser.add_argument(
+        "--report-dir",
+        type=Path,
+        help="Directory of the run report (default: data/reports/<start time>).",
+    )
+    parser.add_argument(
+        "--compare",
+        type=Path,
+        help="Run report to compare this run with (default: the previous run).",
+    )
+    parser.add_argument(
+        "--diff",
+        nargs=2,
+        type=Path,
+        metavar=("OLD", "NEW"),
+        help="Only compare two run reports and exit.",
+    )
+    parser.add_argument(
+        "--regex-stats",
+        action="store_true",
+        help="Count calls, matches and time of the registered regex patterns.",
+    )
+    args = parser.parse_args()
+
+    if args.diff:
+        print_diff(*args.diff)
+        return
+
+    stages = select_stages(STAGES, args.stages) if args.stages else STAGES
+
+    if args.list:
+        for name, dependencies in build_graph(stages).items():
+            print(f"{name} <- {', '.join(dependencies) or '-'}")
+        return
+
     # Create base directories
-    DATA_DIR = Path("./data")
     DATA_DIR.mkdir(exist_ok=True)
 
     print("Starting Bundestag data processing pipeline...")
     print(f"Working directory: {Path.cwd()}")
     print(f"Data directory: {DATA_DIR.absolute()}")
+    print(f"Running {len(stages)} stages on up to {args.workers} workers.")
 
-    # Define scripts to run
-    scripts = [
+    # Every stage writes its per-session metrics into the report directory,
+    # the runner adds wall and CPU time of the stage scripts.
+    report_dir = args.report_dir or REPORTS_DIR / time.strftime("%Y%m%d-%H%M%S")
+    report_dir.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ, **{REPORT_ENV: str(report_dir.absolute())})
+    if args.regex_stats:
+        env[STATS_ENV] = "1"
+    usage = {}
 
-       # "download_data.py",
-      # "process_xml.py"
-       # "process_mp_data.py"          # Process MP data from XML
-       #"scrape_government_members.py", # Scrape government members from Wikipedia
+    def on_finish(stage, result):
+        print_result(stage, result)
+        if not isinstance(result, Exception):
+            usage[stage.name] = result.usage
 
-      #  "create_factions.py",          # Create factions list
-      #  "add_abbreviations_and_ids.py", # Add abbreviations to factions
-      #  "add_faction_ids.py",          # Add faction IDs to MPs
-      #  "merge_government_members.py",   # Merge government members with MPs
+    status = run_stages(stages, workers=args.workers, env=env, on_finish=on_finish)
+    write_run_report(report_dir, usage)
+    print(f"Run report written to {report_dir / RUN_REPORT}")
+    if (report_dir / REGEX_REPORT).exists():
+        print(f"Regex patterns ranked by time in {report_dir / REGEX_REPORT}")
+    if (report_dir / SLOW_INPUTS_REPORT).exists():
+        print(f"Slow and timed out regex inputs in {report_dir / SLOW_INPUTS_REPORT}")
 
-        # Speech processing
-       # "extract_speeches.py"          # Extract speeches from raw text WORKS i think but is buggy
-        "clean_speeches.py"            # Clean and process speeches WORKS now, but needs a little more adjustment still. Some B90/Grünen geht nicht und CDU/CSU aiuch nicht
-        #"match_speeches.py"             # Match speeches to politicians
-
-        # Contributions processing
-       #"extract_contributions.py",
-       #"clean_contributions.py",
-       #"match_contributions.py",
-
-        #"finalize_data.py"
-        #"export_to_sql.py"
-
-    ]
-
-    # Run each script in sequence
-    all_successful = True
-    for script in scripts:
-        print(f"\n{'='*50}")
-        print(f"Running {script}...")
-        print(f"{'='*50}")
-
-        # Run the script with error handling
-        try:
-            result = subprocess.run(["python", script], capture_output=True, text=True)
-
-            # Print output
-            if result.stdout:
-                print(result.stdout.strip())
-
-            # Check for errors
-            if result.stderr:
-                print(f"Errors:\n{result.stderr}")
-                if result.returncode != 0:
-                    print(f"Script {script} failed with return code {result.returncode}. Stopping pipeline.")
-                    all_successful = False
-                    break
-                else:
-                    print(f"Script {script} completed with warnings.")
-            else:
-                print(f"Script {script} completed successfully.")
-
-        except Exception as e:
-            print(f"Error executing {script}: {e}")
-            all_successful = False
-            break
+    compare = args.compare or previous_run(report_dir)
+    if compare is not None:
+        print_diff(compare, report_dir)
+    all_successful = all(state == "success" for state in status.values())
 
     # Print final status
     print("\n" + "="*50)
@@ -78,7 +304,11 @@ def main():
         print(f"All data files are available in {DATA_DIR.absolute()} and its subdirectories.")
     else:
         print("Processing pipeline terminated with errors.")
+        for name, state in status.items():
+            if state != "success":
+                print(f"  {name}: {state}")
     print("="*50)
 
+
 if __name__ == "__main__":
     main()
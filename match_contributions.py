@@ -3,14 +3,16 @@ import re
 import numpy as np
 from pathlib import Path
 
+from od_lib.helper_functions.build_cache import ProgressJournal, write_pickle
+from od_lib.helper_functions.fuzzy_names import FuzzyNames
+from od_lib.helper_functions.instrumentation import StageReport, count_input, count_output
+
 # Try to import Levenshtein or rapidfuzz for string similarity
 try:
     from Levenshtein import ratio as levenshtein_ratio
 except ImportError:
     try:
-        from rapidfuzz.distance import Levenshtein
-        def levenshtein_ratio(s1, s2):
-            return Levenshtein.normalized_similarity(s1, s2)
+        from rapidfuzz.distance.Levenshtein import normalized_similarity as levenshtein_ratio
     except ImportError:
         # Fallback to a simple implementation if neither package is available
         def levenshtein_ratio(s1, s2):
@@ -21,10 +23,13 @@ except ImportError:
             s2_set = set(s2.lower())
             return len(s1_set.intersection(s2_set)) / max(len(s1_set), len(s2_set))
 
-def get_fuzzy_names(df, name_to_check, fuzzy_threshold=0.7):
-    """Find names that are similar to the given name"""
+def get_fuzzy_names(df, name_to_check, fuzzy_threshold=0.7, fuzzy_names=None):
+    """Find names that are similar to the given name, with the cached
+    candidates of fuzzy_names if given (FuzzyNames of the last names of df)"""
     if "last_name" not in df.columns:
         return pd.DataFrame()
+    if fuzzy_names is not None:
+        return df.iloc[fuzzy_names.matches(str(name_to_check), fuzzy_threshold)]
     return df.loc[
         df["last_name"].apply(lambda x: levenshtein_ratio(str(x), str(name_to_check)) >= fuzzy_threshold)
     ]
@@ -50,8 +55,12 @@ def set_id(df, index, possible_matches, col_set, col_check):
     if len(possible_matches) > 0 and col_check in possible_matches.columns:
         df.at[index, col_set] = int(possible_matches[col_check].iloc[0])
 
-def insert_politician_id_into_contributions_extended(df, politicians_term, mgs_term):
-    """Match contributions to politician IDs with improved matching"""
+def insert_politician_id_into_contributions_extended(
+    df, politicians_term, mgs_term, fuzzy_names=None
+):
+    """Match contributions to politician IDs with improved matching. fuzzy_names
+    are the FuzzyNames of the politicians of the term, shared by all files of
+    the term."""
     # Make sure we have a DataFrame
     if isinstance(df, pd.Series):
         df = pd.DataFrame([df])
@@ -67,6 +76,18 @@ def insert_politician_id_into_contributions_extended(df, politicians_term, mgs_t
     match_count = 0
     problems = []
 
+    # The last names without an exact match are scored for the fuzzy search
+    # all at once.
+    if fuzzy_names is not None and "last_name" in df_matched.columns:
+        known = set(politicians_term["last_name"])
+        fuzzy_names.add(
+            last_name
+            for last_name in (
+                str(name).lower().replace("ß", "ss") for name in df_matched["last_name"] if name
+            )
+            if last_name not in known
+        )
+
     # Process each contribution
     for idx, row in df_matched.iterrows():
         # Get last name
@@ -171,7 +192,7 @@ def insert_politician_id_into_contributions_extended(df, politicians_term, mgs_t
 
             # Try fuzzy matching with last names
             if len(gov_matches) == 0:
-                fuzzy_matches = get_fuzzy_names(politicians_term, last_name, 0.8)
+                fuzzy_matches = get_fuzzy_names(politicians_term, last_name, 0.8, fuzzy_names)
                 if check_unique(fuzzy_matches):
                     set_id(df_matched, idx, fuzzy_matches, "politician_id", "ui")
                     match_count += 1
@@ -249,6 +270,11 @@ def main():
     # Process each electoral term folder
     term_count = 0
     successful_term_count = 0
+    report = StageReport("match_contributions")
+
+    # Files matched before an interruption are taken from the journal.
+    journal = ProgressJournal(CONTRIBUTIONS_EXTENDED_STAGE_03, code=[__file__])
+    failed = False
 
     for folder_path in sorted(CONTRIBUTIONS_EXTENDED_STAGE_02.glob("electoral_term_*")):
         if not folder_path.is_dir():
@@ -269,6 +295,7 @@ def main():
         # Filter politicians for this electoral term
         politicians_term = politicians.loc[politicians["electoral_term"] == term_number]
         mgs_term = politicians_term.loc[politicians_term["institution_type"] == "Regierungsmitglied"]
+        fuzzy_names = FuzzyNames(politicians_term["last_name"].astype(str), levenshtein_ratio)
 
         # Count files to track progress
         file_count = len(list(folder_path.glob("*.pkl")))
@@ -278,9 +305,21 @@ def main():
 
         # Process each contributions file in this term
         for contrib_file in folder_path.glob("*.pkl"):
+            output_file = term_output_dir / contrib_file.name
+            unit = f"{folder_path.name}/{contrib_file.name}"
+            key = journal.key(contrib_file, politicians_path)
+            if journal.is_done(unit, key) and output_file.exists():
+                info = journal.info(unit)
+                total_contributions += info["contributions"]
+                matched_contributions += info["matched"]
+                processed_count += 1
+                continue
+
+            report.start(contrib_file.stem)
             try:
                 # Read the contributions data
                 data = pd.read_pickle(contrib_file)
+                count_input(contrib_file)
 
                 # Check if the data is valid
                 if data is None or len(data) == 0:
@@ -301,7 +340,7 @@ def main():
 
                 # Match contributions to politicians
                 contributions_matched, problems = insert_politician_id_into_contributions_extended(
-                    contributions, politicians_term, mgs_term
+                    contributions, politicians_term, mgs_term, fuzzy_names
                 )
 
                 # Update counts
@@ -311,7 +350,11 @@ def main():
                 matched_contributions += file_matches
 
                 # Save the matched contributions
-                contributions_matched.to_pickle(term_output_dir / contrib_file.name)
+                write_pickle(contributions_matched, output_file)
+                count_output(output_file, len(contributions_matched))
+                journal.complete(
+                    unit, key, contributions=file_contributions, matched=int(file_matches)
+                )
 
                 processed_count += 1
                 if processed_count % 10 == 0 or processed_count == file_count:
@@ -321,6 +364,7 @@ def main():
 
             except Exception as e:
                 print(f"  Error processing {contrib_file.name}: {e}")
+                failed = True
 
         if processed_count > 0:
             successful_term_count += 1
@@ -328,6 +372,9 @@ def main():
             print(f"Completed term {term_number}: {processed_count} files processed")
             print(f"  Matched {matched_contributions} of {total_contributions} contributions ({match_percentage:.1f}%)")
 
+    if not failed:
+        journal.finish()
+    report.save()
     print(f"Matched contributions for {successful_term_count} of {term_count} electoral terms")
     return True
 
@@ -3,6 +3,9 @@ import re
 from pathlib import Path
 import os
 
+from od_lib.helper_functions.build_cache import ProgressJournal, atomic_output, write_pickle
+from od_lib.helper_functions.instrumentation import StageReport, count_input, count_output
+
 def insert_politician_id_into_speech_content(speech_content, politicians, mgs):
     """Match speaker names to politician IDs"""
     # Create a copy to avoid modifying the original
@@ -188,13 +191,29 @@ def main():
     total_speeches = 0
     matched_speeches = 0
 
+    # Batches matched before an interruption are taken from the journal.
+    journal = ProgressJournal(SPEECH_CONTENT_STAGE_03, code=[__file__])
+    failed = False
+
     # Process each speech batch file
+    report = StageReport("match_speeches")
     for i, speech_file in enumerate(speech_files):
+        output_file = SPEECH_CONTENT_STAGE_03 / speech_file.name
+        key = journal.key(speech_file, politicians_path)
+        if journal.is_done(speech_file.name, key) and output_file.exists():
+            info = journal.info(speech_file.name)
+            total_speeches += info["speeches"]
+            matched_speeches += info["matched"]
+            print(f"Skipping batch file {i+1}/{len(speech_files)}: {speech_file.name} (done)")
+            continue
+
+        report.start(speech_file.stem)
         try:
             print(f"Processing batch file {i+1}/{len(speech_files)}: {speech_file.name}")
 
             # Read the speech content
             speech_content = pd.read_pickle(speech_file)
+            count_input(speech_file)
 
             # Ensure compatibility with PyArrow
             for col in speech_content.columns:
@@ -211,8 +230,8 @@ def main():
             )
 
             # Save the matched speeches
-            output_file = SPEECH_CONTENT_STAGE_03 / speech_file.name
-            speech_content_matched.to_pickle(output_file)
+            write_pickle(speech_content_matched, output_file)
+            count_output(output_file, len(speech_content_matched))
 
             # Update statistics
             file_speeches = len(speech_content)
@@ -220,6 +239,7 @@ def main():
 
             total_speeches += file_speeches
             matched_speeches += file_matched
+            journal.complete(speech_file.name, key, speeches=file_speeches, matched=file_matched)
 
             match_percentage = (file_matched / file_speeches * 100) if file_speeches > 0 else 0
             print(f"  + Matched {file_matched} of {file_speeches} speeches in this batch ({match_percentage:.1f}%)")
@@ -228,6 +248,10 @@ def main():
             print(f"  Error processing {speech_file.name}: {e}")
             import traceback
             traceback.print_exc()
+            failed = True
+    report.finish()
+    if not failed:
+        journal.finish()
 
     # Calculate overall match percentage
     overall_match_percentage = (matched_speeches / total_speeches * 100) if total_speeches > 0 else 0
@@ -254,14 +278,16 @@ def main():
             # Create the full combined CSV
             combined_df = pd.concat(all_processed, ignore_index=True)
             combined_output = FINAL_DIR / "speeches_matched.csv"
-            combined_df.to_csv(combined_output, index=False, encoding="utf-8")
+            with atomic_output(combined_output) as temp_path:
+                combined_df.to_csv(temp_path, index=False, encoding="utf-8")
             print(f"Full combined data saved to {combined_output}")
 
             # Create a smaller sample CSV for easy viewing
             sample_size = min(5000, len(combined_df))
             sample_df = combined_df.sample(sample_size, random_state=42) if len(combined_df) > sample_size else combined_df
             sample_output = FINAL_DIR / "speeches_matched_sample.csv"
-            sample_df.to_csv(sample_output, index=False, encoding="utf-8")
+            with atomic_output(sample_output) as temp_path:
+                sample_df.to_csv(temp_path, index=False, encoding="utf-8")
             print(f"Sample data ({sample_size} records) saved to {sample_output}")
 
             # Create a streamlit-friendly version
@@ -269,13 +295,15 @@ def main():
             # Truncate speech_text to prevent display issues in Streamlit
             streamlit_df['speech_text'] = streamlit_df['speech_text'].str.slice(0, 200) + '...'
             streamlit_output = FINAL_DIR / "speeches_streamlit.csv"
-            streamlit_df.to_csv(streamlit_output, index=False, encoding="utf-8")
+            with atomic_output(streamlit_output) as temp_path:
+                streamlit_df.to_csv(temp_path, index=False, encoding="utf-8")
             print(f"Streamlit-friendly data saved to {streamlit_output}")
     except Exception as e:
         print(f"Error creating combined output: {e}")
         import traceback
         traceback.print_exc()
 
+    report.save()
     return True
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
-import regex
 from pathlib import Path
 
+from od_lib.helper_functions import classify
+
 def main():
     # Use a simpler, relative path structure
     ROOT_DIR = Path.cwd()  # Current working directory
@@ -43,6 +44,7 @@ def main():
     mps = pd.read_pickle(mps_path)
     mgs = pd.read_pickle(mgs_path)
     factions = pd.read_pickle(factions_path)
+    faction_id_of = classify.faction_id_map(factions)
 
     # Define election years for mapping to electoral terms
     electoral_terms_dict = {
@@ -56,40 +58,8 @@ def main():
         ],
     }
 
-    # Define faction patterns for matching
-    faction_patterns = {
-        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/Die Grünen",
-        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",
-        "BP": r"^BP",
-        "DA": r"^DA",
-        "DP": r"^DP",
-        "DIE LINKE.": r"DIE LINKE",
-        "DPB": r"(?:^DPB)",
-        "DRP": r"DRP(\-Hosp\.)?|SRP",
-        "DSU": r"^DSU",
-        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
-        "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
-        "FU": r"^FU",
-        "FVP": r"^FVP",
-        "Gast": r"Gast",
-        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
-        "KPD": r"^KPD",
-        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
-        "SSW": r"^SSW",
-        "SRP": r"^SRP",
-        "WAV": r"^WAV",
-        "Z": r"^Z$",
-        "DBP": r"^DBP$",
-        "NR": r"^NR$",
-    }
-
-    # Function to match faction abbreviation
-    def get_faction_abbrev(faction, patterns):
-        for faction_abbrev, faction_pattern in patterns.items():
-            if regex.search(faction_pattern, faction):
-                return faction_abbrev
-        return None
+    # Define the faction classifier for matching
+    faction_classifier = classify.classifier("politicians")
 
     # Function to get electoral term from years
     def get_electoral_term(from_year=None, to_year=None):
@@ -161,15 +131,8 @@ def main():
             faction = "FDP"
 
         # Get faction ID from abbreviation
-        faction_abbrev = get_faction_abbrev(faction, faction_patterns)
-        if faction_abbrev:
-            matching_factions = factions.loc[factions["abbreviation"] == faction_abbrev, "id"]
-            if not matching_factions.empty:
-                faction_match = int(matching_factions.iloc[0])
-            else:
-                faction_match = -1
-        else:
-            faction_match = -1
+        faction_abbrev = faction_classifier.faction(faction)
+        faction_match = faction_id_of.get(faction_abbrev, -1)
 
         # Clean hyphens in first names
         first_name = [name.replace("-", " ") for name in first_name]
@@ -1,9 +1,13 @@
 import xml.etree.ElementTree as et
+import hashlib
 import re
 from pathlib import Path
 import dicttoxml
 import sys
 
+from od_lib.helper_functions.session_catalog import DOCUMENT_URL, SessionCatalog
+from od_lib.helper_functions.text_store import TextStoreWriter, store_path
+
 # Set default encoding
 sys.stdout.reconfigure(encoding="utf-8")
 
@@ -12,6 +16,10 @@ DATA_DIR = Path("./data")
 RAW_XML_DIR = DATA_DIR / "raw_xml"
 RAW_TXT_DIR = DATA_DIR / "raw_txt"
 RAW_TXT_DIR.mkdir(parents=True, exist_ok=True)
+# All sessions are packed into one text store instead of a directory per session
+RAW_TXT_STORE = store_path(RAW_TXT_DIR, "sessions")
+# Date, size and hash of every processed protocol, read by finalize_data.py
+SESSION_CATALOG = DATA_DIR / "cache" / "sessions.sqlite"
 
 def clean_text(text):
     """Clean text by handling various character encodings."""
@@ -33,89 +41,175 @@ def clean_text(text):
         text = text.replace(char, replacement)
     return text
 
-def extract_text_from_element(element):
-    """Recursively extract all text content from an element and its children."""
-    if element is None:
-        return ""
+# Sections of a protocol and the part of the text store they are written to
+SECTIONS = {"vorspann": "toc", "sitzungsverlauf": "session_content", "anlagen": "appendix"}
+META_TAGS = {"datum", "wahlperiode", "sitzungsnr"}
+CHUNK_SIZE = 1 << 20
 
-    text = element.text or ""
-    for child in element:
-        text += extract_text_from_element(child)
-        if child.tail:
-            text += child.tail
+def edges(text):
+    """Leading and trailing whitespace of a text, all of it if it is blank."""
+    if not text.strip():
+        return text
+    return text[:len(text) - len(text.lstrip())] + text[len(text.rstrip()):]
 
-    return text
+class ProtocolText:
+    """Parser target collecting the text of a protocol in a single pass.
 
-def process_xml_file(xml_file_path):
-    """Process a single XML file and extract its contents."""
-    print(f"Processing {xml_file_path.name}")
+    The parser reports the text in document order, so no tree is built. Every
+    open element whose text is needed (the first vorspann, sitzungsverlauf
+    and anlagen, rede elements outside of the session, plenarprotokoll-nummer)
+    gets a list of text fragments, which is only joined when it ends. The text
+    of the whole document is only kept for the fallback until a non-empty
+    session or speech was found.
+    """
 
-    try:
-        # Parse the XML file
-        tree = et.parse(xml_file_path)
-        root = tree.getroot()
+    def __init__(self):
+        self.depth = 0
+        self.sections = {}
+        self.speeches = []
+        self.session_found = False
+        # [depth, kind, fragments] of the open elements whose text is collected
+        self.collecting = []
+        # Open sections whose text is not part of the fallback document
+        self.excluded = 0
+        self.document = []
+        # Text of the first element of every meta data tag, the one of the
+        # open meta data element is read until its first child starts
+        self.meta = {}
+        self.meta_open = None
+        self.document_number = None
+        # date attribute of the first datum element, e.g. 24.10.2017
+        self.date = None
+
+    def data(self, text):
+        if self.meta_open is not None:
+            self.meta_open[2].append(text)
+        for _, _, fragments in self.collecting:
+            fragments.append(text)
+        if self.document is not None and not self.excluded:
+            self.document.append(text)
+
+    def close_meta(self):
+        tag, date, fragments = self.meta_open
+        self.meta_open = None
+        # Like element.text, None without any text
+        text = "".join(fragments) or None
+        if tag == "datum":
+            self.date = date
+            text = text or date or ""
+        self.meta[tag] = text
+
+    def start(self, tag, attrib):
+        if self.meta_open is not None:
+            self.close_meta()
+        self.depth += 1
+        # Like find(".//tag"), the root element itself is never matched
+        if self.depth == 1:
+            return
+
+        if tag in META_TAGS:
+            if tag not in self.meta:
+                self.meta[tag] = None
+                self.meta_open = [tag, attrib.get("date"), []]
+            return
+        kinds = [kind for _, kind, _ in self.collecting]
+        if tag in SECTIONS:
+            kind = SECTIONS[tag]
+            if kind in self.sections or kind in kinds:
+                return
+            if kind != "session_content":
+                self.excluded += 1
+        elif tag == "rede":
+            # Speeches inside the session are part of its text anyway
+            if "session_content" in kinds or self.session_found:
+                return
+            kind = len(self.speeches)
+            self.speeches.append("")
+        elif tag == "plenarprotokoll-nummer" and self.document_number is None:
+            kind = "document_number"
+            self.document_number = ""
+        else:
+            return
+        self.collecting.append([self.depth, kind, []])
 
-        # Extract metadata
+    def end(self, tag):
+        if self.meta_open is not None:
+            self.close_meta()
+        if self.collecting and self.collecting[-1][0] == self.depth:
+            _, kind, fragments = self.collecting.pop()
+            text = "".join(fragments)
+            if kind == "document_number":
+                self.document_number = text.strip()
+            elif isinstance(kind, int):
+                self.speeches[kind] = text.strip()
+                if self.speeches[kind]:
+                    self.document = None
+            else:
+                self.sections[kind] = text.strip()
+                if kind != "session_content":
+                    self.excluded -= 1
+                    # The section is cut out of the document, the whitespace
+                    # around it stays
+                    if self.document is not None and not self.excluded:
+                        self.document.append(edges(text))
+                elif self.sections[kind]:
+                    self.session_found = True
+                    self.document = None
+        self.depth -= 1
+
+    def close(self):
+        """Returns toc, session content, appendix and meta data."""
         meta_data = {
-            "document_number": "",
-            "date": ""
+            "document_number": self.document_number or "",
+            "date": self.meta.get("datum") or "",
         }
+        if not meta_data["document_number"]:
+            if "wahlperiode" in self.meta and "sitzungsnr" in self.meta:
+                meta_data["document_number"] = (
+                    f"{self.meta['wahlperiode']}/{self.meta['sitzungsnr']}"
+                )
 
-        # Extract document number and date from plenarprotokoll-nummer or wahlperiode/sitzungsnr
-        plenarprotokoll_nummer = root.find(".//plenarprotokoll-nummer")
-        if plenarprotokoll_nummer is not None:
-            meta_data["document_number"] = extract_text_from_element(plenarprotokoll_nummer).strip()
-
-        # Try to get wahlperiode and sitzungsnr
-        wahlperiode = root.find(".//wahlperiode")
-        sitzungsnr = root.find(".//sitzungsnr")
-        if wahlperiode is not None and sitzungsnr is not None:
-            if not meta_data["document_number"]:
-                meta_data["document_number"] = f"{wahlperiode.text}/{sitzungsnr.text}"
-
-        # Get the date
-        datum = root.find(".//datum")
-        if datum is not None:
-            meta_data["date"] = datum.text if datum.text else (datum.get("date") or "")
-
-        # Initialize sections with empty strings
-        toc = ""
-        session_content = ""
-        appendix = ""
-
-        # Extract table of contents (vorspann section)
-        vorspann = root.find(".//vorspann")
-        if vorspann is not None:
-            toc = extract_text_from_element(vorspann).strip()
-
-        # Extract session content (sitzungsverlauf section)
-        sitzungsverlauf = root.find(".//sitzungsverlauf")
-        if sitzungsverlauf is not None:
-            session_content = extract_text_from_element(sitzungsverlauf).strip()
-
-        # Extract appendix (anlagen section)
-        anlagen = root.find(".//anlagen")
-        if anlagen is not None:
-            appendix = extract_text_from_element(anlagen).strip()
+        toc = self.sections.get("toc", "")
+        appendix = self.sections.get("appendix", "")
+        session_content = self.sections.get("session_content", "")
 
         # If there's no clear structure, try to extract content from rede elements
         if not session_content:
-            speeches = []
-            for rede in root.findall(".//rede"):
-                speech_text = extract_text_from_element(rede).strip()
-                if speech_text:
-                    speeches.append(speech_text)
+            session_content = "\n\n".join(speech for speech in self.speeches if speech)
 
-            if speeches:
-                session_content = "\n\n".join(speeches)
+        # If still no content, use the entire document without toc and appendix
+        if not session_content and self.document is not None:
+            session_content = "".join(self.document).strip()
 
-        # If still no content, use the entire document as session content
-        if not session_content:
-            session_content = extract_text_from_element(root).strip()
-            if toc:
-                session_content = session_content.replace(toc, "", 1).strip()
-            if appendix:
-                session_content = session_content.replace(appendix, "", 1).strip()
+        return toc, session_content, appendix, meta_data
+
+def parse_protocol(xml_file_path):
+    """Streams a protocol through the parser in chunks and returns toc,
+    session content, appendix, meta data and date, size and hash of the
+    protocol for the session catalog."""
+    target = ProtocolText()
+    parser = et.XMLParser(target=target)
+    digest = hashlib.sha256()
+    size = 0
+    with open(xml_file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            parser.feed(chunk)
+    toc, session_content, appendix, meta_data = parser.close()
+    source = {
+        "date": target.date or meta_data["date"],
+        "xml_size": size,
+        "xml_sha256": digest.hexdigest(),
+    }
+    return toc, session_content, appendix, meta_data, source
+
+def process_xml_file(xml_file_path, writer, catalog):
+    """Process a single XML file and extract its contents."""
+    print(f"Processing {xml_file_path.name}")
+
+    try:
+        toc, session_content, appendix, meta_data, source = parse_protocol(xml_file_path)
 
         # Clean the text
         toc = clean_text(toc.replace("\r", ""))
@@ -123,15 +217,27 @@ def process_xml_file(xml_file_path):
         appendix = clean_text(appendix.replace("\r", ""))
 
         # Save results
-        save_path = RAW_TXT_DIR / xml_file_path.stem
-        save_path.mkdir(parents=True, exist_ok=True)
+        writer.add(xml_file_path.stem, {
+            "toc": toc,
+            "session_content": session_content,
+            "appendix": appendix,
+            "meta_data": dicttoxml.dicttoxml(meta_data),
+        })
 
-        (save_path / "toc.txt").write_text(toc, encoding="utf-8")
-        (save_path / "session_content.txt").write_text(session_content, encoding="utf-8")
-        (save_path / "appendix.txt").write_text(appendix, encoding="utf-8")
-        (save_path / "meta_data.xml").write_bytes(dicttoxml.dicttoxml(meta_data))
+        # Protocols are named after the session, e.g. 20001.xml
+        if xml_file_path.stem.isdigit():
+            electoral_term = int(xml_file_path.stem[:-3])
+            session_number = int(xml_file_path.stem[-3:])
+            catalog.add({
+                "session": int(xml_file_path.stem),
+                "electoral_term": electoral_term,
+                "session_number": session_number,
+                "document_url": DOCUMENT_URL.format(electoral_term, session_number),
+                "text_size": len(session_content.encode("utf-8")),
+                **source,
+            })
 
-        print(f"  ✅ Saved parsed output to {save_path}")
+        print(f"  ✅ Added parsed output to {RAW_TXT_STORE}")
         return True
 
     except Exception as e:
@@ -143,10 +249,11 @@ def process_xml_file(xml_file_path):
 # Process each XML file
 successful = 0
 failed = 0
-for xml_file_path in RAW_XML_DIR.glob("*.xml"):
-    if process_xml_file(xml_file_path):
-        successful += 1
-    else:
-        failed += 1
+with TextStoreWriter(RAW_TXT_STORE) as writer, SessionCatalog(SESSION_CATALOG) as catalog:
+    for xml_file_path in sorted(RAW_XML_DIR.glob("*.xml")):
+        if process_xml_file(xml_file_path, writer, catalog):
+            successful += 1
+        else:
+            failed += 1
 
 print(f"\nProcessing complete. Successfully processed {successful} files, {failed} failed.")
@@ -1,40 +1,72 @@
-#import od_lib.definitions.path_definitions as path_definitions
-import requests
-import io
+import od_lib.definitions.path_definitions as path_definitions
+from od_lib.helper_functions.download import Downloader, summary
+import argparse
 import zipfile
 import regex
+import sys
 
 # output directory
-RAW_XML = path_definitions.RAW_XML
+RAW_ZIP = path_definitions.RAW_ZIP
+
+BASE_URL = "https://www.bundestag.de"
 
 zip_links = [
-    "https://www.bundestag.de/resource/blob/490392/90738376bb195628b95d117ab5392cfe/pp20-data.zip",
+    "/resource/blob/490392/90738376bb195628b95d117ab5392cfe/pp20-data.zip",
 
 ]
 
+mp_base_data_link = "/resource/blob/472878/7d4d417dbb7f7bd44508b3dc5de08ae2/MdB-Stammdaten-data.zip"  # noqa: E501
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download the protocol archives and the MP base data."
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Parallel downloads.")
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Also ask the server whether already downloaded archives changed.",
+    )
+    parser.add_argument("--base-url", default=BASE_URL, help="e.g. a local test server.")
+    args = parser.parse_args()
 
-for link in zip_links:
-    # Extract election period from URL
-    electoral_term_str = "electoral_term_" + regex.search(
+    RAW_ZIP.mkdir(parents=True, exist_ok=True)
+    downloader = Downloader(path_definitions.DATA_RAW, workers=args.workers)
+
+    # The archives are stored as they are, the splitters read the protocols
+    # straight from them (see helper_functions/raw_data.py).
+    files = []
+    for link in zip_links:
+        # Extract election period from URL
+        electoral_term_str = "electoral_term_" + regex.search(
             r"(?<=pp)\d+(?=-data\.zip)", link
         ).group(0)
-    print(f"Download & unzip '{electoral_term_str}'...", end="", flush=True)
-    r = requests.get(link)
-    with zipfile.ZipFile(io.BytesIO(r.content)) as z:
-        save_path = RAW_XML / electoral_term_str
-        save_path.mkdir(parents=True, exist_ok=True)
-        z.extractall(save_path)
-    print("Done.")
+        files.append((args.base_url + link, f"{RAW_ZIP.name}/{electoral_term_str}.zip"))
+    results, failures = downloader.fetch_all(
+        files, revalidate=args.revalidate, prefix="Download archives..."
+    )
+    print(summary(results))
 
+    # Download MDB Stammdaten, the server is asked on every run whether it changed.
+    print("Download & unzip 'MP_BASE_DATA'...", end="", flush=True)
+    mp_base_data_path = path_definitions.MP_BASE_DATA.parent
+    name = f"{mp_base_data_path.name}/MdB-Stammdaten-data.zip"
+    try:
+        status = downloader.fetch(args.base_url + mp_base_data_link, name, revalidate=True)
+    except Exception as error:
+        failures[name] = error
+    else:
+        if status != "unchanged" or not path_definitions.MP_BASE_DATA.exists():
+            with zipfile.ZipFile(path_definitions.DATA_RAW / name) as z:
+                z.extractall(mp_base_data_path)
+    downloader.save()
+    print("Done.")
 
-# Download MDB Stammdaten.
-mp_base_data_link = "https://www.bundestag.de/resource/blob/472878/7d4d417dbb7f7bd44508b3dc5de08ae2/MdB-Stammdaten-data.zip"  # noqa: E501
+    for name, error in failures.items():
+        print(f"{name} failed: {error}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
 
-print("Download & unzip 'MP_BASE_DATA'...", end="", flush=True)
-r = requests.get(mp_base_data_link)
-with zipfile.ZipFile(io.BytesIO(r.content)) as z:
-    mp_base_data_path = path_definitions.DATA_RAW / "MP_BASE_DATA"
-    mp_base_data_path.mkdir(parents=True, exist_ok=True)
-    z.extractall(mp_base_data_path)
-print("Done.")
 
+if __name__ == "__main__":
+    main()
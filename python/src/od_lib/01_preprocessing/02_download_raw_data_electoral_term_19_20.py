@@ -1,41 +1,38 @@
 from bs4 import BeautifulSoup
 import od_lib.definitions.path_definitions as path_definitions
-from od_lib.helper_functions.progressbar import progressbar
-import requests
+from od_lib.helper_functions.download import Downloader, summary
+import argparse
 import regex
+import sys
 
 # output directory
 ELECTORAL_TERM_19_20_OUTPUT = path_definitions.ELECTORAL_TERM_19_20_STAGE_01
-ELECTORAL_TERM_19_20_OUTPUT.mkdir(parents=True, exist_ok=True)
+
+BASE_URL = "https://www.bundestag.de"
 
 election_periods = [
     {
         "election_period": 19,
-        "url": "https://www.bundestag.de/ajax/filterlist/de/services/opendata/543410-543410?offset={}",  # noqa
+        "url": "/ajax/filterlist/de/services/opendata/543410-543410?offset={}",
     },
     {
         "election_period": 20,
-        "url": "https://www.bundestag.de/ajax/filterlist/de/services/opendata/866354-866354?offset={}",  # noqa
+        "url": "/ajax/filterlist/de/services/opendata/866354-866354?offset={}",
     },
 ]
 
 
+def remove_sub_tags(content):
+    return content.replace(b"<sub>", b"").replace(b"</sub>", b"")
 
-for election_period in election_periods:
-    print(
-        f"Scraping links for term {election_period['election_period']}...",
-        end="",
-        flush=True,
-    )
-    OUTPUT_PATH = ELECTORAL_TERM_19_20_OUTPUT / "electoral_term_{}".format(
-        election_period["election_period"]
-    )
-    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+
+def scrape_links(session, url):
+    """Pages through the filterlist and returns the links to the xml files."""
     offset = 0
     xml_links = []
     while True:
-        URL = election_period["url"].format(str(offset))
-        page = requests.get(URL, headers={"User-Agent": "Mozilla/5.0"})
+        page = session.get(url.format(str(offset)))
+        page.raise_for_status()
         soup = BeautifulSoup(page.text, "html.parser")
         # scrape for links
         current_links = list(soup.find_all("a", attrs={"href": regex.compile("xml$")}))
@@ -44,21 +41,56 @@ for election_period in election_periods:
             offset += len(current_links)
         else:
             break
-    print("Done.")
-
-    for link in progressbar(
-        xml_links,
-        f"Download XML-files for term {election_period['election_period']}...",
-    ):
-        url = "https://www.bundestag.de" + link.get("href")
-        page = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        session = regex.search(r"\d{5}(?=\.xml)", url).group(0)
-
-        with open(OUTPUT_PATH / (session + ".xml"), "w") as file:
-            file.write(
-                regex.sub(
-                    "</sub>",
-                    "",
-                    regex.sub("<sub>", "", page.content.decode("utf-8")),
-                )
-            )
+    return [link.get("href") for link in xml_links]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Download the xml protocols of the electoral terms 19 and 20."
+    )
+    parser.add_argument(
+        "electoral_terms", nargs="*", type=int, help="Electoral terms (default: all)."
+    )
+    parser.add_argument("--workers", type=int, default=8, help="Parallel downloads.")
+    parser.add_argument(
+        "--revalidate",
+        action="store_true",
+        help="Also ask the server whether already downloaded protocols changed.",
+    )
+    parser.add_argument("--base-url", default=BASE_URL, help="e.g. a local test server.")
+    args = parser.parse_args()
+
+    ELECTORAL_TERM_19_20_OUTPUT.mkdir(parents=True, exist_ok=True)
+    downloader = Downloader(ELECTORAL_TERM_19_20_OUTPUT, workers=args.workers)
+    failed = False
+    for election_period in election_periods:
+        term_number = election_period["election_period"]
+        if args.electoral_terms and term_number not in args.electoral_terms:
+            continue
+
+        print(f"Scraping links for term {term_number}...", end="", flush=True)
+        hrefs = scrape_links(downloader.session, args.base_url + election_period["url"])
+        print("Done.")
+
+        files = []
+        for href in hrefs:
+            url = href if href.startswith("http") else args.base_url + href
+            session = regex.search(r"\d{5}(?=\.xml)", url).group(0)
+            files.append((url, f"electoral_term_{term_number}/{session}.xml"))
+
+        results, failures = downloader.fetch_all(
+            files,
+            revalidate=args.revalidate,
+            transform=remove_sub_tags,
+            prefix=f"Download XML-files for term {term_number}...",
+        )
+        print(summary(results))
+        for name, error in failures.items():
+            print(f"{name} failed: {error}", file=sys.stderr)
+        failed = failed or bool(failures)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from od_lib.helper_functions.build_cache import write_pickle
 import od_lib.definitions.path_definitions as path_definitions
 import pandas as pd
 import xml.etree.ElementTree as et
@@ -110,5 +111,5 @@ mps = pd.DataFrame(mps)
 mps["constituency"] = mps["constituency"].str.replace("[)(]", "", regex=True)
 mps = mps.astype(dtype={"ui": "int64", "birth_date": "str", "death_date": "str"})
 
-mps.to_pickle(save_path)
+write_pickle(mps, save_path)
 print("Done.")
@@ -1,3 +1,4 @@
+from od_lib.helper_functions.build_cache import write_pickle
 import od_lib.definitions.path_definitions as path_definitions
 import pandas as pd
 import numpy as np
@@ -27,4 +28,4 @@ unique_factions = np.append(
 unique_factions = pd.DataFrame(unique_factions, columns=["faction_name"])
 
 save_path_factions = FACTIONS_STAGE_01 / "factions.pkl"
-unique_factions.to_pickle(save_path_factions)
+write_pickle(unique_factions, save_path_factions)
@@ -1,3 +1,4 @@
+from od_lib.helper_functions.build_cache import write_pickle
 import od_lib.definitions.path_definitions as path_definitions
 import pandas as pd
 import numpy as np
@@ -70,4 +71,4 @@ for abbrev, id in zip(unique_abbreviations, faction_ids):
     factions.loc[factions["abbreviation"] == abbrev, "id"] = id
 
 # save the dataframe
-factions.to_pickle(DATA_FINAL / "factions.pkl")
+write_pickle(factions, DATA_FINAL / "factions.pkl")
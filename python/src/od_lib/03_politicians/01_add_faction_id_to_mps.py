@@ -1,3 +1,4 @@
+from od_lib.helper_functions.build_cache import write_pickle
 import od_lib.definitions.path_definitions as path_definitions
 import pandas as pd
 
@@ -16,4 +17,4 @@ mps.insert(2, "faction_id", -1)
 for faction_name, faction_id in zip(factions["faction_name"], factions["id"]):
     mps.loc[mps["institution_name"] == faction_name, "faction_id"] = faction_id
 
-mps.to_pickle(POLITICIANS_OUTPUT / "mps.pkl")
+write_pickle(mps, POLITICIANS_OUTPUT / "mps.pkl")
@@ -1,3 +1,4 @@
+from od_lib.helper_functions.build_cache import write_pickle
 from bs4 import BeautifulSoup
 import od_lib.definitions.path_definitions as path_definitions
 import pandas as pd
@@ -143,4 +144,4 @@ for div in main_section.find_all("div", recursive=False):
 
 mgs = pd.DataFrame(mgs)
 save_path = POLITICIANS_STAGE_01 / "mgs.pkl"
-mgs.to_pickle(save_path)
+write_pickle(mgs, save_path)
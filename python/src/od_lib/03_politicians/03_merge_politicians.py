@@ -1,7 +1,7 @@
 import od_lib.definitions.path_definitions as path_definitions
+from od_lib.helper_functions import classify, patterns
 from od_lib.helper_functions.progressbar import progressbar
 import pandas as pd
-import regex
 
 # input directory
 MGS_PATH = path_definitions.POLITICIANS_STAGE_01
@@ -57,41 +57,9 @@ electoral_terms_dict = {
     ],
 }
 
-faction_patterns = {
-    "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/Die Grünen",  # noqa: E501
-    "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
-    "BP": r"^BP",
-    "DA": r"^DA",
-    "DP": r"^DP",
-    "DIE LINKE.": r"DIE LINKE",
-    "DPB": r"(?:^DPB)",
-    "DRP": r"DRP(\-Hosp\.)?|SRP",
-    "DSU": r"^DSU",
-    "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
-    "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
-    "FU": r"^FU",
-    "FVP": r"^FVP",
-    "Gast": r"Gast",
-    "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
-    "KPD": r"^KPD",
-    "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-    "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
-    "SSW": r"^SSW",
-    "SRP": r"^SRP",
-    "WAV": r"^WAV",
-    "Z": r"^Z$",
-    "DBP": r"^DBP$",
-    "NR": r"^NR$",
-}
-
-
-def get_faction_abbrev(faction, faction_patterns):
-    """matches the given faction and returns an id"""
-
-    for faction_abbrev, faction_pattern in faction_patterns.items():
-        if regex.search(faction_pattern, faction):
-            return faction_abbrev
-    return None
+faction_classifier = classify.classifier("politicians")
+faction_id_of = classify.faction_id_map(factions)
+hyphen_pattern = patterns.register("merge_politicians.hyphen", "-")
 
 
 def get_electoral_term(from_year=None, to_year=None):
@@ -169,16 +137,11 @@ for (
     elif last_name == "Kinkel" and first_name[0] == "Klaus":
         faction = "FDP"
 
-    faction_abbrev = get_faction_abbrev(faction, faction_patterns)
+    faction_abbrev = faction_classifier.faction(faction)
 
-    if faction_abbrev:
-        faction_match = int(
-            factions.loc[factions["abbreviation"] == faction_abbrev, "id"].iloc[0]
-        )
-    else:
-        faction_match = -1
+    faction_match = faction_id_of.get(faction_abbrev, -1)
 
-    first_name = [regex.sub("-", " ", name) for name in first_name]
+    first_name = [hyphen_pattern.sub(" ", name) for name in first_name]
 
     electoral_term_to_be_changed = -1
     electoral_terms = get_electoral_term(
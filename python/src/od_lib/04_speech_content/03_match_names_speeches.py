@@ -1,8 +1,20 @@
-from od_lib.helper_functions.match_names import insert_politician_id_into_speech_content
+from od_lib.helper_functions.match_names import (
+    PoliticianIndex,
+    insert_politician_id_into_speech_content,
+)
+from od_lib.helper_functions import speeches
+from od_lib.helper_functions.build_cache import BuildManifest
+from od_lib.helper_functions.session_pool import (
+    parse_args,
+    report_failures,
+    run_sessions,
+    selected,
+)
+from od_lib.helper_functions.stage_storage import get_storage
 import od_lib.definitions.path_definitions as path_definitions
-from od_lib.helper_functions.progressbar import progressbar
-import pandas as pd
+from functools import lru_cache
 import regex
+import sys
 
 # input directory
 SPEECH_CONTENT_INPUT = path_definitions.SPEECH_CONTENT_STAGE_02
@@ -10,73 +22,99 @@ DATA_FINAL = path_definitions.DATA_FINAL
 
 # output directory
 SPEECH_CONTENT_OUTPUT = path_definitions.SPEECH_CONTENT_STAGE_03
-SPEECH_CONTENT_OUTPUT.mkdir(parents=True, exist_ok=True)
-
-# MDBS
-politicians = pd.read_csv(DATA_FINAL / "politicians.csv")
-politicians = politicians.loc[
-    :,
-    [
-        "ui",
-        "electoral_term",
-        "faction_id",
-        "first_name",
-        "last_name",
-        "gender",
-        "profession",
-        "constituency",
-        "institution_type",
-    ],
-].copy()
-
-politicians = politicians.astype(dtype={"ui": "int64"})
-
-# Some cleaning to make matching easier.
-politicians["constituency"] = politicians["constituency"].fillna("")
-
-politicians["first_name"] = politicians["first_name"].str.lower()
-politicians["last_name"] = politicians["last_name"].str.lower()
-politicians["constituency"] = politicians["constituency"].str.lower()
-
-politicians["first_name"] = politicians["first_name"].str.replace("ß", "ss", regex=False)
-politicians["last_name"] = politicians["last_name"].str.replace("ß", "ss", regex=False)
-
-politicians["first_name"] = politicians["first_name"].apply(str.split)
-
-politicians["profession"] = politicians["profession"].str.lower()
-
-# iterate over all electoral_term_folders __________________________________________________
-for folder_path in sorted(SPEECH_CONTENT_INPUT.iterdir()):
-    working = []
-    if not folder_path.is_dir():
-        continue
-
-    term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
-    if term_number is None:
-        continue
-    term_number = int(term_number.group(0))
-
-    save_path = SPEECH_CONTENT_OUTPUT / folder_path.stem
-    save_path.mkdir(parents=True, exist_ok=True)
-
-    # Only select politicians of the election period.
-    politicians_electoral_term = politicians.loc[
-        politicians["electoral_term"] == term_number
-    ]
-    mgs_electoral_term = politicians_electoral_term.loc[
-        politicians_electoral_term["institution_type"] == "Regierungsmitglied"
-    ]
-
-    # iterate over every speech_content file
-    for speech_content_file in progressbar(
-        folder_path.glob("*.pkl"),
-        f"Match speaker names (term {term_number:>2})..."
-    ):
-        # read the spoken content pickle file
-        speech_content = pd.read_pickle(speech_content_file)
-
-        speech_content_matched, _ = insert_politician_id_into_speech_content(
-            speech_content, politicians_electoral_term, mgs_electoral_term, politicians
-        )
-
-        speech_content_matched.to_pickle(save_path / speech_content_file.name)
+
+# Reference table, loaded once per worker by load_reference_tables.
+politicians = None
+
+
+def load_reference_tables():
+    global politicians
+    politicians = speeches.load_politicians(DATA_FINAL / "politicians.csv")
+
+
+@lru_cache(maxsize=None)
+def politicians_of_term(term_number):
+    """The indexed politicians and government members of a term, built once
+    per worker."""
+    return tuple(map(PoliticianIndex, speeches.politicians_of_term(politicians, term_number)))
+
+
+def match_speeches(speech_content_file, term_number, output_path):
+    """Inserts the politician ids into the speeches of a session."""
+    storage = get_storage()
+    politicians_electoral_term, mgs_electoral_term = politicians_of_term(term_number)
+
+    # read the spoken content session file
+    speech_content = storage.read(speech_content_file)
+
+    speech_content_matched, _ = insert_politician_id_into_speech_content(
+        speech_content, politicians_electoral_term, mgs_electoral_term, politicians
+    )
+
+    storage.write(speech_content_matched, output_path)
+    return len(speech_content_matched)
+
+
+def main():
+    args = parse_args("Match the speaker names of the speeches with the politicians.")
+    SPEECH_CONTENT_OUTPUT.mkdir(parents=True, exist_ok=True)
+    storage = get_storage()
+
+    # Sessions are only matched again if their input, the matching code or the
+    # politicians changed.
+    manifest = BuildManifest(
+        SPEECH_CONTENT_OUTPUT,
+        code=[__file__, speeches, insert_politician_id_into_speech_content],
+        reference_files=[DATA_FINAL / "politicians.csv"],
+    )
+
+    # iterate over all electoral_term_folders ______________________________________________
+    tasks = []
+    keys = []
+    for folder_path in sorted(SPEECH_CONTENT_INPUT.iterdir()):
+        if not folder_path.is_dir():
+            continue
+
+        term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
+        if term_number is None:
+            continue
+        term_number = int(term_number.group(0))
+
+        if not selected(term_number, args.electoral_terms):
+            continue
+
+        save_path = SPEECH_CONTENT_OUTPUT / folder_path.stem
+        save_path.mkdir(parents=True, exist_ok=True)
+
+        # collect every changed speech_content file
+        for speech_content_file in storage.files(folder_path):
+            output_path = storage.path(save_path, speech_content_file.stem)
+            key = manifest.key(speech_content_file)
+            if manifest.is_current(output_path, key):
+                continue
+
+            tasks.append((speech_content_file, term_number, output_path))
+            keys.append(key)
+
+    # Finished sessions are recorded right away, so they are not matched again
+    # if the stage is interrupted.
+    def record(index, result):
+        if result is not None:
+            manifest.update(tasks[index][-1], keys[index])
+        return result
+
+    _, failures = run_sessions(
+        match_speeches,
+        tasks,
+        args.workers,
+        initializer=load_reference_tables,
+        prefix="Match speaker names...",
+        on_result=record,
+    )
+    manifest.save()
+
+    sys.exit(report_failures(failures))
+
+
+if __name__ == "__main__":
+    main()
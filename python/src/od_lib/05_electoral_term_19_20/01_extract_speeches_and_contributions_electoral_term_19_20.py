@@ -1,4 +1,7 @@
+from od_lib.helper_functions import classify, patterns
+from od_lib.helper_functions.build_cache import write_pickle
 from od_lib.helper_functions.extract_contributions import extract
+from od_lib.helper_functions.stage_storage import get_storage
 import od_lib.definitions.path_definitions as path_definitions
 from od_lib.helper_functions.progressbar import progressbar
 import pandas as pd
@@ -9,7 +12,7 @@ import datetime
 
 
 # input directory
-ELECTORAL_TERM_19_20_INPUT = path_definitions.ELECTORAL_TERM_19_20_STAGE_02
+ELECTORAL_TERM_19_20_INPUT = path_definitions.ELECTORAL_TERM_19_20_STAGE_01
 FACTIONS = path_definitions.DATA_FINAL
 politicians = path_definitions.DATA_FINAL
 
@@ -22,78 +25,21 @@ ELECTORAL_TERM_19_20_OUTPUT.mkdir(parents=True, exist_ok=True)
 CONTRIBUTIONS_SIMPLIFIED.mkdir(parents=True, exist_ok=True)
 CONTRIBUTIONS_EXTENDED.mkdir(parents=True, exist_ok=True)
 
-faction_patterns = {
-    "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?",  # noqa: E501
-    "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
-    "BP": r"^BP",
-    "DA": r"^DA",
-    "DP": r"^DP",
-    "DIE LINKE.": r"DIE LINKE",
-    "DPB": r"^DPB",
-    "DRP": r"DRP(\-Hosp\.)?|^SRP|^DBP",
-    "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
-    "Fraktionslos": r"(?:fraktionslos|Parteilos)",
-    "FU": r"^FU",
-    "FVP": r"^FVP",
-    "Gast": r"Gast",
-    "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
-    "KPD": r"^KPD",
-    "NR": r"^NR$",
-    "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
-    "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
-    "SSW": r"^SSW",
-    "SRP": r"^SRP",
-    "WAV": r"^WAV",
-    "Z": r"^Z$",
-    "AfD": r"^AfD$",
-    "DBP": r"^DBP$",
-}
-
-
-def get_position_short_and_long(position_raw):
-    """matches the given position_raw and returns the long and short version"""
-    if position_raw in faction_patterns.keys() or regex.match(
-        r"^[Bb]erichterstatter(in)?(\s|$|,|.)", position_raw
-    ):
-        return (
-            "Member of Parliament",
-            None if position_raw in faction_patterns.keys() else position_raw,
-        )
-    elif (
-        regex.match(r"^[Bb]undestagspräsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Aa]lterspräsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Vv]izebundestagspräsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Ss]chriftführer(in)?(\s|$|,|.)", position_raw)
-        or position_raw.lower()
-        in [
-            "präsidentin",
-            "präsident",
-            "präsident des deutschen bundestages",
-            "präsidentin des deutschen bundestages",
-            "vizepräsidentin",
-            "vizepräsident",
-        ]
-    ):
-        return "Presidium of Parliament", position_raw
-    elif (
-        regex.match(r"^[Bb]undespräsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Mm]inisterpräsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Ss]taatsminister(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Ss]enator(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Pp]räsident(in)?(\s|$|,|.)", position_raw)
-        or regex.match(r"^[Gg]ast", position_raw)
-    ):
-        return "Guest", position_raw
-    elif regex.match(r"^[Bb]undeskanzler(in)?(\s|$|,|.)", position_raw):
-        return "Chancellor", None
-    elif regex.match(r"^(Bundes)?[Mm]inister(in)?(\s|$|,|.)", position_raw):
-        return "Minister", position_raw
-    elif regex.match(
-        r"^([Pp]arl\s*\.\s+)?[Ss]taatssekretär(in)?(\s|$|,|.)", position_raw
-    ):
-        return "Secretary of State", position_raw
-    else:
-        return "Not found", None
+storage = get_storage()
+
+# Unlike the terms 1 to 18, a "Ministerpräsident" is a guest.
+faction_classifier = classify.classifier(
+    "electoral_term_19_20",
+    guest_positions=(
+        "bundespraesident",
+        "ministerpraesident",
+        "staatsminister",
+        "senator",
+        "praesident",
+        "gast",
+    ),
+)
+colon_pattern = patterns.register("electoral_term_19_20.colon", ":")
 
 
 def get_first_last(name):
@@ -109,37 +55,48 @@ def get_first_last(name):
         last_name = "ERROR"
     return " ".join(first_name), last_name
 
+
 def find_with_default(node, key, default):
     result = node.find(key)
     return default if result is None else result.text
 
-def get_faction_abbrev(faction, faction_patterns):
-    """matches the given faction and returns an id"""
 
-    for faction_abbrev, faction_pattern in faction_patterns.items():
-        if regex.search(faction_pattern, faction):
-            return faction_abbrev
-    return None
+def iter_speeches(xml_file_path, meta_data):
+    """Streams a protocol and yields the rede elements of the agenda items of
+    its session (sitzungsverlauf/tagesordnungspunkt/rede). Every element is
+    cleared after it was processed, so only one speech is held in memory. The
+    attributes of the rednerliste are added to meta_data when it is reached."""
+    path = []
+    session_found = False
+    meta_data_found = False
+    in_session = False
+    for event, element in et.iterparse(xml_file_path, events=("start", "end")):
+        if event == "start":
+            path.append(element.tag)
+            # Only the first sitzungsverlauf and rednerliste below the root
+            # count, as with root.find().
+            if len(path) == 2 and element.tag == "sitzungsverlauf" and not session_found:
+                session_found = in_session = True
+            elif len(path) == 2 and element.tag == "rednerliste" and not meta_data_found:
+                meta_data_found = True
+                meta_data.update(element.attrib)
+            continue
 
+        in_speech = in_session and path[2:4] == ["tagesordnungspunkt", "rede"]
+        if in_speech and len(path) == 4:
+            yield element
+            element.clear()
+        elif not in_speech:
+            element.clear()
+        if len(path) == 2:
+            in_session = False
+        path.pop()
 
-speech_content_id = 1000000
 
-speech_content = pd.DataFrame(
-    {
-        "id": [],
-        "session": [],
-        "first_name": [],
-        "last_name": [],
-        "faction_id": [],
-        "position_short": [],
-        "position_long": [],
-        "politician_id": [],
-        "speech_content": [],
-        "date": [],
-    }
-)
+speech_content_id = 1000000
 
 factions = pd.read_pickle(FACTIONS / "factions.pkl")
+faction_id_of = classify.faction_id_map(factions)
 
 politicians = pd.read_csv(politicians / "politicians.csv")
 politicians["last_name"] = politicians["last_name"].str.lower()
@@ -173,226 +130,193 @@ for folder_path in sorted(ELECTORAL_TERM_19_20_INPUT.iterdir()):
         politicians["electoral_term"] == term_number
     ]
 
-    for session_path in progressbar(
-        folder_path.iterdir(),
+    for xml_file_path in progressbar(
+        sorted(folder_path.glob("*.xml")),
         f"Extract speeches (term {term_number:>2})...",
     ):
-        if not session_path.is_dir():
-            continue
+        session = regex.search(r"\d+", xml_file_path.stem).group()
 
         contributions_extended = []
-
-        session_content = et.parse(session_path / "session_content.xml")
-        meta_data = et.parse(session_path / "meta_data.xml")
-
-        date = meta_data.getroot().get("sitzung-datum")
-        # Wrong date in xml file. Fixing manually
-        if session_path.stem == "19158":
-            date = "07.05.2020"
-        date = (
-            datetime.datetime.strptime(date, "%d.%m.%Y") - datetime.datetime(1970, 1, 1)
-        ).total_seconds()
-
-        root = session_content.getroot()
-
-        tops = root.findall("tagesordnungspunkt")
-
-        id_Counter = 0
-
-        for top in tops:
-            speeches = top.findall("rede")
-            for speech in speeches:
-                speaker = speech[0].find("redner")
-                if speaker is None:
-                    continue
-                try:
-                    speaker_id = int(speaker.get("id"))
-                except (ValueError, AttributeError):
-                    speaker_id = -1
-                name = speaker.find("name")
-                first_name = find_with_default(name, "vorname", "")
-                last_name = find_with_default(name, "nachname", "")
-
-                position_raw = name.find("fraktion")
-                if position_raw is None:
-                    position_raw = name.find("rolle")
-                    if position_raw is not None:
-                        position_raw = find_with_default(position_raw, "rolle_lang", "")
-                    else:
-                        position_raw = ""
+        session_records = []
+        meta_data = {}
+
+        for speech in iter_speeches(xml_file_path, meta_data):
+            speaker = speech[0].find("redner")
+            if speaker is None:
+                continue
+            try:
+                speaker_id = int(speaker.get("id"))
+            except (ValueError, AttributeError):
+                speaker_id = -1
+            name = speaker.find("name")
+            first_name = find_with_default(name, "vorname", "")
+            last_name = find_with_default(name, "nachname", "")
+
+            position_raw = name.find("fraktion")
+            if position_raw is None:
+                position_raw = name.find("rolle")
+                if position_raw is not None:
+                    position_raw = find_with_default(position_raw, "rolle_lang", "")
                 else:
                     position_raw = ""
-
-                faction_abbrev = get_faction_abbrev(
-                    str(position_raw), faction_patterns=faction_patterns
-                )
-                position_short, position_long = get_position_short_and_long(
-                    faction_abbrev
-                    if faction_abbrev
-                    else regex.sub("\n+", " ", position_raw)
-                )
-                faction_id = -1
-                if faction_abbrev:
-                    # .iloc[0] is important right now, as some faction entries
-                    # in factions df share same faction_id, so always the first
-                    # one is chosen right now.
-                    faction_id = int(
-                        factions.loc[factions["abbreviation"] == faction_abbrev, "id"].iloc[0]
+            else:
+                position_raw = ""
+
+            faction_abbrev, position_short, position_long = faction_classifier.speaker(
+                position_raw
+            )
+            faction_id = faction_id_of.get(faction_abbrev, -1)
+
+            speech_text = ""
+            text_position = 0
+            for content in speech[1:]:
+                tag = content.tag
+                if tag == "name":
+                    session_records.append(
+                        {
+                            "id": speech_content_id,
+                            "session": session,
+                            "first_name": first_name,
+                            "last_name": last_name,
+                            "faction_id": faction_id,
+                            "position_short": position_short,
+                            "position_long": position_long,
+                            "politician_id": speaker_id,
+                            "speech_content": speech_text,
+                        }
                     )
-
-                speech_text = ""
-                text_position = 0
-                for content in speech[1:]:
-                    tag = content.tag
-                    if tag == "name":
-                        speech_records.append(
-                            {
-                                "id": speech_content_id,
-                                "session": session_path.stem,
-                                "first_name": first_name,
-                                "last_name": last_name,
-                                "faction_id": faction_id,
-                                "position_short": position_short,
-                                "position_long": position_long,
-                                "politician_id": speaker_id,
-                                "speech_content": speech_text,
-                                "date": date,
-                            }
-                        )
-                        speech_content_id += 1
-                        faction_id = -1
-                        speaker_id = -1
-                        name = regex.sub(":", "", content.text).split()
-                        first_name, last_name = get_first_last(" ".join(name[1:]))
-                        position_short, position_long = get_position_short_and_long(
-                            name[0]
+                    speech_content_id += 1
+                    faction_id = -1
+                    speaker_id = -1
+                    name = colon_pattern.sub("", content.text).split()
+                    first_name, last_name = get_first_last(" ".join(name[1:]))
+                    position_short, position_long = faction_classifier.position(name[0])
+                    possible_matches = politicians_electoral_term.loc[
+                        politicians_electoral_term["last_name"] == last_name.lower()
+                    ]
+                    length = len(np.unique(possible_matches["ui"]))
+                    if length == 1:
+                        speaker_id = int(possible_matches["ui"].iloc[0])
+                    elif length > 1:
+                        first_name_set = set(
+                            [x.lower() for x in first_name.split()]
                         )
-                        possible_matches = politicians_electoral_term.loc[
-                            politicians_electoral_term["last_name"] == last_name.lower()
+                        possible_matches = possible_matches.loc[
+                            ~possible_matches["first_name"].apply(
+                                lambda x: set(x).isdisjoint(first_name_set)
+                            )
                         ]
                         length = len(np.unique(possible_matches["ui"]))
                         if length == 1:
                             speaker_id = int(possible_matches["ui"].iloc[0])
-                        elif length > 1:
-                            first_name_set = set(
-                                [x.lower() for x in first_name.split()]
-                            )
-                            possible_matches = possible_matches.loc[
-                                ~possible_matches["first_name"].apply(
-                                    lambda x: set(x).isdisjoint(first_name_set)
-                                )
-                            ]
-                            length = len(np.unique(possible_matches["ui"]))
-                            if length == 1:
-                                speaker_id = int(possible_matches["ui"].iloc[0])
-                        speech_text = ""
-                        text_position = 0
-                    elif tag == "p" and content.get("klasse") == "redner":
-                        speech_records.append(
-                            {
-                                "id": speech_content_id,
-                                "session": session_path.stem,
-                                "first_name": first_name,
-                                "last_name": last_name,
-                                "faction_id": faction_id,
-                                "position_short": position_short,
-                                "position_long": position_long,
-                                "politician_id": speaker_id,
-                                "speech_content": speech_text,
-                                "date": date,
-                            }
-                        )
+                    speech_text = ""
+                    text_position = 0
+                elif tag == "p" and content.get("klasse") == "redner":
+                    session_records.append(
+                        {
+                            "id": speech_content_id,
+                            "session": session,
+                            "first_name": first_name,
+                            "last_name": last_name,
+                            "faction_id": faction_id,
+                            "position_short": position_short,
+                            "position_long": position_long,
+                            "politician_id": speaker_id,
+                            "speech_content": speech_text,
+                        }
+                    )
 
-                        speech_content_id += 1
-                        speech_text = ""
-                        text_position = 0
-                        speaker = content.find("redner")
-                        speaker_id = int(speaker.get("id"))
-                        possible_matches = politicians_electoral_term.loc[
-                            politicians_electoral_term["ui"] == speaker_id
-                        ]
-                        if len(possible_matches) == 0:
-                            speaker_id = -1
-                        name = speaker.find("name")
+                    speech_content_id += 1
+                    speech_text = ""
+                    text_position = 0
+                    speaker = content.find("redner")
+                    speaker_id = int(speaker.get("id"))
+                    possible_matches = politicians_electoral_term.loc[
+                        politicians_electoral_term["ui"] == speaker_id
+                    ]
+                    if len(possible_matches) == 0:
+                        speaker_id = -1
+                    name = speaker.find("name")
+                    try:
+                        first_name = name.find("vorname").text
+                        last_name = name.find("nachname").text
+                    except AttributeError:
                         try:
-                            first_name = name.find("vorname").text
-                            last_name = name.find("nachname").text
+                            first_name, last_name = get_first_last(speech[0].text)
                         except AttributeError:
-                            try:
-                                first_name, last_name = get_first_last(speech[0].text)
-                            except AttributeError:
-                                first_name = "ERROR"
-                                last_name = "ERROR"
-                        try:
-                            position_raw = name.find("fraktion").text
-                        except (ValueError, AttributeError):
-                            position_raw = name.find("rolle").find("rolle_lang").text
-                        faction_abbrev = get_faction_abbrev(
-                            str(position_raw), faction_patterns=faction_patterns
-                        )
+                            first_name = "ERROR"
+                            last_name = "ERROR"
+                    try:
+                        position_raw = name.find("fraktion").text
+                    except (ValueError, AttributeError):
+                        position_raw = name.find("rolle").find("rolle_lang").text
+                    faction_abbrev, position_short, position_long = faction_classifier.speaker(
+                        position_raw
+                    )
 
-                        faction_id = -1
-                        position_short, position_long = get_position_short_and_long(
-                            faction_abbrev
-                            if faction_abbrev
-                            else regex.sub("\n+", " ", position_raw)
-                        )
-                        if faction_abbrev:
-                            faction = faction_abbrev
-                            # .iloc[0] is important right now, as some faction entries
-                            # in factions df share same faction_id, so always the first
-                            # one is chosen right now.
-                            faction_id = int(
-                                factions.loc[factions["abbreviation"] == faction_abbrev, "id"].iloc[0]
-                            )
-                    elif tag == "p":
-                        try:
-                            speech_text += "\n\n" + content.text
-                        except TypeError:
-                            pass
-                    elif tag == "kommentar":
-                        (
-                            contributions_extended_frame,
-                            speech_replaced,
-                            contributions_simplified_frame,
-                            text_position,
-                        ) = extract(
-                            content.text,
-                            int(session_path.stem),
-                            speech_content_id,
-                            text_position,
-                            False,
-                        )
-                        speech_text += "\n\n" + speech_replaced
-                        contributions_extended.append(contributions_extended_frame)
-                        contributions_simplified.append(contributions_simplified_frame)
-
-                speech_records.append(
-                    {
-                        "id": speech_content_id,
-                        "session": session_path.stem,
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "faction_id": faction_id,
-                        "position_short": position_short,
-                        "position_long": position_long,
-                        "politician_id": speaker_id,
-                        "speech_content": speech_text,
-                        "date": date,
-                    }
-                )
-                speech_content_id += 1
+                    faction_id = faction_id_of.get(faction_abbrev, -1)
+                elif tag == "p":
+                    try:
+                        speech_text += "\n\n" + content.text
+                    except TypeError:
+                        pass
+                elif tag == "kommentar":
+                    (
+                        contributions_extended_frame,
+                        speech_replaced,
+                        contributions_simplified_frame,
+                        text_position,
+                    ) = extract(
+                        content.text,
+                        int(session),
+                        speech_content_id,
+                        text_position,
+                        False,
+                    )
+                    speech_text += "\n\n" + speech_replaced
+                    contributions_extended.append(contributions_extended_frame)
+                    contributions_simplified.append(contributions_simplified_frame)
+
+            session_records.append(
+                {
+                    "id": speech_content_id,
+                    "session": session,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "faction_id": faction_id,
+                    "position_short": position_short,
+                    "position_long": position_long,
+                    "politician_id": speaker_id,
+                    "speech_content": speech_text,
+                }
+            )
+            speech_content_id += 1
+
+        # The rednerliste follows the session, so the date is only known
+        # once the whole protocol was read.
+        date = meta_data.get("sitzung-datum")
+        # Wrong date in xml file. Fixing manually
+        if session == "19158":
+            date = "07.05.2020"
+        date = (
+            datetime.datetime.strptime(date, "%d.%m.%Y") - datetime.datetime(1970, 1, 1)
+        ).total_seconds()
+        for record in session_records:
+            record["date"] = date
+        speech_records.extend(session_records)
 
         contributions_extended = pd.concat(contributions_extended, sort=False)
-        contributions_extended.to_pickle(
-            contributions_extended_output / (session_path.stem + ".pkl")
+        storage.write(
+            contributions_extended,
+            storage.path(contributions_extended_output, session),
         )
 
     speech_content = pd.DataFrame.from_records(speech_records)
 
-    speech_content.to_pickle(term_spoken_content / "speech_content.pkl")
+    write_pickle(speech_content, term_spoken_content / "speech_content.pkl")
 
     contributions_simplified = pd.concat(contributions_simplified, sort=False)
-    contributions_simplified.to_pickle(
-        contributions_simplified_output / "contributions_simplified.pkl"
+    write_pickle(
+        contributions_simplified,
+        contributions_simplified_output / "contributions_simplified.pkl",
     )
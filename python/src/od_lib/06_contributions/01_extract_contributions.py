@@ -1,6 +1,14 @@
+from od_lib.helper_functions import contributions
 from od_lib.helper_functions.extract_contributions import extract
+from od_lib.helper_functions.build_cache import BuildManifest, write_pickle
+from od_lib.helper_functions.session_pool import (
+    parse_args,
+    report_failures,
+    run_sessions,
+    selected,
+)
+from od_lib.helper_functions.stage_storage import get_storage
 import od_lib.definitions.path_definitions as path_definitions
-from od_lib.helper_functions.progressbar import progressbar
 import pandas as pd
 import sys
 import regex
@@ -12,79 +20,130 @@ SPEECH_CONTENT_INPUT = path_definitions.SPEECH_CONTENT_STAGE_03
 SPEECH_CONTENT_OUTPUT = path_definitions.SPEECH_CONTENT_STAGE_04
 CONTRIBUTIONS_EXTENDED_OUTPUT = path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_01
 CONTRIBUTIONS_SIMPLIFIED = path_definitions.CONTRIBUTIONS_SIMPLIFIED
-CONTRIBUTIONS_SIMPLIFIED.mkdir(parents=True, exist_ok=True)
+CONTRIBUTIONS_SIMPLIFIED_OUTPUT = path_definitions.CONTRIBUTIONS_SIMPLIFIED_STAGE_01
 
-speech_id = 0
 
-simplified_list = []
+def extract_contributions(speech_content_file_path, speech_id, output_paths):
+    """Extracts the contributions of a session. The speeches are numbered
+    starting with speech_id. Returns the number of speeches."""
+    storage = get_storage()
+    speech_output_path, extended_output_path, simplified_output_path = output_paths
 
-# Go through all electoral_term folders
-for folder_path in sorted(SPEECH_CONTENT_INPUT.iterdir()):
-    if not folder_path.is_dir():
-        continue
+    # read the spoken content
+    speech_content = storage.read(speech_content_file_path)
 
-    term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
-    if term_number is None:
-        continue
-    term_number = int(term_number.group(0))
+    (
+        speech_content,
+        contributions_extended,
+        session_simplified,
+    ) = contributions.extract_session_contributions(
+        speech_content, speech_content_file_path.stem, speech_id
+    )
 
-    if len(sys.argv) > 1:
-        if str(term_number) not in sys.argv:
+    # save the contributions_extended
+    storage.write(contributions_extended, extended_output_path)
+    # save the spoken_content
+    storage.write(speech_content, speech_output_path)
+    storage.write(session_simplified, simplified_output_path)
+
+    return len(speech_content)
+
+
+def main():
+    args = parse_args("Extract the contributions from the speeches.")
+    CONTRIBUTIONS_SIMPLIFIED.mkdir(parents=True, exist_ok=True)
+    storage = get_storage()
+
+    # The speech ids run over all sessions, so the first id of a session is part of
+    # its key. A session is only extracted again if its input, its first id or the
+    # extraction code changed.
+    manifest = BuildManifest(SPEECH_CONTENT_OUTPUT, code=[__file__, contributions, extract])
+
+    speech_id = 0
+
+    # Every session in order, with its outputs and whether it has to be extracted.
+    sessions = []
+    tasks = []
+    keys = []
+
+    # Go through all electoral_term folders
+    for folder_path in sorted(SPEECH_CONTENT_INPUT.iterdir()):
+        if not folder_path.is_dir():
+            continue
+
+        term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
+        if term_number is None:
+            continue
+        term_number = int(term_number.group(0))
+
+        if not selected(term_number, args.electoral_terms):
             continue
 
-    speech_output = SPEECH_CONTENT_OUTPUT / folder_path.stem
-    extended_output = CONTRIBUTIONS_EXTENDED_OUTPUT / folder_path.stem
-
-    speech_output.mkdir(parents=True, exist_ok=True)
-    extended_output.mkdir(parents=True, exist_ok=True)
-
-    # iterate over every speech_content file
-    for speech_content_file_path in progressbar(
-        folder_path.glob("*.pkl"),
-        f"Extract contributions (term {term_number:>2})...",
-    ):
-        # read the spoken content csv
-        speech_content = pd.read_pickle(speech_content_file_path)
-
-        frame = {
-            "id": [],
-            "type": [],
-            "name_raw": [],
-            "faction": [],
-            "constituency": [],
-            "content": [],
-            "text_position": [],
-        }
-
-        speech_content.insert(0, "speech_id", 0)
-
-        extended_list = []
-        # iterate over every speech
-        for counter, speech in zip(speech_content.index, speech_content["speech_content"]):
-            # call the extract method which returns the cleaned speech and a
-            # dataframe with all contributions in that particular speech
-
-            (
-                contribution_extended,
-                speech_text,
-                contribution_simple,
-                _,
-            ) = extract(
-                speech,
-                int(speech_content_file_path.stem),
-                speech_id,
+        speech_output = SPEECH_CONTENT_OUTPUT / folder_path.stem
+        extended_output = CONTRIBUTIONS_EXTENDED_OUTPUT / folder_path.stem
+        simplified_output = CONTRIBUTIONS_SIMPLIFIED_OUTPUT / folder_path.stem
+
+        speech_output.mkdir(parents=True, exist_ok=True)
+        extended_output.mkdir(parents=True, exist_ok=True)
+        simplified_output.mkdir(parents=True, exist_ok=True)
+
+        # iterate over every speech_content file
+        for speech_content_file_path in storage.files(folder_path):
+            session = speech_content_file_path.stem
+            output_paths = (
+                storage.path(speech_output, session),
+                storage.path(extended_output, session),
+                storage.path(simplified_output, session),
             )
-            simplified_list.append(contribution_simple)
-            extended_list.append(contribution_extended)
-            speech_content.at[counter, "speech_content"] = speech_text
-            speech_content.at[counter, "speech_id"] = speech_id
-            speech_id += 1
-
-        contributions_extended = pd.concat(extended_list, sort=False)
-        # save the contributions_extended to pickle
-        contributions_extended.to_pickle(extended_output / speech_content_file_path.name)
-        # save the spoken_conten to pickle
-        speech_content.to_pickle(speech_output / speech_content_file_path.name)
-
-contributions_simplified = pd.concat(simplified_list, sort=False)
-contributions_simplified.to_pickle(CONTRIBUTIONS_SIMPLIFIED / "contributions_simplified.pkl")
+            key = manifest.key(speech_content_file_path, speech_id)
+            if (
+                manifest.is_current(output_paths[0], key)
+                and output_paths[1].exists()
+                and output_paths[2].exists()
+            ):
+                sessions.append((output_paths, True))
+                speech_id += manifest.info(output_paths[0])["speeches"]
+                continue
+
+            # The ids of the following sessions only depend on the number of
+            # speeches, so all sessions can be extracted at the same time.
+            sessions.append((output_paths, False))
+            tasks.append((speech_content_file_path, speech_id, output_paths))
+            keys.append(key)
+            speech_id += storage.count_rows(speech_content_file_path)
+
+    # Finished sessions are recorded right away, so they are not extracted
+    # again if the stage is interrupted.
+    extracted = set()
+
+    def record(index, speeches):
+        if speeches is not None:
+            output_paths = tasks[index][2]
+            manifest.update(output_paths[0], keys[index], speeches=speeches)
+            extracted.add(output_paths)
+        return speeches
+
+    _, failures = run_sessions(
+        extract_contributions,
+        tasks,
+        args.workers,
+        prefix="Extract contributions...",
+        on_result=record,
+    )
+    manifest.save()
+
+    simplified_list = [
+        storage.read(output_paths[2])
+        for output_paths, current in sessions
+        if current or output_paths in extracted
+    ]
+    contributions_simplified = pd.concat(simplified_list, sort=False)
+    write_pickle(
+        contributions_simplified, CONTRIBUTIONS_SIMPLIFIED / "contributions_simplified.pkl"
+    )
+
+    sys.exit(report_failures(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 from od_lib.helper_functions.match_names import (
+    PoliticianIndex,
     insert_politician_id_into_contributions_extended,
 )
+from od_lib.helper_functions import contributions
+from od_lib.helper_functions.build_cache import BuildManifest
+from od_lib.helper_functions.stage_storage import get_storage
 import od_lib.definitions.path_definitions as path_definitions
 from od_lib.helper_functions.progressbar import progressbar
-import pandas as pd
 import regex
 import sys
 
@@ -15,34 +18,17 @@ DATA_FINAL = path_definitions.DATA_FINAL
 CONTRIBUTIONS_EXTENDED_OUTPUT = path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_03
 
 # MDBS
-politicians = pd.read_csv(DATA_FINAL / "politicians.csv")
-politicians = politicians.loc[
-    :,
-    [
-        "ui",
-        "electoral_term",
-        "faction_id",
-        "first_name",
-        "last_name",
-        "gender",
-        "constituency",
-        "institution_type",
-    ],
-].copy()
-
-politicians = politicians.astype(dtype={"ui": "int64"})
-
-# Some cleaning to make matching easier.
-politicians["constituency"] = politicians["constituency"].fillna("")
-
-politicians["first_name"] = politicians["first_name"].str.lower()
-politicians["last_name"] = politicians["last_name"].str.lower()
-politicians["constituency"] = politicians["constituency"].str.lower()
-
-politicians["first_name"] = politicians["first_name"].str.replace("ß", "ss", regex=False)
-politicians["last_name"] = politicians["last_name"].str.replace("ß", "ss", regex=False)
-
-politicians["first_name"] = politicians["first_name"].apply(str.split)
+politicians = contributions.load_politicians(DATA_FINAL / "politicians.csv")
+
+storage = get_storage()
+
+# Sessions are only matched again if their input, the matching code or the
+# politicians changed.
+manifest = BuildManifest(
+    CONTRIBUTIONS_EXTENDED_OUTPUT,
+    code=[__file__, contributions, insert_politician_id_into_contributions_extended],
+    reference_files=[DATA_FINAL / "politicians.csv"],
+)
 
 # iterate over all electoral_term_folders __________________________________________________
 for folder_path in sorted(CONTRIBUTIONS_EXTENDED_INPUT.iterdir()):
@@ -67,14 +53,23 @@ for folder_path in sorted(CONTRIBUTIONS_EXTENDED_INPUT.iterdir()):
         politicians_electoral_term["institution_type"] == "Regierungsmitglied"
     ]
 
+    # Indexed by last name once for all sessions of the term.
+    politicians_electoral_term = PoliticianIndex(politicians_electoral_term)
+    gov_members_electoral_term = PoliticianIndex(gov_members_electoral_term)
+
     working = []
     # iterate over every contributions_extended file
     for contrib_ext_file_path in progressbar(
-        folder_path.glob("*.pkl"),
+        storage.files(folder_path),
         f"Match contributions (term {term_number:>2})...",
     ):
-        # read the contributions_extended pickle file
-        contributions_extended = pd.read_pickle(contrib_ext_file_path)
+        output_path = storage.path(save_path, contrib_ext_file_path.stem)
+        key = manifest.key(contrib_ext_file_path)
+        if manifest.is_current(output_path, key):
+            continue
+
+        # read the contributions_extended session file
+        contributions_extended = storage.read(contrib_ext_file_path)
 
         (
             contributions_extended_matched,
@@ -85,4 +80,7 @@ for folder_path in sorted(CONTRIBUTIONS_EXTENDED_INPUT.iterdir()):
             gov_members_electoral_term,
         )
 
-        contributions_extended.to_pickle(save_path / contrib_ext_file_path.name)
+        storage.write(contributions_extended, output_path)
+        manifest.update(output_path, key)
+
+    manifest.save()
@@ -1,13 +1,13 @@
+from od_lib.helper_functions.build_cache import write_pickle
+from od_lib.helper_functions.session_catalog import open_catalog
+from od_lib.helper_functions.stage_storage import get_storage
 import od_lib.definitions.path_definitions as path_definitions
-import xml.etree.ElementTree as et
 import pandas as pd
-import regex
 import time
 import datetime
 import sys
 
 # input directory
-RAW_XML = path_definitions.RAW_XML
 SPEECH_CONTENT_INPUT = path_definitions.SPEECH_CONTENT_STAGE_04
 SPEECH_CONTENT_INPUT_2 = path_definitions.ELECTORAL_TERM_19_20_STAGE_03 / "electoral_term_19"
 SPEECH_CONTENT_INPUT_3 = path_definitions.ELECTORAL_TERM_19_20_STAGE_03 / "electoral_term_20"
@@ -20,25 +20,14 @@ CONTRIBUTIONS_EXTENDED_OUTPUT = path_definitions.FINAL
 SPEECH_CONTENT_OUTPUT.mkdir(parents=True, exist_ok=True)
 CONTRIBUTIONS_EXTENDED_OUTPUT.mkdir(parents=True, exist_ok=True)
 
-# spoken content
-
-# Placeholder for concating speeches DF of all sessions.
-speech_content_01_18 = []
-
-
-# Walk over all legislature periods.
-for folder_path in sorted(SPEECH_CONTENT_INPUT.iterdir()):
-    if not folder_path.is_dir():
-        continue
-
-    for speech_content_file_path in sorted(folder_path.glob("*.pkl")):
-        speech_content_01_18.append(pd.read_pickle(speech_content_file_path))
+storage = get_storage()
 
-speech_content_01_18 = pd.concat(speech_content_01_18, sort=False)
+# spoken content
 
-speech_content_01_18 = speech_content_01_18.loc[
-    :,
-    [
+# Read the sessions of all legislature periods, only deserializing the needed columns.
+speech_content_01_18 = storage.read_stage(
+    SPEECH_CONTENT_INPUT,
+    columns=[
         "speech_id",
         "session",
         "first_name",
@@ -49,7 +38,7 @@ speech_content_01_18 = speech_content_01_18.loc[
         "politician_id",
         "speech_content",
     ],
-]
+)
 
 speech_content_01_18 = speech_content_01_18.rename(columns={"speech_id": "id"})
 
@@ -65,35 +54,15 @@ speech_content_01_18["session"] = speech_content_01_18["session"].str.replace(
 
 meta_data = {}
 
-# Open every xml plenar file in every legislature period.
-for folder_path in sorted(RAW_XML.iterdir()):
-    # Skip e.g. the .DS_Store file.
-    if not folder_path.is_dir():
-        continue
-
-    term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
-    if term_number is None:
-        continue
-    term_number = int(term_number.group(0))
-
-    if len(sys.argv) > 1:
-        if str(term_number) not in sys.argv:
-            continue
-
-    for xml_plenar_file_path in sorted(folder_path.glob("*.xml")):
-        tree = et.parse(xml_plenar_file_path)
-        # Get the document number, the date of the session and the content.
-        # meta_data["document_number"].append(tree.find("NR").text)
-        # meta_data["date"].append(tree.find("DATUM").text)
-        # document_number = tree.find("NR").text
-        date = time.mktime(
-            datetime.datetime.strptime(
-                tree.find("DATUM").text, "%d.%m.%Y"
-            ).timetuple()
-        )
-        document_number = xml_plenar_file_path.stem
-        document_number = int(document_number)
-        meta_data[document_number] = date
+# The dates of the sessions were recorded in the session catalog by the split
+# stages, the protocols are not parsed again.
+electoral_terms = [int(term_number) for term_number in sys.argv[1:]] or None
+with open_catalog() as catalog:
+    dates = catalog.dates(electoral_terms)
+for document_number, date in dates.items():
+    meta_data[document_number] = time.mktime(
+        datetime.datetime.strptime(date, "%d.%m.%Y").timetuple()
+    )
 
 speech_content_01_18.insert(1, "electoral_term", -1)
 speech_content_01_18.insert(4, "document_url", "")
@@ -195,30 +164,12 @@ speech_content = pd.concat([speech_content_01_18, speech_content_19, speech_cont
 
 # save data.
 
-speech_content.to_pickle(SPEECH_CONTENT_OUTPUT / "speech_content.pkl")
+write_pickle(speech_content, SPEECH_CONTENT_OUTPUT / "speech_content.pkl")
 
-# Placeholder for concating contributions_extended DF of all sessions.
-contributions_extended = []
-
-# Walk over all legislature periods. ___________________________________________
-for folder_path in sorted(CONTRIBUTIONS_EXTENDED_INPUT.iterdir()):
-    # Skip e.g. the .DS_Store file.
-    if not folder_path.is_dir():
-        continue
-
-    term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
-    if term_number is None:
-        continue
-    term_number = int(term_number.group(0))
-
-    for contrib_ext_file_path in sorted(folder_path.glob("*.pkl")):
-        contributions_extended.append(pd.read_pickle(contrib_ext_file_path))
-
-contributions_extended = pd.concat(contributions_extended, sort=False)
-
-contributions_extended = contributions_extended.loc[
-    :,
-    [
+# Read the contributions_extended of all legislature periods. _____________________
+contributions_extended = storage.read_stage(
+    CONTRIBUTIONS_EXTENDED_INPUT,
+    columns=[
         "type",
         "first_name",
         "last_name",
@@ -228,7 +179,7 @@ contributions_extended = contributions_extended.loc[
         "politician_id",
         "content",
     ],
-]
+)
 
 contributions_extended = contributions_extended.rename(
     columns={"id": "speech_id", "politician_id": "politician_id"}
@@ -256,6 +207,6 @@ contributions_extended = contributions_extended.astype(
     }
 )
 
-contributions_extended.to_pickle(
-    CONTRIBUTIONS_EXTENDED_OUTPUT / "contributions_extended.pkl"
+write_pickle(
+    contributions_extended, CONTRIBUTIONS_EXTENDED_OUTPUT / "contributions_extended.pkl"
 )
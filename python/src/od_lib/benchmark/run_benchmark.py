@@ -0,0 +1,244 @@
+from od_lib.definitions.path_definitions import relocate
+from od_lib.helper_functions.pipeline import Stage, run_stage
+from od_lib.helper_functions.synthetic_protocols import generate_corpus
+import od_lib.definitions.path_definitions as path_definitions
+from pathlib import Path
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Runs the stages on synthetic protocols and reports the throughput of every
+# group of stages in sessions/s and MB/s. The MB are the sizes of the stage
+# inputs, measured right before a stage runs. Nothing of the real data
+# directory is touched, the stages run with OD_DATA_DIR set to a scratch
+# directory.
+
+OD_LIB = Path(__file__).resolve().parents[1]
+
+GROUPS = ["split", "extract", "clean", "match", "contributions", "concat", "upload"]
+
+
+def benchmark_stages(workers):
+    """Returns (group, electoral terms, stage) for every benchmarked script.
+    Scripts running on the session pool get the number of workers."""
+    pool = ["--workers", workers]
+    p = path_definitions
+    return [
+        ("split", range(3, 19), Stage(
+            "split_xml", OD_LIB / "01_preprocessing/03_split_xml.py",
+            inputs=[p.RAW_XML, p.RAW_ZIP], args=pool,
+        )),
+        ("split", range(1, 3), Stage(
+            "split_xml_electoral_term_1_and_2",
+            OD_LIB / "01_preprocessing/04_split_xml_electoral_term_1_and_2.py",
+            inputs=[p.RAW_XML, p.RAW_ZIP],
+        )),
+        ("extract", range(1, 19), Stage(
+            "extract_speeches", OD_LIB / "04_speech_content/01_extract_speeches.py",
+            inputs=[p.RAW_TXT], args=pool,
+        )),
+        ("extract", range(19, 21), Stage(
+            "extract_speeches_and_contributions_electoral_term_19_20",
+            OD_LIB / "05_electoral_term_19_20/"
+            "01_extract_speeches_and_contributions_electoral_term_19_20.py",
+            inputs=[p.ELECTORAL_TERM_19_20_STAGE_01, p.DATA_FINAL / "politicians.csv"],
+        )),
+        ("clean", range(1, 19), Stage(
+            "clean_speeches", OD_LIB / "04_speech_content/02_clean_speeches.py",
+            inputs=[p.SPEECH_CONTENT_STAGE_01], args=pool,
+        )),
+        ("match", range(1, 19), Stage(
+            "match_names_speeches", OD_LIB / "04_speech_content/03_match_names_speeches.py",
+            inputs=[p.SPEECH_CONTENT_STAGE_02, p.DATA_FINAL / "politicians.csv"], args=pool,
+        )),
+        ("contributions", range(1, 19), Stage(
+            "extract_contributions", OD_LIB / "06_contributions/01_extract_contributions.py",
+            inputs=[p.SPEECH_CONTENT_STAGE_03], args=pool,
+        )),
+        ("contributions", range(1, 21), Stage(
+            "clean_contributions_extended",
+            OD_LIB / "06_contributions/02_clean_contributions_extended.py",
+            inputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_01],
+        )),
+        ("contributions", range(1, 21), Stage(
+            "match_contributions_extended",
+            OD_LIB / "06_contributions/03_match_contributions_extended.py",
+            inputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_02, p.DATA_FINAL / "politicians.csv"],
+        )),
+        ("concat", range(1, 21), Stage(
+            "concat_everything", OD_LIB / "07_database/01_concat_everything.py",
+            inputs=[
+                p.SPEECH_CONTENT_STAGE_04,
+                p.ELECTORAL_TERM_19_20_STAGE_03,
+                p.CONTRIBUTIONS_EXTENDED_STAGE_03,
+                p.SESSION_CATALOG,
+            ],
+        )),
+        ("upload", range(1, 21), Stage(
+            "create_electoral_terms", OD_LIB / "01_preprocessing/07_create_electoral_terms.py",
+        )),
+        ("upload", range(1, 21), Stage(
+            "upload_data_to_database", OD_LIB / "07_database/02_upload_data_to_database.py",
+            inputs=[p.DATA_FINAL],
+        )),
+    ]
+
+
+def size_of(path):
+    """Size in bytes of a file or of all files below a directory."""
+    if path.is_file():
+        return path.stat().st_size
+    if not path.exists():
+        return 0
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def run_corpus(args, sessions, data_dir):
+    """Generates a corpus with the given number of sessions per term, runs the
+    stages on it and returns the report."""
+    start = time.perf_counter()
+    corpus = generate_corpus(
+        data_dir, args.electoral_terms, sessions, args.speeches, args.members, args.seed
+    )
+    generate_seconds = time.perf_counter() - start
+
+    env = dict(os.environ, OD_DATA_DIR=str(data_dir))
+    last_group = max(GROUPS.index(group) for group in args.groups)
+
+    report = {
+        "sessions_per_term": sessions,
+        "speeches_per_session": args.speeches,
+        "electoral_terms": args.electoral_terms,
+        "xml_bytes": sum(term["bytes"] for term in corpus.values()),
+        "generate_seconds": generate_seconds,
+        "groups": {},
+        "stages": [],
+    }
+    for group, terms, stage in benchmark_stages(args.workers):
+        # Earlier groups produce the inputs of the requested ones.
+        if GROUPS.index(group) > last_group:
+            break
+        if not any(term in terms for term in args.electoral_terms):
+            continue
+
+        input_bytes = sum(size_of(relocate(path, data_dir)) for path in stage.inputs)
+        start = time.perf_counter()
+        result = run_stage(stage, env=env)
+        seconds = time.perf_counter() - start
+
+        report["stages"].append(
+            {
+                "group": group,
+                "stage": stage.name,
+                "seconds": seconds,
+                "input_bytes": input_bytes,
+                "returncode": result.returncode,
+            }
+        )
+        if result.returncode != 0:
+            print(f"{stage.name} failed:\n{result.stderr[-2000:]}", file=sys.stderr)
+            report["failed"] = stage.name
+            break
+
+        totals = report["groups"].setdefault(
+            group, {"seconds": 0.0, "input_bytes": 0, "terms": set()}
+        )
+        totals["seconds"] += seconds
+        totals["input_bytes"] += input_bytes
+        totals["terms"].update(term for term in args.electoral_terms if term in terms)
+
+    for group, totals in report["groups"].items():
+        session_count = sum(corpus[term]["sessions"] for term in totals.pop("terms"))
+        totals["sessions"] = session_count
+        totals["sessions_per_second"] = session_count / totals["seconds"]
+        totals["mb_per_second"] = totals["input_bytes"] / 1e6 / totals["seconds"]
+    report["groups"] = {
+        group: totals for group, totals in report["groups"].items() if group in args.groups
+    }
+    return report
+
+
+def print_report(report):
+    print(
+        f"\n{report['sessions_per_term']} sessions per term, "
+        f"{report['speeches_per_session']} speeches per session, "
+        f"{report['xml_bytes'] / 1e6:.1f} MB xml "
+        f"(generated in {report['generate_seconds']:.1f}s)"
+    )
+    print(f"{'group':<15}{'sessions':>10}{'seconds':>10}{'sessions/s':>12}{'MB/s':>10}")
+    for group, totals in report["groups"].items():
+        print(
+            f"{group:<15}{totals['sessions']:>10}{totals['seconds']:>10.2f}"
+            f"{totals['sessions_per_second']:>12.2f}{totals['mb_per_second']:>10.2f}"
+        )
+    if "failed" in report:
+        print(f"Stopped, {report['failed']} failed.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the pipeline stages on synthetic protocols."
+    )
+    parser.add_argument(
+        "--sessions",
+        nargs="+",
+        type=int,
+        default=[10],
+        help="Sessions per electoral term, every value is a separate run.",
+    )
+    parser.add_argument("--speeches", type=int, default=40, help="Speeches per session.")
+    parser.add_argument(
+        "--members", type=int, default=30, help="Members of parliament per faction."
+    )
+    parser.add_argument(
+        "--electoral-terms",
+        nargs="+",
+        type=int,
+        default=[1, 5, 15, 19, 20],
+        help="Electoral terms of the corpus, the concat stage needs 19 and 20.",
+    )
+    parser.add_argument(
+        "--groups",
+        nargs="+",
+        choices=GROUPS,
+        default=GROUPS[:-1],
+        help="Stage groups to report, upload needs the database.",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="Workers of the pooled stages."
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--data-dir",
+        type=Path,
+        help="Keep the corpus and all stage outputs here instead of a temporary directory.",
+    )
+    parser.add_argument("--json", type=Path, help="Also write the reports to this file.")
+    args = parser.parse_args()
+
+    reports = []
+    for sessions in args.sessions:
+        if args.data_dir is not None:
+            data_dir = args.data_dir / f"sessions_{sessions}"
+            shutil.rmtree(data_dir, ignore_errors=True)
+            data_dir.mkdir(parents=True)
+            report = run_corpus(args, sessions, data_dir)
+        else:
+            with tempfile.TemporaryDirectory(prefix="od_benchmark_") as temp_dir:
+                report = run_corpus(args, sessions, Path(temp_dir))
+        print_report(report)
+        reports.append(report)
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(reports, file, indent=2)
+
+    sys.exit(1 if any("failed" in report for report in reports) else 0)
+
+
+if __name__ == "__main__":
+    main()
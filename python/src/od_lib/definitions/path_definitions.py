@@ -1,10 +1,12 @@
 from pathlib import Path
+import os
 
 # ROOT DIR _________________________________________________________________________________________
 ROOT_DIR = (Path(__file__) / "../../../..").resolve()
 
 # DATA _____________________________________________________________________________________________
-DATA = ROOT_DIR / "data"
+# OD_DATA_DIR moves the whole data tree, e.g. to a scratch directory for benchmarks.
+DATA = Path(os.environ["OD_DATA_DIR"]) if os.environ.get("OD_DATA_DIR") else ROOT_DIR / "data"
 DATA_RAW = DATA / "01_raw"
 DATA_CACHE = DATA / "02_cached"
 DATA_FINAL = DATA / "03_final"
@@ -18,6 +20,9 @@ RAW_ZIP = DATA_RAW / "zip"
 RAW_XML = DATA_RAW / "xml"
 RAW_TXT = DATA_RAW / "txt"
 
+# SESSION CATALOG __________________________________________________________________________________
+SESSION_CATALOG = DATA_CACHE / "sessions.sqlite"
+
 # SPEECH CONTENT ___________________________________________________________________________________
 SPEECH_CONTENT = DATA_CACHE / "speech_content"
 SPEECH_CONTENT_STAGE_01 = SPEECH_CONTENT / "stage_01"
@@ -51,6 +56,7 @@ FACTIONS_FINAL = FACTIONS / "final"
 
 # CONTRIBUTIONS_SIMPLIFIED _________________________________________________________________________
 CONTRIBUTIONS_SIMPLIFIED = FINAL
+CONTRIBUTIONS_SIMPLIFIED_STAGE_01 = DATA_CACHE / "contributions_simplified" / "stage_01"
 
 # ELECTORAL_TERMS __________________________________________________________________________________
 ELECTORAL_TERMS = FINAL
@@ -63,3 +69,8 @@ ELECTORAL_TERM_19_20_STAGE_03 = ELECTORAL_TERM_19_20 / "stage_03"
 
 # TOPIC_MODELLING __________________________________________________________________________________
 TOPIC_MODELLING = DATA_CACHE / "topic_modelling"
+
+
+def relocate(path, data_dir):
+    """Moves a path below DATA into another data directory, e.g. of a shard."""
+    return Path(data_dir) / Path(path).relative_to(DATA)
@@ -0,0 +1,234 @@
+from od_lib.helper_functions.build_cache import write_pickle
+from od_lib.helper_functions import contributions, speeches
+from od_lib.helper_functions.match_names import (
+    PoliticianIndex,
+    insert_politician_id_into_contributions_extended,
+    insert_politician_id_into_speech_content,
+)
+from od_lib.helper_functions.raw_data import protocol_paths, term_sources
+from od_lib.helper_functions.session_catalog import SessionCatalog, session_entry
+from od_lib.helper_functions.session_pool import (
+    build_parser,
+    report_failures,
+    run_sessions,
+    selected,
+)
+from od_lib.helper_functions.split_xml import SplitTerms, split_xml
+from od_lib.helper_functions.stage_storage import get_storage
+import od_lib.definitions.path_definitions as path_definitions
+from functools import lru_cache
+import pandas as pd
+import sys
+
+# Fused mode of the stages 01_preprocessing/03_split_xml up to
+# 06_contributions/03_match_contributions_extended for the electoral terms 1 to
+# 18. Every session is carried from the xml protocol to the matched speeches
+# and contributions in memory, only the final outputs are written. The
+# intermediate stage outputs are written with --keep-intermediate.
+
+# input directory
+DATA_FINAL = path_definitions.DATA_FINAL
+
+# intermediate directories, only written with --keep-intermediate
+RAW_TXT = path_definitions.RAW_TXT
+SPEECH_CONTENT_STAGE_01 = path_definitions.SPEECH_CONTENT_STAGE_01
+SPEECH_CONTENT_STAGE_02 = path_definitions.SPEECH_CONTENT_STAGE_02
+SPEECH_CONTENT_STAGE_03 = path_definitions.SPEECH_CONTENT_STAGE_03
+CONTRIBUTIONS_EXTENDED_STAGE_01 = path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_01
+CONTRIBUTIONS_EXTENDED_STAGE_02 = path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_02
+
+# output directory
+SPEECH_CONTENT_OUTPUT = path_definitions.SPEECH_CONTENT_STAGE_04
+CONTRIBUTIONS_EXTENDED_OUTPUT = path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_03
+CONTRIBUTIONS_SIMPLIFIED = path_definitions.CONTRIBUTIONS_SIMPLIFIED
+CONTRIBUTIONS_SIMPLIFIED_OUTPUT = path_definitions.CONTRIBUTIONS_SIMPLIFIED_STAGE_01
+
+# Reference tables, loaded once per worker by load_reference_tables.
+factions = None
+speech_politicians = None
+contribution_politicians = None
+
+
+def load_reference_tables():
+    global factions, speech_politicians, contribution_politicians
+    factions = pd.read_pickle(DATA_FINAL / "factions.pkl")
+    speech_politicians = speeches.load_politicians(DATA_FINAL / "politicians.csv")
+    contribution_politicians = contributions.load_politicians(DATA_FINAL / "politicians.csv")
+
+
+@lru_cache(maxsize=None)
+def politicians_of_term(term_number):
+    """The indexed politicians and government members of a term for the
+    speeches and the contributions, built once per worker."""
+    return (
+        tuple(map(PoliticianIndex, speeches.politicians_of_term(speech_politicians, term_number))),
+        tuple(
+            map(
+                PoliticianIndex,
+                speeches.politicians_of_term(contribution_politicians, term_number),
+            )
+        ),
+    )
+
+
+def process_session(xml_file_path, term_number, keep_intermediate):
+    """Runs all stages for a single protocol. The speech ids of the session
+    start at 0, they are shifted by the caller. Returns the number of speeches,
+    a list of (path, DataFrame, id column) of the outputs, the simplified
+    contributions, with keep_intermediate the split protocol and the session
+    catalog entry."""
+    storage = get_storage()
+    session = xml_file_path.stem
+    term_folder = xml_file_path.parent.stem
+    outputs = []
+
+    def intermediate(stage_dir, df, id_column=None):
+        if keep_intermediate:
+            outputs.append((storage.path(stage_dir / term_folder, session), df.copy(), id_column))
+
+    parts = split_xml(xml_file_path, term_number)
+    if parts is None:
+        return 0, outputs, None, None, None
+
+    (
+        (politicians_electoral_term, mgs_electoral_term),
+        (contribution_politicians_electoral_term, contribution_mgs_electoral_term),
+    ) = politicians_of_term(term_number)
+
+    # speeches
+    speech_content = speeches.extract_speeches(parts["session_content"], session, term_number)
+    intermediate(SPEECH_CONTENT_STAGE_01, speech_content)
+
+    speech_content = speeches.clean_speeches(speech_content, factions)
+    intermediate(SPEECH_CONTENT_STAGE_02, speech_content)
+
+    speech_content, _ = insert_politician_id_into_speech_content(
+        speech_content, politicians_electoral_term, mgs_electoral_term, speech_politicians
+    )
+    intermediate(SPEECH_CONTENT_STAGE_03, speech_content)
+
+    # contributions
+    (
+        speech_content,
+        contributions_extended,
+        contributions_simplified,
+    ) = contributions.extract_session_contributions(speech_content, session, 0)
+    intermediate(CONTRIBUTIONS_EXTENDED_STAGE_01, contributions_extended, "id")
+
+    contributions_extended = contributions.clean_contributions(contributions_extended, factions)
+    intermediate(CONTRIBUTIONS_EXTENDED_STAGE_02, contributions_extended, "id")
+
+    insert_politician_id_into_contributions_extended(
+        contributions_extended,
+        contribution_politicians_electoral_term,
+        contribution_mgs_electoral_term,
+    )
+
+    outputs.append(
+        (storage.path(SPEECH_CONTENT_OUTPUT / term_folder, session), speech_content, "speech_id")
+    )
+    outputs.append(
+        (
+            storage.path(CONTRIBUTIONS_EXTENDED_OUTPUT / term_folder, session),
+            contributions_extended,
+            "id",
+        )
+    )
+    return (
+        len(speech_content),
+        outputs,
+        contributions_simplified,
+        parts if keep_intermediate else None,
+        session_entry(session, term_number, parts),
+    )
+
+
+def main():
+    parser = build_parser("Process the electoral terms 1 to 18 from xml to matched speeches.")
+    parser.add_argument(
+        "--keep-intermediate",
+        action="store_true",
+        help="Also write the outputs of the intermediate stages.",
+    )
+    args = parser.parse_args()
+    storage = get_storage()
+
+    tasks = []
+    terms = SplitTerms(RAW_TXT if args.keep_intermediate else None)
+    for term_number, source in term_sources():
+        if term_number > 18 or not selected(term_number, args.electoral_terms):
+            continue
+
+        terms.add_term(term_number, source)
+        tasks.extend(
+            (xml_file_path, term_number, args.keep_intermediate)
+            for xml_file_path in protocol_paths(source)
+        )
+
+    # The speech ids run over all sessions, so the sessions are written in the
+    # order of the tasks. Finished sessions wait here until all previous ones
+    # are written.
+    pending = {}
+    written = {"index": 0, "speech_id": 0}
+    simplified_list = []
+
+    def write_in_order(index, result):
+        pending[index] = result
+        while written["index"] in pending:
+            index = written["index"]
+            result = pending.pop(index)
+            written["index"] += 1
+            if result is None:
+                continue
+            speech_count, outputs, contributions_simplified, parts, entry = result
+            xml_file_path, term_number, _ = tasks[index]
+            terms.add(term_number, xml_file_path.stem, entry, parts)
+            if contributions_simplified is not None:
+                simplified_output = CONTRIBUTIONS_SIMPLIFIED_OUTPUT / xml_file_path.parent.stem
+                outputs.append(
+                    (
+                        storage.path(simplified_output, xml_file_path.stem),
+                        contributions_simplified,
+                        "speech_id",
+                    )
+                )
+                simplified_list.append(contributions_simplified)
+            for path, df, id_column in outputs:
+                if id_column is not None:
+                    df[id_column] = df[id_column] + written["speech_id"]
+                path.parent.mkdir(parents=True, exist_ok=True)
+                storage.write(df, path)
+            written["speech_id"] += speech_count
+        return None
+
+    # A term with a failed session keeps its old text store and catalog rows.
+    with SessionCatalog() as catalog:
+        try:
+            _, failures = run_sessions(
+                process_session,
+                tasks,
+                args.workers,
+                initializer=load_reference_tables,
+                prefix="Process sessions...",
+                on_result=write_in_order,
+            )
+        except BaseException:
+            terms.discard()
+            raise
+        kept = terms.finish(catalog, {task[1] for task, _ in failures})
+
+    if kept:
+        print(f"Kept the old text stores and catalog rows of the electoral terms {kept}.")
+
+    if simplified_list:
+        CONTRIBUTIONS_SIMPLIFIED.mkdir(parents=True, exist_ok=True)
+        contributions_simplified = pd.concat(simplified_list, sort=False)
+        write_pickle(
+            contributions_simplified, CONTRIBUTIONS_SIMPLIFIED / "contributions_simplified.pkl"
+        )
+
+    sys.exit(report_failures(failures))
+
+
+if __name__ == "__main__":
+    main()
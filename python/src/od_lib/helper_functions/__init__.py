@@ -1,4 +1,22 @@
+from . import build_cache
+from . import classify
 from . import clean_text
+from . import contributions
+from . import download
 from . import extract_contributions
+from . import fuzzy_names
+from . import instrumentation
 from . import match_names
+from . import patterns
+from . import person_names
+from . import pipeline
 from . import progressbar
+from . import raw_data
+from . import session_catalog
+from . import session_pool
+from . import sharding
+from . import speeches
+from . import split_xml
+from . import stage_storage
+from . import synthetic_protocols
+from . import text_store
@@ -0,0 +1,259 @@
+from contextlib import contextmanager
+from pathlib import Path
+import ast
+import hashlib
+import inspect
+import json
+import os
+
+MANIFEST_NAME = "manifest.json"
+JOURNAL_NAME = "progress.jsonl"
+
+# The directory holding the od_lib package.
+SOURCE_ROOT = Path(__file__).resolve().parents[2]
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Returns the sha256 hex digest of the file content."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_output(path):
+    """Yields a temporary path next to path, which is moved over path when
+    the block succeeds. A crash never leaves a truncated output behind."""
+    path = Path(path)
+    temp_path = path.with_name(path.name + ".tmp")
+    try:
+        yield temp_path
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    os.replace(temp_path, path)
+
+
+def write_pickle(df, path):
+    """DataFrame.to_pickle through a temporary file."""
+    with atomic_output(path) as temp_path:
+        df.to_pickle(temp_path)
+
+
+class Journal:
+    """Append-only file of json records. Every record is one line which is
+    on disk before append returns, a line cut off by a crash is ignored."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def records(self):
+        if not self.path.exists():
+            return []
+        records = []
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    break
+                records.append(json.loads(line))
+        return records
+
+    def append(self, record):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "ab") as file:
+            file.write(json.dumps(record).encode("utf-8") + b"\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def remove(self):
+        self.path.unlink(missing_ok=True)
+
+
+def source_path(code):
+    """Returns the source file of a path, module or function."""
+    if isinstance(code, (str, Path)):
+        return Path(code)
+    return Path(inspect.getsourcefile(code))
+
+
+def module_path(name):
+    """The source file of an od_lib module, None for packages and other
+    names."""
+    path = SOURCE_ROOT.joinpath(*name.split(".")).with_suffix(".py")
+    return path if path.is_file() else None
+
+
+def od_lib_imports(path):
+    """The source files of the od_lib modules a source file imports. A
+    package import like "from od_lib.helper_functions import patterns" counts
+    as the module, the __init__ of the package is left out."""
+    path = Path(path).resolve()
+    names = []
+    for node in ast.walk(ast.parse(path.read_bytes())):
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                package = path.parents[node.level - 1].relative_to(SOURCE_ROOT).parts
+                module = ".".join(package + ((node.module,) if node.module else ()))
+            else:
+                module = node.module
+            names.append(module)
+            names.extend(f"{module}.{alias.name}" for alias in node.names)
+    paths = (module_path(name) for name in names if name.split(".")[0] == "od_lib")
+    return {module for module in paths if module is not None and module != path}
+
+
+def code_files(code):
+    """The source files of paths, modules or functions together with all
+    od_lib modules they import, directly or through each other. A change of
+    e.g. the patterns a stage reads through its helpers changes the
+    fingerprint of the stage."""
+    paths = {source_path(c).resolve() for c in code}
+    stack = list(paths)
+    while stack:
+        for module in od_lib_imports(stack.pop()) - paths:
+            paths.add(module)
+            stack.append(module)
+    return sorted(paths)
+
+
+class BuildManifest:
+    """Content hash manifest of a stage output directory.
+
+    Every output file is stored together with a key built from the content
+    hashes of its inputs and a fingerprint of the stage code (with the od_lib
+    modules it imports) and reference tables. An output only has to be
+    recomputed if its key changed. Delete the manifest to force a full rebuild
+    of the stage.
+
+    Every update is also appended to a journal next to the manifest, so the
+    outputs finished before a crash are still current on the next run.
+    """
+
+    def __init__(self, stage_dir, code=(), reference_files=()):
+        self.stage_dir = Path(stage_dir)
+        self.path = self.stage_dir / MANIFEST_NAME
+        self.journal = Journal(self.path.with_name(MANIFEST_NAME + ".journal"))
+        self.outputs = {}
+        self.hashes = {}
+
+        if self.path.exists():
+            with open(self.path) as file:
+                manifest = json.load(file)
+            self.outputs = manifest.get("outputs", {})
+            self.hashes = manifest.get("hashes", {})
+        for name, entry in self.journal.records():
+            self.outputs[name] = entry
+
+        fingerprint = hashlib.sha256()
+        for path in code_files(code) + [Path(p) for p in reference_files]:
+            fingerprint.update(path.name.encode())
+            fingerprint.update(self.hash(path).encode())
+        self.fingerprint = fingerprint.hexdigest()
+
+    def hash(self, path):
+        """Content hash of a file. Hashes are reused as long as size and
+        modification time of the file did not change."""
+        path = Path(path)
+        stat = path.stat()
+        name = str(path.resolve())
+        cached = self.hashes.get(name)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = file_hash(path)
+        self.hashes[name] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def key(self, *inputs):
+        """Builds the key for the given input files. Anything that is not a
+        path (e.g. a running id) is added to the key as is."""
+        key = hashlib.sha256(self.fingerprint.encode())
+        for item in inputs:
+            if isinstance(item, Path):
+                key.update(self.hash(item).encode())
+            else:
+                key.update(repr(item).encode())
+        return key.hexdigest()
+
+    def _name(self, output_path):
+        return Path(output_path).resolve().relative_to(self.stage_dir.resolve()).as_posix()
+
+    def is_current(self, output_path, key):
+        """True if the output exists and was built from the same key."""
+        return (
+            Path(output_path).exists()
+            and self.outputs.get(self._name(output_path), {}).get("key") == key
+        )
+
+    def info(self, output_path):
+        """Returns the additional information stored with an output."""
+        return self.outputs.get(self._name(output_path), {})
+
+    def update(self, output_path, key, **info):
+        """Stores the key of a freshly written output. Additional keyword
+        arguments are stored with it, e.g. the number of rows."""
+        name = self._name(output_path)
+        self.outputs[name] = {"key": key, **info}
+        self.journal.append([name, self.outputs[name]])
+
+    def save(self):
+        """Writes the manifest atomically."""
+        self.stage_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(temp_path, "w") as file:
+            json.dump({"outputs": self.outputs, "hashes": self.hashes}, file)
+        os.replace(temp_path, self.path)
+        self.journal.remove()
+
+
+class ProgressJournal:
+    """Journal of the sessions a stage completed, kept in its output
+    directory while the stage runs.
+
+    A session is done if it completed with the same key (see key) and the
+    same stage code, including the od_lib modules it imports. finish()
+    removes the journal once the whole stage succeeded, after a crash or
+    failed sessions a restart only processes the missing ones.
+    """
+
+    def __init__(self, stage_dir, code=()):
+        self.journal = Journal(Path(stage_dir) / JOURNAL_NAME)
+        fingerprint = hashlib.sha256()
+        for path in code_files(code):
+            fingerprint.update(file_hash(path).encode())
+        self.fingerprint = fingerprint.hexdigest()
+        self.completed = {
+            record["session"]: record
+            for record in self.journal.records()
+            if record["fingerprint"] == self.fingerprint
+        }
+
+    @staticmethod
+    def key(*paths):
+        """Size and modification time of the input files."""
+        return [[stat.st_size, stat.st_mtime_ns] for stat in map(os.stat, paths)]
+
+    def is_done(self, session, key=None):
+        record = self.completed.get(str(session))
+        return record is not None and record["key"] == key
+
+    def info(self, session):
+        """The keyword arguments a completed session was stored with."""
+        return self.completed[str(session)]["info"]
+
+    def complete(self, session, key=None, **info):
+        record = {
+            "session": str(session),
+            "key": key,
+            "fingerprint": self.fingerprint,
+            "info": info,
+        }
+        self.journal.append(record)
+        self.completed[str(session)] = record
+
+    def finish(self):
+        self.journal.remove()
+        self.completed = {}
@@ -0,0 +1,208 @@
+from functools import lru_cache
+from od_lib.helper_functions import patterns
+import pandas as pd
+import regex
+
+# Classifies the raw faction and position strings of the speakers,
+# contributors and politicians:
+#
+#   speakers = classify.classifier("speeches")
+#   speakers.faction("Abg. SPD")  # "SPD"
+#   speakers.speakers_of(speech_content["position_raw"])
+#
+# The faction patterns of a variant are one alternation which is scanned over
+# the string once. There are only a few hundred distinct raw strings per stage
+# but many thousands of rows, so the results are cached per raw string and the
+# *_of methods classify every distinct value of a Series once.
+
+CACHE_SIZE = 4096
+
+# The positions of get_position_short_and_long, a position is matched at its
+# start.
+POSITION_PATTERNS = {
+    "berichterstatter": r"^[Bb]erichterstatter(in)?(\s|$|,|.)",
+    "bundestagspraesident": r"^[Bb]undestagspräsident(in)?(\s|$|,|.)",
+    "alterspraesident": r"^[Aa]lterspräsident(in)?(\s|$|,|.)",
+    "vizebundestagspraesident": r"^[Vv]izebundestagspräsident(in)?(\s|$|,|.)",
+    "schriftfuehrer": r"^[Ss]chriftführer(in)?(\s|$|,|.)",
+    "bundespraesident": r"^[Bb]undespräsident(in)?(\s|$|,|.)",
+    "ministerpraesident": r"^[Mm]inisterpräsident(in)?(\s|$|,|.)",
+    "staatsminister": r"^[Ss]taatsminister(in)?(\s|$|,|.)",
+    "senator": r"^[Ss]enator(in)?(\s|$|,|.)",
+    "praesident": r"^[Pp]räsident(in)?(\s|$|,|.)",
+    "gast": r"^[Gg]ast",
+    "bundeskanzler": r"^[Bb]undeskanzler(in)?(\s|$|,|.)",
+    "minister": r"^(Bundes)?[Mm]inister(in)?(\s|$|,|.)",
+    "staatssekretaer": r"^([Pp]arl\s*\.\s+)?[Ss]taatssekretär(in)?(\s|$|,|.)",
+}
+
+position_patterns = patterns.register_all("position", POSITION_PATTERNS)
+
+PRESIDIUM_POSITIONS = [
+    "präsidentin",
+    "präsident",
+    "präsident des deutschen bundestages",
+    "präsidentin des deutschen bundestages",
+    "vizepräsidentin",
+    "vizepräsident",
+]
+
+# The terms 19 and 20 also count "ministerpraesident" as a guest.
+GUEST_POSITIONS = ("bundespraesident", "staatsminister", "senator", "praesident", "gast")
+
+newlines_pattern = patterns.register("speeches.newlines", r"\n+")
+
+
+def get_position_short_and_long(position, factions, guest_positions=GUEST_POSITIONS):
+    """matches the given position and returns the long and short version,
+    positions in factions are members of parliament"""
+    if position in factions or position_patterns["berichterstatter"].match(position):
+        return (
+            "Member of Parliament",
+            None if position in factions else position,
+        )
+    elif (
+        any(
+            position_patterns[key].match(position)
+            for key in [
+                "bundestagspraesident",
+                "alterspraesident",
+                "vizebundestagspraesident",
+                "schriftfuehrer",
+            ]
+        )
+        or position.lower() in PRESIDIUM_POSITIONS
+    ):
+        return "Presidium of Parliament", position
+    elif any(position_patterns[key].match(position) for key in guest_positions):
+        return "Guest", position
+    elif position_patterns["bundeskanzler"].match(position):
+        return "Chancellor", None
+    elif position_patterns["minister"].match(position):
+        return "Minister", position
+    elif position_patterns["staatssekretaer"].match(position):
+        return "Secretary of State", position
+    else:
+        return "Not found", None
+
+
+def priority_pattern(faction_patterns):
+    """One alternation of a dict of faction patterns, with the groups f0, f1,
+    ... in the order of the dict.
+
+    At every position the first alternative which matches there is the one
+    reported. Scanned with overlapped=True every position is tried, so the
+    lowest group among the matches is the first faction of the dict which is
+    found anywhere in the string, as in patterns.get_faction_abbrev.
+    """
+    return "|".join(
+        f"(?P<f{index}>{pattern})" for index, pattern in enumerate(faction_patterns.values())
+    )
+
+
+def map_unique(function, values):
+    """function applied to every value of a Series, called once per distinct
+    value."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    results = [function(value) for value in uniques]
+    return pd.Series([results[code] for code in codes], index=values.index, dtype=object)
+
+
+def faction_id_map(factions):
+    """Dict of the faction ids by abbreviation. Some abbreviations share an id,
+    the first row of factions with the abbreviation counts."""
+    return {
+        abbrev: int(faction_id)
+        for abbrev, faction_id in factions.drop_duplicates("abbreviation")
+        .set_index("abbreviation")["id"]
+        .items()
+    }
+
+
+def faction_ids(abbrevs, factions):
+    """The ids of a Series of faction abbreviations, -1 for None and unknown
+    abbreviations."""
+    return abbrevs.map(faction_id_map(factions)).fillna(-1).astype(int)
+
+
+class Classifier:
+    """Factions and positions of raw strings by the factions of a variant of
+    patterns.FACTION_PATTERNS, made by classifier()."""
+
+    def __init__(self, variant, ignore_case=False, exact=False, guest_positions=GUEST_POSITIONS):
+        self.factions = patterns.faction_patterns(variant, ignore_case)
+        self.priority = patterns.register(
+            f"classify.{variant}.ignore_case" if ignore_case else f"classify.{variant}",
+            priority_pattern(patterns.FACTION_PATTERNS[variant]),
+            regex.IGNORECASE if ignore_case else 0,
+        )
+        # The group numbers of f0, f1, ... in match.groups() and the factions.
+        self.numbers = [
+            self.priority.groupindex[f"f{index}"] - 1 for index in range(len(self.factions))
+        ]
+        self.abbrevs = list(self.factions)
+        # With exact, a string equal to an abbreviation ignoring the case is
+        # that faction before any pattern is tried.
+        self.exact = {}
+        if exact:
+            for abbrev in self.factions:
+                self.exact.setdefault(abbrev.lower(), abbrev)
+        self.guest_positions = guest_positions
+        self.faction = lru_cache(maxsize=CACHE_SIZE)(self.find_faction)
+        self.position = lru_cache(maxsize=CACHE_SIZE)(self.find_position)
+        self.speaker = lru_cache(maxsize=CACHE_SIZE)(self.find_speaker)
+
+    def find_faction(self, faction):
+        """The abbreviation of the first faction found in the string, None if
+        there is none."""
+        if self.exact and faction.lower() in self.exact:
+            return self.exact[faction.lower()]
+        try:
+            matches = self.priority.finditer(faction, overlapped=True)
+        except patterns.PatternTimeout:
+            # One pattern after the other, only the slow one counts as no match.
+            return patterns.get_faction_abbrev(faction, self.factions)
+        # The guarded scan has collected all matches, the lowest faction among
+        # them counts.
+        best = len(self.abbrevs)
+        for match in matches:
+            groups = match.groups()
+            for index in range(best):
+                if groups[self.numbers[index]] is not None:
+                    best = index
+                    break
+        return self.abbrevs[best] if best < len(self.abbrevs) else None
+
+    def find_position(self, position):
+        """(position_short, position_long) of a position."""
+        return get_position_short_and_long(position, self.factions, self.guest_positions)
+
+    def find_speaker(self, position_raw):
+        """(faction, position_short, position_long) of the position_raw of a
+        speaker. The position is the faction if one is found, else the
+        position_raw on one line."""
+        faction = self.faction(str(position_raw))
+        return (faction,) + self.position(
+            faction if faction else newlines_pattern.sub(" ", position_raw)
+        )
+
+    def factions_of(self, values):
+        """faction() of every value of a Series as a string."""
+        return map_unique(self.faction, values.astype(str))
+
+    def speakers_of(self, values):
+        """speaker() of every value of a Series, as a DataFrame with the
+        columns faction, position_short and position_long."""
+        return pd.DataFrame(
+            map_unique(self.speaker, values).tolist(),
+            index=values.index,
+            columns=["faction", "position_short", "position_long"],
+        )
+
+
+@lru_cache(maxsize=None)
+def classifier(variant, ignore_case=False, exact=False, guest_positions=GUEST_POSITIONS):
+    """The Classifier of a variant of patterns.FACTION_PATTERNS, shared by all
+    callers of a process. guest_positions is a tuple of POSITION_PATTERNS
+    keys."""
+    return Classifier(variant, ignore_case, exact, guest_positions)
@@ -1,6 +1,71 @@
+from od_lib.helper_functions import patterns
+from functools import lru_cache
 import numpy as np
 import regex
 
+bracket_token_pattern = patterns.register("clean_text.bracket_token", r"[()]")
+bracket_hyphen_pattern = patterns.register(
+    "clean_text.bracket_hyphen", r"(^((?<!Abg\.).)+|^.*\[.+)(-\n+)", regex.MULTILINE
+)
+bracket_newline_pattern = patterns.register("clean_text.bracket_newline", r"\n+")
+
+tabs_pattern = patterns.register("clean_text.tabs", r"\t+")
+spaces_pattern = patterns.register("clean_text.spaces", r"  +")
+pdf_header_pattern = patterns.register(
+    "clean_text.pdf_header",
+    r"(?:Deutscher\s?Bundestag\s?-(?:\s?\d{1,2}\s?[,.]\s?Wahlperiode\s?-)?)?\s?\d{1,3}\s?[,.]\s?Sitzung\s?[,.]\s?(?:(?:Bonn|Berlin)[,.])?\s?[^,.]+,\s?den\s?\d{1,2}\s?[,.]\s?[^\d]+\d{4}.*",  # noqa: E501
+)
+page_quarter_pattern = patterns.register(
+    "clean_text.page_quarter", r"\s*(\(A\)|\(B\)|\(C\)|\(D\))"
+)
+delimiter_pattern = patterns.register("clean_text.delimiter", r"-\n+(?![^(]*\))")
+
+
+def bracket_spans(text):
+    r"""Returns the (start, end) spans of the bracketed parts of a text, the
+    same as regex.finditer(r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)", text):
+    an opening bracket, text with directly adjacent inner brackets, which are
+    not nested any further, and the closing bracket.
+
+    Only the positions of the brackets are looked at and every bracket at most
+    twice, so this takes linear time where the regex backtracks on unbalanced
+    brackets.
+    """
+    brackets = [(match.start(), match.group()) for match in bracket_token_pattern.finditer(text)]
+    spans = []
+    count = len(brackets)
+    i = 0
+    while i < count:
+        start, bracket = brackets[i]
+        if bracket != "(":
+            i += 1
+            continue
+        j = i + 1
+        # Inner brackets, each one has to follow the previous one directly.
+        inner_end = None
+        while (
+            j + 1 < count
+            and brackets[j][1] == "("
+            and brackets[j + 1][1] == ")"
+            and (inner_end is None or brackets[j][0] == inner_end)
+        ):
+            inner_end = brackets[j + 1][0] + 1
+            j += 2
+        if j < count and brackets[j][1] == ")":
+            spans.append((start, brackets[j][0] + 1))
+            i = j + 1
+        else:
+            i += 1
+    return spans
+
+
+def clean_bracket(bracket):
+    """Joins the lines of a bracketed part, hyphens at the end of a line are
+    removed unless the line starts with "Abg."."""
+    if "\n" not in bracket:
+        return bracket
+    return bracket_newline_pattern.sub(" ", bracket_hyphen_pattern.sub(r"\1", bracket))
+
 
 def clean(filetext, remove_pdf_header=True):
     # Replaces all the misrecognized characters
@@ -9,61 +74,164 @@ def clean(filetext, remove_pdf_header=True):
     filetext = filetext.replace("—", "-")
     filetext = filetext.replace("–", "-")
     filetext = filetext.replace("•", "")
-    filetext = regex.sub(r"\t+", " ", filetext)
-    filetext = regex.sub(r"  +", " ", filetext)
+    filetext = tabs_pattern.sub(" ", filetext)
+    filetext = spaces_pattern.sub(" ", filetext)
 
     # Remove pdf artifact
     if remove_pdf_header:
-        filetext = regex.sub(
-            r"(?:Deutscher\s?Bundestag\s?-(?:\s?\d{1,2}\s?[,.]\s?Wahlperiode\s?-)?)?\s?\d{1,3}\s?[,.]\s?Sitzung\s?[,.]\s?(?:(?:Bonn|Berlin)[,.])?\s?[^,.]+,\s?den\s?\d{1,2}\s?[,.]\s?[^\d]+\d{4}.*",  # noqa: E501
-            r"\n",
-            filetext,
-        )
-        filetext = regex.sub(r"\s*(\(A\)|\(B\)|\(C\)|\(D\))", "", filetext)
+        filetext = pdf_header_pattern.sub(r"\n", filetext)
+        filetext = page_quarter_pattern.sub("", filetext)
 
     # Remove delimeter
-    filetext = regex.sub(r"-\n+(?![^(]*\))", "", filetext)
-
-    # Deletes all the newlines in brackets
-    bracket_text = regex.finditer(r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)", filetext)
-
-    for bracket in bracket_text:
-        filetext = filetext.replace(
-            str(bracket.group()),
-            regex.sub(
-                r"\n+",
-                " ",
-                regex.sub(
-                    r"(^((?<!Abg\.).)+|^.*\[.+)(-\n+)",
-                    r"\1",
-                    str(bracket.group()),
-                    flags=regex.MULTILINE,
-                ),
-            ),
+    filetext = delimiter_pattern.sub("", filetext)
+
+    # Deletes all the newlines in brackets, the text is built once from the
+    # parts between the brackets and the cleaned brackets.
+    parts = []
+    position = 0
+    for start, end in bracket_spans(filetext):
+        parts.append(filetext[position:start])
+        parts.append(clean_bracket(filetext[start:end]))
+        position = end
+    parts.append(filetext[position:])
+    return "".join(parts)
+
+
+def trie_pattern(names, shortest=False):
+    """Alternation of the names as a trie, e.g. "Ab", "Ac" and "Ed" become
+    "(?:A(?:b|c)|Ed)". The regex engine follows one branch per character
+    instead of trying every name, the same strings match.
+
+    names are lists of regex atoms (single characters or escapes). Where one
+    name starts another the longer one is tried first, or the shorter one
+    with shortest.
+    """
+    trie = {}
+    for atoms in names:
+        node = trie
+        for atom in atoms:
+            node = node.setdefault(atom, {})
+        node[None] = {}
+
+    def pattern(node, alternatives):
+        if not alternatives:
+            return ""
+        if None in node:
+            return "(?:" + "|".join(alternatives) + (")??" if shortest else ")?")
+        if len(alternatives) == 1:
+            return alternatives[0]
+        return "(?:" + "|".join(alternatives) + ")"
+
+    # The nodes after their children, without recursion as a name can be
+    # longer than the recursion limit.
+    patterns_of = {}
+    stack = [(trie, False)]
+    while stack:
+        node, children_done = stack.pop()
+        atoms = sorted(key for key in node if key is not None)
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((node[atom], False) for atom in atoms)
+            continue
+        patterns_of[id(node)] = pattern(
+            node, [atom + patterns_of.pop(id(node[atom])) for atom in atoms]
         )
-    return filetext
+    return patterns_of[id(trie)]
 
 
-def clean_name_headers(filetext, names, contributions_extended_filter=False):
-    """Cleans lines a given text which remained from the pdf header.
-    Usually something like: "Präsident Dr. Lammert"
-    Keep in mind this also deletes lines from voting lists.
+def name_atoms(name):
+    """Splits a name of clean_name_headers into regex atoms. The names are
+    used as regular expressions with + * ? escaped, so a dot matches any
+    character and brackets only group, e.g. "Dr. Müller (Berlin)" matches
+    "Dr. Müller Berlin". Returns None for names with other regex syntax."""
+    atoms = []
+    depth = 0
+    for char in name:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth < 0:
+                return None
+        elif char in "+*?":
+            atoms.append("\\" + char)
+        elif char in "\\[]{}|^$":
+            return None
+        else:
+            atoms.append(char)
+    return atoms if depth == 0 else None
+
+
+def valid_pattern(pattern):
+    try:
+        regex.compile(pattern)
+    except regex.error:
+        return False
+    return True
+
+
+@lru_cache(maxsize=64)
+def name_header_pattern(names, contributions_extended_filter=False):
+    """The compiled pattern of clean_name_headers for a tuple of names.
+
+    It is built once per set of names and reused for every speech of a
+    session. Names with other regex syntax are kept as they are.
     """
     if contributions_extended_filter:
-        table = {ord(c):"" for c in "()[]{}"}
+        table = {ord(c): "" for c in "()[]{}"}
         names = np.unique([name.translate(table) for name in names])
 
     table = {ord("+"): "\\+", ord("*"): "\\*", ord("?"): "\\?"}
-    names_to_clean = ("(" + "|".join(names) + ")").translate(table)
-    pattern = (
+    plain = []
+    other = []
+    for name in names:
+        atoms = name_atoms(name)
+        if atoms is None:
+            other.append(name.translate(table))
+        else:
+            plain.append(atoms)
+    if all(valid_pattern(name) for name in other):
+        names_to_clean = "(" + "|".join(([trie_pattern(plain)] if plain else []) + other) + ")"
+    else:
+        # An unbalanced bracket changes the whole alternation, keep it as it is.
+        names_to_clean = ("(" + "|".join(names) + ")").translate(table)
+    pattern = regex.compile(
         r"\n((?:Parl\s?\.\s)?Staatssekretär(?:in)?|Bundeskanzler(?:in)?|Bundesminister(?:in)?|Staatsminister(:?in)?)?\s?"  # noqa: E501
         + names_to_clean
         + r" *\n"
     )
-    filetext = regex.sub(pattern, "\n", filetext)
+    return patterns.instrument("clean_text.name_headers", pattern)
+
 
-    pattern = r"\n\d+ *\n"
+number_line_pattern = patterns.register("clean_text.number_line", r"\n\d+ *\n")
 
-    filetext = regex.sub(pattern, "\n", filetext)
+
+def clean_name_headers(filetext, names, contributions_extended_filter=False):
+    """Cleans lines a given text which remained from the pdf header.
+    Usually something like: "Präsident Dr. Lammert"
+    Keep in mind this also deletes lines from voting lists.
+    """
+    pattern = name_header_pattern(tuple(names), contributions_extended_filter)
+    filetext = pattern.sub("\n", filetext)
+    filetext = number_line_pattern.sub("\n", filetext)
 
     return filetext
+
+
+@lru_cache(maxsize=64)
+def name_removal_pattern(names):
+    """Pattern matching any of the names literally, as a trie."""
+    pattern = regex.compile(
+        trie_pattern([[regex.escape(char) for char in name] for name in names], shortest=True)
+    )
+    return patterns.instrument("clean_text.names", pattern)
+
+
+def remove_names(text, names):
+    """Removes the names from the text in one scan. Where one name starts
+    another only the shorter one is removed, as replacing the sorted names
+    one after the other does."""
+    names = tuple(names)
+    if not names:
+        return text
+    return name_removal_pattern(names).sub("", text)
@@ -0,0 +1,142 @@
+from od_lib.helper_functions.clean_text import clean_name_headers
+from od_lib.helper_functions.extract_contributions import extract
+from od_lib.helper_functions.person_names import split_names
+from od_lib.helper_functions import classify
+import numpy as np
+import pandas as pd
+
+# Disabling pandas warnings.
+pd.options.mode.chained_assignment = None
+
+
+def extract_session_contributions(speech_content, session, speech_id):
+    """Extracts the contributions of the speeches of a session, the speeches are
+    numbered starting with speech_id. Returns the speeches without the
+    contributions, the extended and the simplified contributions."""
+    speech_content.insert(0, "speech_id", 0)
+
+    extended_list = []
+    session_simplified_list = []
+    # iterate over every speech
+    for counter, speech in zip(speech_content.index, speech_content["speech_content"]):
+        # call the extract method which returns the cleaned speech and a
+        # dataframe with all contributions in that particular speech
+
+        (
+            contribution_extended,
+            speech_text,
+            contribution_simple,
+            _,
+        ) = extract(
+            speech,
+            int(session),
+            speech_id,
+        )
+        session_simplified_list.append(contribution_simple)
+        extended_list.append(contribution_extended)
+        speech_content.at[counter, "speech_content"] = speech_text
+        speech_content.at[counter, "speech_id"] = speech_id
+        speech_id += 1
+
+    contributions_extended = pd.concat(extended_list, sort=False)
+    contributions_simplified = pd.concat(session_simplified_list, sort=False)
+
+    return speech_content, contributions_extended, contributions_simplified
+
+
+faction_classifier = classify.classifier("contributions")
+
+
+def clean_contributions(contributions_extended, factions):
+    """Splits the names of the contributors into first name, last name and
+    academic titles and inserts the faction ids."""
+    # Insert acad_title column and extract plain name and titles.
+    # ADD DOCUMENTATION HERE
+    contributions_extended.insert(3, "faction_id", -1)
+    contributions_extended.insert(5, "last_name", "")
+    contributions_extended.insert(6, "first_name", "")
+    contributions_extended.insert(7, "acad_title", "")
+
+    # Current workaround, because some speeches seem to not be matched
+    # correctly. If second stage works without mistakes, this should not be
+    # necessary anymoregex.
+    contributions_extended = contributions_extended.fillna("")
+
+    # Clean all the names still remaining from PDF Header.
+    # KEEP IN MIND THIS ALSO DELETES NAMES IN VOTING LISTS!!!
+    # And I think not all names are cleaned because of their position, e.g.
+    # "Max Mustermann, Bundeskanzler"
+    # THIS PART IS IMPORTANT AND SHOULD WORK PROPERLY, AS REOCCURING NAMES
+    # CAN INTRODUCE A LARGE BIAS IN TEXT ANALYSIS
+    names = contributions_extended["name_raw"].to_list()
+    contributions_extended["content"] = contributions_extended["content"].apply(
+        clean_name_headers,
+        args=(np.unique(names), True),
+    )
+
+    contributions_extended.reset_index(inplace=True, drop=True)
+
+    # Delete all not alphabetical chars, keep "-" as it occurs often in
+    # names.
+    # Question: Is any other character deleted, which could be in a name?
+    # Answer: I don't think so.
+    contributions_extended["name_raw"] = contributions_extended["name_raw"].astype(str)
+    contributions_extended["name_raw"] = contributions_extended["name_raw"].str.replace(
+        r"[^a-zA-ZÖÄÜäöüß\-]", " ", regex=True
+    )
+
+    # Replace more than two whitespaces with one.
+    contributions_extended["name_raw"] = contributions_extended["name_raw"].str.replace(
+        r"  +", " ", regex=True
+    )
+
+    # Split the names into academic titles, first names and last name.
+    split = split_names(contributions_extended["name_raw"])
+    contributions_extended["acad_title"] = split["acad_title"]
+    contributions_extended["first_name"] = split["first_name"]
+    contributions_extended["last_name"] = split["last_name"]
+
+    # look for parties in the faction column and replace them with a
+    # standardized faction name
+    faction_abbrevs = faction_classifier.factions_of(contributions_extended["faction"])
+    found = faction_abbrevs.notna() & contributions_extended["faction"].astype(bool)
+    contributions_extended.loc[found, "faction"] = faction_abbrevs[found]
+    contributions_extended.loc[found, "faction_id"] = classify.faction_ids(
+        faction_abbrevs[found], factions
+    )
+
+    return contributions_extended
+
+
+def load_politicians(path):
+    """Reads politicians.csv and prepares it for matching the contributors."""
+    politicians = pd.read_csv(path)
+    politicians = politicians.loc[
+        :,
+        [
+            "ui",
+            "electoral_term",
+            "faction_id",
+            "first_name",
+            "last_name",
+            "gender",
+            "constituency",
+            "institution_type",
+        ],
+    ].copy()
+
+    politicians = politicians.astype(dtype={"ui": "int64"})
+
+    # Some cleaning to make matching easier.
+    politicians["constituency"] = politicians["constituency"].fillna("")
+
+    politicians["first_name"] = politicians["first_name"].str.lower()
+    politicians["last_name"] = politicians["last_name"].str.lower()
+    politicians["constituency"] = politicians["constituency"].str.lower()
+
+    politicians["first_name"] = politicians["first_name"].str.replace("ß", "ss", regex=False)
+    politicians["last_name"] = politicians["last_name"].str.replace("ß", "ss", regex=False)
+
+    politicians["first_name"] = politicians["first_name"].apply(str.split)
+
+    return politicians
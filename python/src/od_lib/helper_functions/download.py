@@ -0,0 +1,182 @@
+from concurrent.futures import ThreadPoolExecutor
+from od_lib.helper_functions.build_cache import Journal, atomic_output
+from od_lib.helper_functions.progressbar import progressbar
+from pathlib import Path
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import json
+import os
+import requests
+import threading
+
+# Downloads into a folder keep a manifest of the fetched files in
+# <folder>/downloads.json:
+#
+#   {"electoral_term_20/20001.xml": {"url": ..., "etag": ..., "last_modified": ...,
+#                                    "size": ...}}
+#
+# A file in the manifest is only requested again to revalidate it, with
+# If-None-Match / If-Modified-Since, and the server answers 304 if it did not
+# change. A file is downloaded into <name>.part first. If the download breaks
+# off, the next run continues the part with a Range request, as long as the
+# server still sends the same ETag or Last-Modified (If-Range).
+
+MANIFEST_NAME = "downloads.json"
+PART_SUFFIX = ".part"
+USER_AGENT = "Mozilla/5.0"
+CHUNK_SIZE = 1 << 16
+TIMEOUT = 60
+
+
+def create_session(workers=8, retries=3):
+    """A requests session with a connection pool for the worker threads which
+    retries failed connections and server errors."""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=workers,
+        pool_maxsize=workers,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+def validators(response):
+    """The ETag and Last-Modified headers of a response."""
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+
+class Downloader:
+    """Downloads files into a folder, see the comment above.
+
+    fetch returns "new", "updated", "unchanged" (304) or "skipped" (already
+    downloaded and not revalidated). Every finished file is appended to a
+    journal next to the manifest, so a crashed run does not download the files
+    it finished again.
+    """
+
+    def __init__(self, folder, session=None, workers=8):
+        self.folder = Path(folder)
+        self.path = self.folder / MANIFEST_NAME
+        self.journal = Journal(self.path.with_name(MANIFEST_NAME + ".journal"))
+        self.session = create_session(workers) if session is None else session
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.files = {}
+        if self.path.exists():
+            with open(self.path) as file:
+                self.files = json.load(file)
+        for name, entry in self.journal.records():
+            self.files[name] = entry
+
+    def update(self, name, entry):
+        with self.lock:
+            self.files[name] = entry
+            self.journal.append([name, entry])
+
+    def fetch(self, url, name, revalidate=False, transform=None):
+        """Downloads url to folder/name. transform is applied to the content
+        (bytes) of the complete download before it is stored."""
+        path = self.folder / name
+        part_path = path.with_name(path.name + PART_SUFFIX)
+        entry = self.files.get(name, {})
+        exists = path.exists() and entry.get("url") == url
+        if exists and not revalidate:
+            return "skipped"
+
+        # Ranges refer to the bytes as sent, so the content is not compressed.
+        headers = {"Accept-Encoding": "identity"}
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        part = entry.get("part", {})
+        if offset and (part.get("etag") or part.get("last_modified")):
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = part.get("etag") or part["last_modified"]
+        elif exists:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        with self.session.get(url, headers=headers, stream=True, timeout=TIMEOUT) as response:
+            if response.status_code == 304:
+                return "unchanged"
+            if response.status_code == 416:
+                # The part does not fit the file anymore, start over.
+                part_path.unlink()
+                return self.fetch(url, name, revalidate, transform)
+            response.raise_for_status()
+
+            resumed = response.status_code == 206
+            if resumed and not response.headers.get("Content-Range", "").startswith(
+                f"bytes {offset}-"
+            ):
+                raise ValueError(f"{url}: unexpected Content-Range, expected offset {offset}.")
+            if not resumed:
+                offset = 0
+                self.update(name, dict(entry, url=url, part=validators(response)))
+            expected = response.headers.get("Content-Length")
+
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(part_path, "ab" if resumed else "wb") as file:
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    file.write(chunk)
+            size = part_path.stat().st_size
+            if expected is not None and size - offset != int(expected):
+                raise IOError(f"{url}: download incomplete, {size - offset} of {expected} bytes.")
+            stored = self.files[name]["part"] if resumed else validators(response)
+
+        if transform is None:
+            os.replace(part_path, path)
+        else:
+            with open(part_path, "rb") as file:
+                content = transform(file.read())
+            with atomic_output(path) as temp_path:
+                with open(temp_path, "wb") as file:
+                    file.write(content)
+            part_path.unlink()
+        self.update(name, {"url": url, "size": size, **stored})
+        return "updated" if exists else "new"
+
+    def fetch_all(self, files, revalidate=False, transform=None, prefix="Downloading..."):
+        """Downloads the (url, name) pairs with the worker threads. Returns
+        {name: status} and {name: error} of the failed downloads, a failed
+        file does not stop the others."""
+        results = {}
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [
+                (name, executor.submit(self.fetch, url, name, revalidate, transform))
+                for url, name in files
+            ]
+            for name, future in progressbar(futures, prefix):
+                try:
+                    results[name] = future.result()
+                except Exception as error:
+                    failures[name] = error
+        self.save()
+        return results, failures
+
+    def save(self):
+        """Writes the manifest atomically."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with atomic_output(self.path) as temp_path:
+            with open(temp_path, "w") as file:
+                json.dump(self.files, file, indent=1, sort_keys=True)
+        self.journal.remove()
+
+
+def summary(results):
+    """E.g. "3 new, 1 updated, 250 unchanged"."""
+    counts = {}
+    for status in results.values():
+        counts[status] = counts.get(status, 0) + 1
+    return ", ".join(f"{count} {status}" for status, count in sorted(counts.items()))
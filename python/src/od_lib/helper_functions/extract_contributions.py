@@ -1,5 +1,6 @@
+from od_lib.helper_functions import patterns
+from od_lib.helper_functions.clean_text import bracket_spans
 import pandas as pd
-import regex
 import copy
 
 # Party Patterns:
@@ -117,6 +118,100 @@ name_Pattern = {
 }
 
 
+def contribution_pattern(name, base_Pattern, opening="", closing=""):
+    """Registers base_Pattern between the (extended) start contribution
+    bracket patterns."""
+    return patterns.register(
+        "extract_contributions." + name,
+        start_contributions_opening_bracket_Pattern.format(opening)
+        + base_Pattern
+        + start_contributions_closing_bracket_Pattern.format(closing),
+    )
+
+
+# Extends the opening_bracket_Pattern of the shouts
+shout_opening_Pattern = r"|(?<=[Hh]eiterkeit\s)|(?<=[Ll]achen\s)|(?<=[Ww]eiterer\s)|(?<=[Ww]eitere\s)|(?<=[Ee]rneuter\s)|(?<=[Ee]rneute\s)|(?<=[Ff]ortgesetzte\s)|(?<=[Ll]ebhafte\s)|(?<=[Ww]eitere\s[Ll]ebhafte\s|(?<=Andauernde\s)|(?<=Fortdauernde\s))"  # noqa: E501
+
+# Compiled Patterns, the ones with names depend on the name_Pattern id:
+applause_Pattern = contribution_pattern("applause", base_applause_Pattern)
+cheerfulness_Pattern = contribution_pattern("cheerfulness", base_cheerfulness_Pattern)
+objection_Pattern = contribution_pattern("objection", base_objection_Pattern)
+laughter_Pattern = contribution_pattern(
+    "laughter",
+    base_laughter_Pattern,
+    closing=r"|\sund\sZurufe\)",  # Extending the closing_bracket_Pattern
+)
+approval_Pattern = contribution_pattern("approval", base_approval_Pattern)
+interruption_Pattern = contribution_pattern("interruption", base_interruption_Pattern)
+disturbance_Pattern = contribution_pattern("disturbance", base_disturbance_Pattern)
+faction_shout_Pattern = contribution_pattern(
+    "faction_shout",
+    r"(?P<delete>(?P<initiator>"
+    + text_Pattern.format("").replace("{}", "{{}}")
+    + r"+):\s*(?P<content>"
+    + text_Pattern
+    + r"+))",
+    opening=shout_opening_Pattern,
+)
+
+person_interjection_Pattern = {}
+shout_Pattern = {}
+first_person_search_Pattern = {}
+second_person_search_Pattern = {}
+for name_Pattern_id, extra_Pattern in ((0, ""), (1, r"(?:Abg\s?\.\s?)")):
+    names = name_Pattern[name_Pattern_id].format(opening_bracket_Pattern, closing_bracket_Pattern)
+    person_interjection_Pattern[name_Pattern_id] = contribution_pattern(
+        f"person_interjection.{name_Pattern_id}",
+        base_person_interjection_Pattern.format(extra_Pattern + names),
+    )
+    shout_Pattern[name_Pattern_id] = contribution_pattern(
+        f"shout.{name_Pattern_id}",
+        base_shout_Pattern.format(
+            r"\s*Abg\s?\.\s?{}".format(names),
+            text_Pattern.format("").replace("{}", "{{}}"),
+        ),
+        opening=shout_opening_Pattern,
+    )
+    # Looking for key Abg.
+    first_person_search_Pattern[name_Pattern_id] = patterns.register(
+        f"extract_contributions.first_person.{name_Pattern_id}",
+        r"Abg\s?\.\s?{}(?:(?<=!:)|(?!:))".format(names),
+    )
+    # Looking for key und
+    second_person_search_Pattern[name_Pattern_id] = patterns.register(
+        f"extract_contributions.second_person.{name_Pattern_id}",
+        r"(?:\sund|sowie\sdes)\s+(?:des|der)?{}(?:(?<=!:)|(?!:))".format(names),
+    )
+
+other_contributions_Pattern = patterns.register(
+    "extract_contributions.other_contributions",
+    r"(?P<type>[Bb]eifall|[Zz]uruf|[Gg]egenruf|[Rr]uf|[Hh]eiterkeit|[Ww]iderspruch|[Ll]achen|[Zz]ustimmung|[Uu]nterbrechung|[Uu]nruhe)(?P<initiators>(?:(?!\s[-––]\s).)*)\s*",  # noqa: E501
+)
+zwischenfrage_Pattern = patterns.register("extract_contributions.zwischenfrage", "[Zz]wischenfrage")
+faction_search_Pattern = patterns.register_all(
+    "extract_contributions.faction",
+    {faction: r"(?<!\[)(" + parties[faction] + r")(?![^[\s]*\])" for faction in parties},
+)
+left_right_search_Pattern = patterns.register(
+    "extract_contributions.left_right", left_right_Pattern
+)
+government_Pattern = patterns.register(
+    "extract_contributions.government", r"[Rr]egierungspar[^\s]+"
+)
+
+newline_Pattern = patterns.register("extract_contributions.newline", r"\n")
+shout_prefix_Pattern = patterns.register(
+    "extract_contributions.shout_prefix",
+    r"(Gegenrufe?\sdes\s|Gegenrufe?\sder\s|Zurufe?\sdes\s|Zurufe?\sder\s)(Abg\s?\.\s)*",
+)
+member_Pattern = patterns.register("extract_contributions.member", r"(Abg\s?\.\s?|Abgeordneten\s)")
+pronoun_Pattern = patterns.register(
+    "extract_contributions.pronoun", r"(^\s?der\s?|^\s?die\s?|^\s?das\s?|^\s?von\s?)"
+)
+newlines_Pattern = patterns.register("extract_contributions.newlines", r"\n+")
+whitespace_Pattern = patterns.register("extract_contributions.whitespace", r"\s+")
+
+
 def get_government_factions(electoral_term):
     """Get the government factions for the given electoral_term"""
     government_electoral_term = {
@@ -152,16 +247,12 @@ def convert_to_string(string):
 def clean_person_name(name_raw):
     """cleans the person name_raw"""
     # Remove any newlines from the name_raw
-    name_raw = regex.sub(r"\n", " ", convert_to_string(name_raw))
+    name_raw = newline_Pattern.sub(" ", convert_to_string(name_raw))
     # Remove any Additional stuff
-    name_raw = regex.sub(
-        r"(Gegenrufe?\sdes\s|Gegenrufe?\sder\s|Zurufe?\sdes\s|Zurufe?\sder\s)(Abg\s?\.\s)*",
-        "",
-        name_raw,
-    )
-    name_raw = regex.sub(r"(Abg\s?\.\s?|Abgeordneten\s)", "", name_raw)
+    name_raw = shout_prefix_Pattern.sub("", name_raw)
+    name_raw = member_Pattern.sub("", name_raw)
     # Remove any Pronouns
-    name_raw = regex.sub(r"(^\s?der\s?|^\s?die\s?|^\s?das\s?|^\s?von\s?)", "", name_raw)
+    name_raw = pronoun_Pattern.sub("", name_raw)
     # Remove whitespaces at the beginning and at the end
     name_raw = name_raw.lstrip(" ").rstrip(" ")
 
@@ -193,10 +284,7 @@ def extract_initiators(
 
     initiators_not_removed = copy.copy(initiators)
     # Remove wrongly placed contributions from initiators and pass them recursively
-    other_contributions = regex.search(
-        r"(?P<type>[Bb]eifall|[Zz]uruf|[Gg]egenruf|[Rr]uf|[Hh]eiterkeit|[Ww]iderspruch|[Ll]achen|[Zz]ustimmung|[Uu]nterbrechung|[Uu]nruhe)(?P<initiators>(?:(?!\s[-––]\s).)*)\s*",
-        initiators,
-    )
+    other_contributions = other_contributions_Pattern.search(initiators)
     if other_contributions:
         frame, _ = methods[other_contributions.group("type").lower()](
             "(" + other_contributions.group() + ")",
@@ -215,23 +303,13 @@ def extract_initiators(
         # Set name pattern to the first name pattern (first row in name_Pattern)
         name_Pattern_id = 0
 
-    # Create the first_person_search_Pattern (looking for key Abg.)
-    first_person_search_Pattern = r"Abg\s?\.\s?{}(?:(?<=!:)|(?!:))".format(
-        name_Pattern[name_Pattern_id].format(
-            opening_bracket_Pattern,
-            closing_bracket_Pattern,
-        )
-    )
-    # Find match
-    first_person_match = regex.search(
-        first_person_search_Pattern,
-        initiators,
-    )
+    # Find match (looking for key Abg.)
+    first_person_match = first_person_search_Pattern[name_Pattern_id].search(initiators)
     if first_person_match:
         # Remove name_raw from the search text
         initiators = initiators.replace(first_person_match.group(), "")
         # Check if the person was just asking a "Zwischenfrage"
-        if not regex.search("[Zz]wischenfrage", initiators):
+        if not zwischenfrage_Pattern.search(initiators):
             # Get the persons name_raw
             name_raw = first_person_match.group("name_raw")
             # Try to get the persons faction
@@ -256,26 +334,13 @@ def extract_initiators(
                 text_position,
             )
 
-    # Create the first_person_search_Pattern (looking for key und)
-    second_person_search_Pattern = (
-        r"(?:\sund|sowie\sdes)\s+(?:des|der)?{}(?:(?<=!:)|(?!:))".format(
-            name_Pattern[name_Pattern_id].format(
-                opening_bracket_Pattern,
-                closing_bracket_Pattern,
-            )
-        )
-    )
-
-    # Find match
-    second_person_match = regex.search(
-        second_person_search_Pattern,
-        initiators,
-    )
+    # Find match (looking for key und)
+    second_person_match = second_person_search_Pattern[name_Pattern_id].search(initiators)
     if second_person_match:
         # Remove the person name_raw from the search text
         initiators = initiators.replace(second_person_match.group(), "")
         # Check if the person was just asking a "Zwischenfrage"
-        if not regex.search("[Zz]wischenfrage", initiators):
+        if not zwischenfrage_Pattern.search(initiators):
             # Get the persons name_raw
             name_raw = second_person_match.group("name_raw")
             # Try to get the persons faction
@@ -302,10 +367,8 @@ def extract_initiators(
 
     # Iterate over all parties
     for faction in parties:
-        # Create the faction_search_Pattern
-        faction_search_Pattern = r"(?<!\[)(" + parties[faction] + r")(?![^[\s]*\])"
         # Find match for faction
-        faction_match = regex.search(faction_search_Pattern, initiators)
+        faction_match = faction_search_Pattern[faction].search(initiators)
         # Check if there is a match
         if faction_match:
             # Remove the faction from the search text
@@ -313,10 +376,8 @@ def extract_initiators(
             # Add an entry to the frame
             frame = add_entry(frame, identity, type, "", faction, "", "", text_position)
 
-    # Create the left_right_search_Pattern
-    left_right_search_Pattern = left_right_Pattern
     # Find matches
-    left_right_matches = list(regex.finditer(left_right_search_Pattern, initiators))
+    left_right_matches = list(left_right_search_Pattern.finditer(initiators))
     for direction in left_right_matches:
         # Remove the direction from the search text
         initiators = initiators.replace(direction.group(), "")
@@ -326,7 +387,7 @@ def extract_initiators(
         )
 
     # Search for Regierungsparteien in the initiators
-    government_matches = regex.search(r"[Rr]egierungspar[^\s]+", initiators)
+    government_matches = government_Pattern.search(initiators)
     if government_matches:
         initiators = initiators.replace(government_matches.group(), "")
         # iterate over every faction get_government_factions returns
@@ -348,7 +409,7 @@ def extract_initiators(
             print(
                 initiators_not_removed,
                 session,
-                first_person_search_Pattern,
+                first_person_search_Pattern[name_Pattern_id].pattern,
             )
     # Return the frame
     return frame, initiators
@@ -357,23 +418,7 @@ def extract_initiators(
 def extract_applause(text, electoral_term, session, identity, text_position, frame):
     """Extracts applause from the given text"""
 
-    # creates the Pattern modularly
-    applause_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_applause_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            applause_Pattern,
-            text,
-        )
-    )
+    matches = list(applause_Pattern.finditer(text))
 
     for match in matches:
         # replace everything except the delimeters
@@ -402,27 +447,12 @@ def extract_person_interjection(
     if session < 7115:
         # Set name pattern to the second name pattern (second row in name_Pattern)
         name_Pattern_id = 1
-        extra_Pattern = r"(?:Abg\s?\.\s?)"
     else:
         # Set name pattern to the first name pattern (first row in name_Pattern)
         name_Pattern_id = 0
-        extra_Pattern = ""
-
-    # creates the Pattern "very" modularly
-    person_interjection_Pattern = (
-        start_contributions_opening_bracket_Pattern.format("")
-        + base_person_interjection_Pattern.format(
-            extra_Pattern
-            + name_Pattern[name_Pattern_id].format(
-                opening_bracket_Pattern,
-                closing_bracket_Pattern,
-            )
-        )
-        + start_contributions_closing_bracket_Pattern.format("")
-    )
 
     # Match person interjections
-    matches = list(regex.finditer(person_interjection_Pattern, text))
+    matches = list(person_interjection_Pattern[name_Pattern_id].finditer(text))
 
     # Iterate over matches
     for match in matches:
@@ -467,31 +497,7 @@ def extract_shout(text, electoral_term, session, identity, text_position, frame)
         # Set name pattern to the first name pattern (first row in name_Pattern)
         name_Pattern_id = 0
 
-    # creates the Pattern modularly
-    shout_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            r"|(?<=[Hh]eiterkeit\s)|(?<=[Ll]achen\s)|(?<=[Ww]eiterer\s)|(?<=[Ww]eitere\s)|(?<=[Ee]rneuter\s)|(?<=[Ee]rneute\s)|(?<=[Ff]ortgesetzte\s)|(?<=[Ll]ebhafte\s)|(?<=[Ww]eitere\s[Ll]ebhafte\s|(?<=Andauernde\s)|(?<=Fortdauernde\s))"  # Extending the opening_bracket_Pattern
-        )
-        + base_shout_Pattern.format(
-            r"\s*Abg\s?\.\s?{}".format(
-                name_Pattern[name_Pattern_id].format(
-                    opening_bracket_Pattern,
-                    closing_bracket_Pattern,
-                )
-            ),
-            text_Pattern.format("").replace("{}", "{{}}"),
-        )
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            shout_Pattern,
-            text,
-        )
-    )
+    matches = list(shout_Pattern[name_Pattern_id].finditer(text))
     for match in matches:
         if match.group("initiator"):
             # replace everything except the delimeters
@@ -539,27 +545,7 @@ def extract_shout(text, electoral_term, session, identity, text_position, frame)
             )
 
     # Extract faction shouts
-    # creates the Pattern modularly
-    faction_shout_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            r"|(?<=[Hh]eiterkeit\s)|(?<=[Ll]achen\s)|(?<=[Ww]eiterer\s)|(?<=[Ww]eitere\s)|(?<=[Ee]rneuter\s)|(?<=[Ee]rneute\s)|(?<=[Ff]ortgesetzte\s)|(?<=[Ll]ebhafte\s)|(?<=[Ww]eitere\s[Ll]ebhafte\s|(?<=Andauernde\s)|(?<=Fortdauernde\s))"  # Extending the opening_bracket_Pattern
-        )
-        + r"(?P<delete>(?P<initiator>"
-        + text_Pattern.format("").replace("{}", "{{}}")
-        + r"+):\s*(?P<content>"
-        + text_Pattern
-        + r"+))"
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            faction_shout_Pattern,
-            text,
-        )
-    )
+    matches = list(faction_shout_Pattern.finditer(text))
     for match in matches:
         # replace everything except the delimeters
         text = text.replace(match.group("delete"), " ")
@@ -568,10 +554,8 @@ def extract_shout(text, electoral_term, session, identity, text_position, frame)
 
         # Iterate over all parties
         for faction in parties:
-            # Create the faction_search_Pattern
-            faction_search_Pattern = r"(?<!\[)(" + parties[faction] + r")(?![^[\s]*\])"
             # Find match for faction
-            faction_match = regex.search(faction_search_Pattern, initiators)
+            faction_match = faction_search_Pattern[faction].search(initiators)
             # Check if there is a match
             if faction_match:
                 # Remove the faction from the search text
@@ -588,23 +572,7 @@ def extract_shout(text, electoral_term, session, identity, text_position, frame)
 def extract_cheerfulness(text, electoral_term, session, identity, text_position, frame):
     """Extracts cheerfulness from the given text"""
 
-    # creates the Pattern modularly
-    cheerfulness_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_cheerfulness_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            cheerfulness_Pattern,
-            text,
-        )
-    )
+    matches = list(cheerfulness_Pattern.finditer(text))
     for match in matches:
         # replace everything except the delimeters
         text = text.replace(match.group("delete"), " ")
@@ -626,23 +594,7 @@ def extract_cheerfulness(text, electoral_term, session, identity, text_position,
 def extract_objection(text, electoral_term, session, identity, text_position, frame):
     """Extracts objection from the given text"""
 
-    # creates the Pattern modularly
-    objection_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_objection_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            objection_Pattern,
-            text,
-        )
-    )
+    matches = list(objection_Pattern.finditer(text))
     for match in matches:
         # replace everything except the delimeters
         text = text.replace(match.group("delete"), " ")
@@ -664,23 +616,7 @@ def extract_objection(text, electoral_term, session, identity, text_position, fr
 def extract_laughter(text, electoral_term, session, identity, text_position, frame):
     """Extracts laughter from the given text"""
 
-    # creates the Pattern modularly
-    laughter_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_laughter_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            r"|\sund\sZurufe\)"  # Extending the closing_bracket_Pattern
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            laughter_Pattern,
-            text,
-        )
-    )
+    matches = list(laughter_Pattern.finditer(text))
     for match in matches:
         # replace everything except the delimeters
         text = text.replace(match.group("delete"), " ")
@@ -702,23 +638,7 @@ def extract_laughter(text, electoral_term, session, identity, text_position, fra
 def extract_approval(text, electoral_term, session, identity, text_position, frame):
     """Extracts approval from the given text"""
 
-    # creates the Pattern modularly
-    approval_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_approval_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            approval_Pattern,
-            text,
-        )
-    )
+    matches = list(approval_Pattern.finditer(text))
     for match in matches:
         # replace everything except the delimeters
         text = text.replace(match.group("delete"), " ")
@@ -740,19 +660,8 @@ def extract_approval(text, electoral_term, session, identity, text_position, fra
 def extract_interruption(text, electoral_term, session, identity, text_position, frame):
     """Extracts interruptions from the given text"""
 
-    # Creates the Pattern modularly
-    interruption_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_interruption_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
     # Find matches
-    matches = list(regex.finditer(interruption_Pattern, text))
+    matches = list(interruption_Pattern.finditer(text))
 
     # Iterate over matches
     for match in matches:
@@ -776,23 +685,7 @@ def extract_interruption(text, electoral_term, session, identity, text_position,
 def extract_disturbance(text, electoral_term, session, identity, text_position, frame):
     """Extracts disturbance from the given text"""
 
-    # creates the Pattern modularly
-    disturbance_Pattern = (
-        start_contributions_opening_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-        + base_disturbance_Pattern
-        + start_contributions_closing_bracket_Pattern.format(
-            ""  # Nothing to extend, so .format("")
-        )
-    )
-
-    matches = list(
-        regex.finditer(
-            disturbance_Pattern,
-            text,
-        )
-    )
+    matches = list(disturbance_Pattern.finditer(text))
 
     for match in matches:
         # replace everything except the delimeters
@@ -818,9 +711,10 @@ def extract(
     electoral_term = session // 1000
 
     # Match all brackets
-    brackets = list(
-        regex.finditer(r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)", speech_text)
-    )
+    brackets = bracket_spans(speech_text)
+    # The content of every bracket is replaced with its text position, the
+    # text is rebuilt once at the end.
+    positions = [None] * len(brackets)
 
     # Create an empty frame for the normal contributions
     frame = {
@@ -836,14 +730,15 @@ def extract(
     contributions_simplified = {"text_position": [], "content": [], "speech_id": []}
 
     # Iterate over all brackets
-    for bracket in reversed(brackets):
+    for index in reversed(range(len(brackets))):
+        start, end = brackets[index]
         # calculate reversed text_position
         reversed_text_position = len(brackets) - 1 - text_position
-        # Make sure to remove all newlines
-        speech_text_no_newline = regex.sub(r"\n+", " ", bracket.group())
-        speech_text_no_newline = regex.sub(r"\s+", " ", speech_text_no_newline)
         # Save the bracket text
-        bracket_text = bracket.group()
+        bracket_text = speech_text[start:end]
+        # Make sure to remove all newlines
+        speech_text_no_newline = newlines_Pattern.sub(" ", bracket_text)
+        speech_text_no_newline = whitespace_Pattern.sub(" ", speech_text_no_newline)
         # Save deleted text to DataFrame
         contributions_simplified["text_position"].append(
             reversed_text_position if text_position_reversed else text_position
@@ -851,16 +746,7 @@ def extract(
         contributions_simplified["content"].append(bracket_text)
         contributions_simplified["speech_id"].append(identity)
 
-        deletion_span = bracket.span(1)
-
-        # Remove the bracket text from the speech_text and replace it with the text_position
-        speech_text = (
-            speech_text[: deletion_span[0]]
-            + "{"
-            + str(reversed_text_position if text_position_reversed else text_position)
-            + "}"
-            + speech_text[deletion_span[1] :]
-        )
+        positions[index] = reversed_text_position if text_position_reversed else text_position
 
         contribution_methods = [
             extract_applause,
@@ -875,17 +761,34 @@ def extract(
         ]
 
         for method in contribution_methods:
-            frame, speech_text_no_newline = method(
-                speech_text_no_newline,
-                electoral_term,
-                session,
-                identity,
-                reversed_text_position if text_position_reversed else text_position,
-                frame,
-            )
+            try:
+                with patterns.located(speech=identity):
+                    frame, speech_text_no_newline = method(
+                        speech_text_no_newline,
+                        electoral_term,
+                        session,
+                        identity,
+                        reversed_text_position if text_position_reversed else text_position,
+                        frame,
+                    )
+            except patterns.PatternTimeout:
+                # The contributions of this type stay in the bracket text,
+                # the timeout is reported as a slow input.
+                continue
 
         text_position += 1
 
+    # Remove the bracket texts from the speech_text and replace them with the
+    # text_position, the brackets themselves stay.
+    parts = []
+    position = 0
+    for (start, end), bracket_position in zip(brackets, positions):
+        parts.append(speech_text[position : start + 1])
+        parts.append("{" + str(bracket_position) + "}")
+        position = end - 1
+    parts.append(speech_text[position:])
+    speech_text = "".join(parts)
+
     return (
         pd.DataFrame(frame),
         speech_text,
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Scores a whole batch of names in one call on all cores. rapidfuzz is in the
+# requirements, without it the names are scored one pair after the other.
+try:
+    from rapidfuzz import process
+except ImportError:
+    process = None
+
+# Candidates scoring below the cutoff are not cached, a lower threshold scans
+# all names again.
+CUTOFF = 0.5
+
+
+def score_matrix(queries, choices, scorer):
+    """The scores of every query against every choice, an array of the shape
+    (len(queries), len(choices)). The scores are the same as scorer(query,
+    choice)."""
+    if process is not None:
+        return process.cdist(queries, choices, scorer=scorer, dtype=np.float64, workers=-1)
+    return np.array(
+        [[scorer(query, choice) for choice in choices] for query in queries], dtype=np.float64
+    ).reshape(len(queries), len(choices))
+
+
+class FuzzyNames:
+    """Fuzzy candidates of names among the last names of the politicians of a
+    term.
+
+    Names are scored in batches against all last names, the positions and
+    scores of the candidates above CUTOFF are cached per name. Add the names
+    which may be looked up with add() first, the others are scored one by one
+    when they are looked up.
+    """
+
+    def __init__(self, last_names, scorer, cutoff=CUTOFF):
+        self.last_names = list(last_names)
+        self.scorer = scorer
+        self.cutoff = cutoff
+        self.candidates = {}
+
+    def add(self, names):
+        """Scores the names which are not cached yet in one batch."""
+        names = [
+            name
+            for name in dict.fromkeys(names)
+            if isinstance(name, str) and name not in self.candidates
+        ]
+        if not names:
+            return
+        scores = score_matrix(names, self.last_names, self.scorer)
+        for name, row in zip(names, scores):
+            positions = np.flatnonzero(row >= self.cutoff)
+            self.candidates[name] = (positions, row[positions])
+
+    def scores(self, name, threshold):
+        """The positions of the last names scoring at least threshold against
+        name, in their order, and their scores scorer(name, last name)."""
+        if threshold < self.cutoff:
+            scores = np.array(
+                [self.scorer(name, last_name) for last_name in self.last_names], dtype=np.float64
+            )
+            positions = np.flatnonzero(scores >= threshold)
+            return positions.tolist(), scores[positions].tolist()
+        # Anything but a string scores 0.
+        if not isinstance(name, str):
+            return [], []
+        if name not in self.candidates:
+            self.add([name])
+        positions, scores = self.candidates[name]
+        keep = scores >= threshold
+        return positions[keep].tolist(), scores[keep].tolist()
+
+    def matches(self, name, threshold):
+        """The positions of the last names scoring at least threshold against
+        name, in their order."""
+        return self.scores(name, threshold)[0]
@@ -0,0 +1,323 @@
+from od_lib.helper_functions import patterns
+from pathlib import Path
+import csv
+import json
+import os
+import regex
+import sys
+import time
+
+# Not available on Windows, the peak RSS of the process is then reported as
+# None.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REPORT_ENV = "OD_REPORT_DIR"
+STAGE_REPORTS = "stages"
+RUN_REPORT = "run.json"
+REGEX_REPORT = "regex.csv"
+SLOW_INPUTS_REPORT = "slow_inputs.csv"
+
+# Counters of the running measurements in this process, see count().
+_counters = []
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process over its whole lifetime, so it
+    is the same for all later sessions measured in the process."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def rss_mb():
+    """Current resident set size of this process, None where /proc is not
+    available."""
+    try:
+        with open("/proc/self/statm") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1 << 20)
+
+
+def count(**counters):
+    """Adds counters (e.g. rows, input_bytes, output_bytes) to the session
+    measured in this process and to the measurements around it, e.g. the
+    whole stage. Does nothing outside of a measurement."""
+    for active in _counters:
+        for name, value in counters.items():
+            active[name] = active.get(name, 0) + value
+
+
+def count_input(path):
+    """Counts a file read by the running measurements."""
+    count(input_bytes=os.path.getsize(path))
+
+
+def count_output(path, rows=None):
+    """Counts a file written by the running measurements, together with the
+    number of rows it holds."""
+    if rows is None:
+        count(output_bytes=os.path.getsize(path))
+    else:
+        count(output_bytes=os.path.getsize(path), rows=rows)
+
+
+class Measurement:
+    """Wall time, CPU time, RSS and counters of one unit of work in the
+    current process.
+
+    The RSS at the end and its change since the start belong to the unit of
+    work, the peak RSS is the one of the whole process so far.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        _counters.append(self.counters)
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.rss = rss_mb()
+
+    def stop(self):
+        _counters[:] = [active for active in _counters if active is not self.counters]
+        rss = rss_mb()
+        return {
+            "wall_seconds": time.perf_counter() - self.wall,
+            "cpu_seconds": time.process_time() - self.cpu,
+            "rss_mb": rss,
+            "rss_change_mb": None if None in (rss, self.rss) else rss - self.rss,
+            "process_peak_rss_mb": peak_rss_mb(),
+            **self.counters,
+        }
+
+
+def report_dir():
+    """Directory of the running pipeline run, None if nothing is reported."""
+    path = os.environ.get(REPORT_ENV)
+    return Path(path) if path else None
+
+
+class StageReport:
+    """Collects per-session metrics of a stage and writes them as
+    <report dir>/stages/<stage>.json and .csv.
+
+    Sessions are either measured here with start() (a session runs until the
+    next start() or save()) or measured elsewhere, e.g. in a worker, and
+    added with add(). Without OD_REPORT_DIR nothing is written. The stage
+    defaults to the name of the running script without its number prefix.
+
+    With OD_REGEX_STATS the pattern statistics of the stage are ranked in the
+    json and in <stage>.regex.csv. The slow pattern inputs, including the
+    timed out ones, go to <stage>.slow_inputs.csv. Without a report directory
+    both are printed to stderr.
+    """
+
+    def __init__(self, stage=None, directory=None):
+        self.stage = stage or regex.sub(r"^\d+_", "", Path(sys.argv[0]).stem)
+        self.directory = directory or report_dir()
+        self.sessions = []
+        self.running = None
+        self.measurement = Measurement()
+        # Counters and peak RSS of sessions measured in other processes.
+        self.external = {}
+        self.worker_peak_rss_mb = None
+        # Pattern statistics and slow pattern inputs of the sessions, see
+        # patterns.take_stats() and patterns.take_slow_inputs().
+        self.regex = {}
+        self.slow_inputs = []
+
+    def start(self, session):
+        self.finish()
+        self.running = (str(session), Measurement())
+
+    def finish(self):
+        if self.running is not None:
+            session, measurement = self.running
+            self.running = None
+            self.sessions.append({"session": session, **measurement.stop()})
+
+    def add(self, session, metrics, external=True):
+        """Adds a session measured with a Measurement. Only the counters of
+        sessions measured in another process (external) are added to the
+        stage, the others already counted into it."""
+        metrics = dict(metrics)
+        patterns.merge_stats(self.regex, metrics.pop("regex", {}))
+        self.slow_inputs.extend(metrics.pop("slow_inputs", []))
+        self.sessions.append({"session": str(session), **metrics})
+        if not external:
+            return
+        for name in ["input_bytes", "output_bytes", "rows"]:
+            if name in metrics:
+                self.external[name] = self.external.get(name, 0) + metrics[name]
+        if metrics.get("process_peak_rss_mb") is not None:
+            self.worker_peak_rss_mb = max(
+                self.worker_peak_rss_mb or 0, metrics["process_peak_rss_mb"]
+            )
+
+    def summary(self):
+        summary = self.measurement.stop()
+        summary["sessions"] = len(self.sessions)
+        for name, value in self.external.items():
+            summary[name] = summary.get(name, 0) + value
+        if self.worker_peak_rss_mb is not None:
+            summary["worker_peak_rss_mb"] = self.worker_peak_rss_mb
+        return summary
+
+    def save(self):
+        self.finish()
+        regex_rows = patterns.ranked(patterns.merge_stats(self.regex, patterns.take_stats()))
+        self.slow_inputs.extend(patterns.take_slow_inputs())
+        slow_inputs = sorted(self.slow_inputs, key=lambda row: -row["seconds"])
+        if self.directory is None:
+            if regex_rows:
+                patterns.print_ranking(regex_rows)
+            if slow_inputs:
+                patterns.print_slow_inputs(slow_inputs)
+            return
+        directory = Path(self.directory) / STAGE_REPORTS
+        directory.mkdir(parents=True, exist_ok=True)
+        report = {"stage": self.stage, "summary": self.summary(), "sessions": self.sessions}
+        if regex_rows:
+            report["regex"] = regex_rows
+            write_csv(directory / (self.stage + ".regex.csv"), regex_rows, ["pattern"])
+        if slow_inputs:
+            report["slow_inputs"] = slow_inputs
+            write_csv(
+                directory / (self.stage + ".slow_inputs.csv"),
+                slow_inputs,
+                ["pattern", "seconds", "timed_out"],
+            )
+        with open(directory / (self.stage + ".json"), "w") as file:
+            json.dump(report, file, indent=1)
+        write_csv(directory / (self.stage + ".csv"), self.sessions, ["session"])
+
+
+def write_csv(path, rows, first_columns):
+    columns = list(first_columns)
+    for row in rows:
+        columns.extend(column for column in row if column not in columns)
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def load_stage_reports(directory):
+    """Returns {stage: stage report} of all stage reports of a run."""
+    reports = {}
+    for path in sorted((Path(directory) / STAGE_REPORTS).glob("*.json")):
+        with open(path) as file:
+            report = json.load(file)
+        reports[report["stage"]] = report
+    return reports
+
+
+def write_run_report(directory, stages):
+    """Combines the usage of the stage scripts measured by the runner
+    ({stage: metrics}) with the stage reports written by the scripts into
+    run.json, stages.csv and sessions.csv. The pattern statistics of all
+    stages are ranked in regex.csv, their slow inputs in slow_inputs.csv."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    stage_reports = load_stage_reports(directory)
+
+    run = {}
+    for stage in list(stages) + [s for s in stage_reports if s not in stages]:
+        metrics = dict(stages.get(stage, {}))
+        summary = stage_reports.get(stage, {}).get("summary", {})
+        # The runner sees the whole process tree, the counters only exist in
+        # the stage report.
+        for name, value in summary.items():
+            metrics.setdefault(name, value)
+        run[stage] = metrics
+
+    sessions = [
+        {"stage": stage, **session}
+        for stage, report in stage_reports.items()
+        for session in report["sessions"]
+    ]
+    with open(directory / RUN_REPORT, "w") as file:
+        json.dump({"run": directory.name, "stages": run, "sessions": sessions}, file, indent=1)
+    write_csv(
+        directory / "stages.csv",
+        [{"stage": stage, **metrics} for stage, metrics in run.items()],
+        ["stage"],
+    )
+    write_csv(directory / "sessions.csv", sessions, ["stage", "session"])
+
+    regex_rows = sorted(
+        (
+            {"stage": stage, **row}
+            for stage, report in stage_reports.items()
+            for row in report.get("regex", [])
+        ),
+        key=lambda row: -row["seconds"],
+    )
+    if regex_rows:
+        write_csv(directory / REGEX_REPORT, regex_rows, ["stage", "pattern"])
+
+    slow_inputs = sorted(
+        (
+            {"stage": stage, **row}
+            for stage, report in stage_reports.items()
+            for row in report.get("slow_inputs", [])
+        ),
+        key=lambda row: -row["seconds"],
+    )
+    if slow_inputs:
+        write_csv(directory / SLOW_INPUTS_REPORT, slow_inputs, ["stage", "pattern", "seconds"])
+    return run
+
+
+def load_run_report(directory):
+    with open(Path(directory) / RUN_REPORT) as file:
+        return json.load(file)
+
+
+def change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def diff_runs(old, new, metric="wall_seconds", top=5):
+    """Compares two run reports. Returns the stages with old and new value of
+    the metric and its relative change, and per stage the sessions with the
+    largest absolute increase."""
+    stages = []
+    for stage, metrics in new["stages"].items():
+        old_value = old["stages"].get(stage, {}).get(metric)
+        new_value = metrics.get(metric)
+        stages.append(
+            {
+                "stage": stage,
+                "old": old_value,
+                "new": new_value,
+                "change": change(old_value, new_value),
+            }
+        )
+
+    old_sessions = {(s["stage"], s["session"]): s for s in old.get("sessions", [])}
+    increases = {}
+    for session in new.get("sessions", []):
+        previous = old_sessions.get((session["stage"], session["session"]))
+        if previous is None or previous.get(metric) is None or session.get(metric) is None:
+            continue
+        increases.setdefault(session["stage"], []).append(
+            {
+                "session": session["session"],
+                "old": previous[metric],
+                "new": session[metric],
+                "increase": session[metric] - previous[metric],
+            }
+        )
+    sessions = {
+        stage: sorted(rows, key=lambda row: row["increase"], reverse=True)[:top]
+        for stage, rows in increases.items()
+    }
+    return stages, sessions
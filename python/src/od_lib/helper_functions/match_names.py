@@ -1,3 +1,6 @@
+from od_lib.helper_functions.fuzzy_names import FuzzyNames
+from od_lib.helper_functions.person_names import cologne_phonetics
+from types import MappingProxyType
 import pandas as pd
 import numpy as np
 import regex
@@ -7,9 +10,7 @@ try:
     from Levenshtein import ratio as levenshtein_ratio
 except ImportError:
     try:
-        from rapidfuzz.distance import Levenshtein
-        def levenshtein_ratio(s1, s2):
-            return Levenshtein.normalized_similarity(s1, s2)
+        from rapidfuzz.distance.Levenshtein import normalized_similarity as levenshtein_ratio
     except ImportError:
         raise ImportError("Please install either 'python-Levenshtein' or 'rapidfuzz' package")
 
@@ -18,31 +19,127 @@ except ImportError:
 # some optimization logic already included. Would still be nice to clean this up
 # a little together with the preceeding scripts.
 
-def get_fuzzy_names(df, name_to_check, fuzzy_threshold=0.7):
-    return df.loc[
-        df["last_name"].apply(Levenshtein.ratio, args=[name_to_check]) >= fuzzy_threshold
-    ]
+class PoliticianIndex:
+    """The politicians of an electoral term, as prepared by load_politicians,
+    indexed by their last name for the matching.
+
+    The columns the matching looks at are kept as arrays and a list of
+    possible matches is a list of positions into them, in the order of the
+    politicians. Looking up a last name is a dict probe instead of a scan over
+    all politicians of the term. The politicians are not changed once the index
+    is built, only the fuzzy candidates of the names looked up are cached.
+
+    The last names are also indexed by their Kölner Phonetik. The fuzzy
+    search keeps the candidates in the block of names which sound like the
+    speaker's if they are the closest ones, and the block is the candidates
+    where the fuzzy search finds none.
+    """
+
+    def __init__(self, politicians):
+        self.ui = politicians["ui"].to_numpy()
+        self.faction_id = politicians["faction_id"].to_numpy()
+        self.first_name = tuple(frozenset(first_name) for first_name in politicians["first_name"])
+        self.last_name = tuple(politicians["last_name"])
+        self.constituency = tuple(politicians["constituency"])
+        self.gender = tuple(politicians["gender"])
+        if "profession" in politicians.columns:
+            self.profession = tuple(politicians["profession"])
+        else:
+            self.profession = (np.nan,) * len(politicians)
+
+        self.first_name_codes = tuple(
+            frozenset(first_name_codes(first_name)) for first_name in self.first_name
+        )
+
+        by_last_name = {}
+        by_last_name_code = {}
+        for position, last_name in enumerate(self.last_name):
+            # A missing last name never equals the one of a speaker.
+            if isinstance(last_name, str):
+                by_last_name.setdefault(last_name, []).append(position)
+                code = cologne_phonetics(last_name)
+                if code:
+                    by_last_name_code.setdefault(code, []).append(position)
+        self.by_last_name = MappingProxyType(
+            {last_name: tuple(positions) for last_name, positions in by_last_name.items()}
+        )
+        self.by_last_name_code = MappingProxyType(
+            {code: tuple(positions) for code, positions in by_last_name_code.items()}
+        )
+        self.fuzzy = FuzzyNames(self.last_name, levenshtein_ratio)
+
+    def block(self, last_name):
+        """The positions of the politicians whose last name has the same
+        Kölner Phonetik as last_name."""
+        if not isinstance(last_name, str):
+            return ()
+        return self.by_last_name_code.get(cologne_phonetics(last_name), ())
+
+    def add_fuzzy(self, last_names):
+        """Scores the last names without an exact match in one batch, for
+        the fuzzy search of get_fuzzy_names."""
+        self.fuzzy.add(
+            last_name for last_name in last_names if last_name not in self.by_last_name
+        )
+
+    def __len__(self):
+        return len(self.ui)
+
+
+def first_name_codes(first_name):
+    """The Kölner Phonetik of the first names in a list, initials are left
+    out."""
+    return {cologne_phonetics(name) for name in first_name if len(name) > 1} - {""}
+
+
+def politician_index(politicians):
+    """The PoliticianIndex of a DataFrame of politicians, an index is returned
+    as it is."""
+    if isinstance(politicians, PoliticianIndex):
+        return politicians
+    return PoliticianIndex(politicians)
 
 
-def get_possible_matches(df, **columns):
-    """Returns possible matches in df with respect to specified columns."""
+def get_fuzzy_names(politicians, name_to_check, fuzzy_threshold=0.7):
+    """The politicians with a similar last name. If the closest of them sound
+    alike, only those which sound alike are kept. A name garbled in a
+    consonant sounds like other names and keeps all similar names."""
+    possible_matches, scores = politicians.fuzzy.scores(name_to_check, fuzzy_threshold)
+    block = set(politicians.block(name_to_check))
+    alike = [score for position, score in zip(possible_matches, scores) if position in block]
+    others = [score for position, score in zip(possible_matches, scores) if position not in block]
+    if alike and max(alike) > max(others, default=0):
+        return [position for position in possible_matches if position in block]
+    return possible_matches
+
+
+def get_phonetic_names(politicians, name_to_check):
+    """The politicians whose last name has the same Kölner Phonetik."""
+    return list(politicians.block(name_to_check))
+
+
+def get_possible_matches(politicians, possible_matches, **columns):
+    """Returns the possible matches with respect to specified columns."""
 
     for col_name, col_value in columns.items():
-        df = df.loc[df[col_name] == col_value]
+        values = getattr(politicians, col_name)
+        possible_matches = [
+            position for position in possible_matches if values[position] == col_value
+        ]
 
-    return df
+    return possible_matches
 
 
-def check_unique(possible_matches, col="ui"):
-    return len(np.unique(possible_matches[col])) == 1
+def check_unique(politicians, possible_matches, col="ui"):
+    return len(np.unique(getattr(politicians, col)[list(possible_matches)])) == 1
 
 
-def set_id(df, index, possible_matches, col_set, col_check):
+def set_id(df, index, politicians, possible_matches, col_set, col_check):
     """Sets the ID in column "col_set" of "df" at "index" to the value in
-    "col_check" in possible_matches. Expects a unique col_check value in
-    possible_matches.
+    "col_check" of the first possible match. Expects a unique col_check value
+    in possible_matches.
     """
-    df[col_set].at[index] = int(possible_matches[col_check].iloc[0])
+    df[col_set].at[index] = int(getattr(politicians, col_check)[possible_matches[0]])
 
 
 def set_value(df, index, col, value):
@@ -50,92 +147,117 @@ def set_value(df, index, col, value):
     df[col].at[index] = value
 
 
-def check_last_name(df, index, possible_matches, last_name):
+def check_last_name(df, index, politicians, last_name):
     # Get possible matches according to last name.
-    possible_matches = get_possible_matches(possible_matches, last_name=last_name)
+    possible_matches = list(politicians.by_last_name.get(last_name, ()))
 
-    if check_unique(possible_matches):
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if check_unique(politicians, possible_matches):
+        set_id(df, index, politicians, possible_matches, col_set="politician_id", col_check="ui")
         return True, possible_matches
     else:
         return False, possible_matches
 
 
-def check_first_name(df, index, possible_matches, first_name):
+def check_first_name(df, index, politicians, possible_matches, first_name):
     first_name_set = set(first_name)
 
-    possible_matches = possible_matches.loc[
-        ~possible_matches["first_name"].apply(lambda x: set(x).isdisjoint(first_name_set))
+    matches = [
+        position
+        for position in possible_matches
+        if not politicians.first_name[position].isdisjoint(first_name_set)
     ]
-
-    if check_unique(possible_matches):
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if not matches:
+        # First names which sound alike, e.g. "jürgen" and "juergen".
+        codes = first_name_codes(first_name_set)
+        matches = [
+            position
+            for position in possible_matches
+            if not politicians.first_name_codes[position].isdisjoint(codes)
+        ]
+    possible_matches = matches
+
+    if check_unique(politicians, possible_matches):
+        set_id(df, index, politicians, possible_matches, col_set="politician_id", col_check="ui")
         return True, possible_matches
     else:
         return False, possible_matches
 
 
-def check_faction_id(df, index, possible_matches, faction_id):
+def check_faction_id(df, index, politicians, possible_matches, faction_id):
     # Get possible matches according to faction_id.
-    possible_matches = get_possible_matches(possible_matches, faction_id=faction_id)
+    possible_matches = get_possible_matches(politicians, possible_matches, faction_id=faction_id)
 
     # Check if IDs unique.
-    if check_unique(possible_matches):
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if check_unique(politicians, possible_matches):
+        set_id(df, index, politicians, possible_matches, col_set="politician_id", col_check="ui")
         return True, possible_matches
     else:
         return False, possible_matches
 
 
-def check_location_info(df, index, possible_matches, constituency, fuzzy_threshold=0.7):
-    possible_matches = possible_matches.loc[
-        possible_matches["constituency"].apply(Levenshtein.ratio, args=[constituency])
-        > fuzzy_threshold
+def check_location_info(
+    df, index, politicians, possible_matches, constituency, fuzzy_threshold=0.7
+):
+    possible_matches = [
+        position
+        for position in possible_matches
+        if levenshtein_ratio(politicians.constituency[position], constituency) > fuzzy_threshold
     ]
 
-    if len(np.unique(possible_matches["ui"])) == 1:
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if check_unique(politicians, possible_matches):
+        set_id(df, index, politicians, possible_matches, col_set="politician_id", col_check="ui")
         return True, possible_matches
     else:
         return False, possible_matches
 
 
 def check_name_and_profession(
-    df, index, last_name, profession_regex, politicians_df, fuzzy_threshold=75
+    df, index, last_name, profession_regex, politicians, fuzzy_threshold=75
 ):
-    possible_matches = get_possible_matches(politicians_df, last_name=last_name)
+    possible_matches = list(politicians.by_last_name.get(last_name, ()))
 
     if len(possible_matches) == 0:
         possible_matches = get_fuzzy_names(
-            politicians_df, name_to_check=last_name, fuzzy_threshold=fuzzy_threshold
+            politicians, name_to_check=last_name, fuzzy_threshold=fuzzy_threshold
         )
 
-    if check_unique(possible_matches):
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if check_unique(politicians, possible_matches):
+        set_id(df, index, politicians, possible_matches, col_set="politician_id", col_check="ui")
         return True, possible_matches
     else:
-        boolean_indexer = possible_matches["profession"].str.contains(
-            profession_regex, regex=True, na=False
-        )
-        possible_matches = possible_matches[boolean_indexer]
-
-        if check_unique(possible_matches):
-            set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+        possible_matches = [
+            position
+            for position in possible_matches
+            if isinstance(politicians.profession[position], str)
+            and regex.search(profession_regex, politicians.profession[position])
+        ]
+
+        if check_unique(politicians, possible_matches):
+            set_id(
+                df, index, politicians, possible_matches, col_set="politician_id", col_check="ui"
+            )
             return True, possible_matches
         else:
             return False, possible_matches
 
 
 def check_government(df, index, last_name, mgs_electoral_term, fuzzy_threshold=80):
-    possible_matches = get_possible_matches(mgs_electoral_term, last_name=last_name)
+    possible_matches = list(mgs_electoral_term.by_last_name.get(last_name, ()))
 
     if len(possible_matches) == 0:
         possible_matches = get_fuzzy_names(
             mgs_electoral_term, name_to_check=last_name, fuzzy_threshold=fuzzy_threshold
         )
 
-    if check_unique(possible_matches):
-        set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+    if check_unique(mgs_electoral_term, possible_matches):
+        set_id(
+            df,
+            index,
+            mgs_electoral_term,
+            possible_matches,
+            col_set="politician_id",
+            col_check="ui",
+        )
         return True, possible_matches
     else:
         return False, possible_matches
@@ -161,13 +283,17 @@ def check_member_of_parliament(
     if len(possible_matches) == 0:
         possible_matches = get_fuzzy_names(politicians, name_to_check=last_name)
 
+    # Names which sound alike, e.g. with a transliterated umlaut.
+    if len(possible_matches) == 0:
+        possible_matches = get_phonetic_names(politicians, last_name)
+
     if len(possible_matches) == 0:
         return False, possible_matches
 
     # Check Faction ID.
     if faction_id >= 0:
         found, possible_matches = check_faction_id(
-            df, index, possible_matches, faction_id
+            df, index, politicians, possible_matches, faction_id
         )
         if found:
             return found, possible_matches
@@ -175,7 +301,7 @@ def check_member_of_parliament(
     # Check First Name.
     if first_name:
         found, possible_matches = check_first_name(
-            df, index, possible_matches, first_name
+            df, index, politicians, possible_matches, first_name
         )
         if found:
             return found, possible_matches
@@ -183,7 +309,7 @@ def check_member_of_parliament(
     # Match with location info.
     if constituency:
         found, possible_matches = check_location_info(
-            df, index, possible_matches, constituency
+            df, index, politicians, possible_matches, constituency
         )
         if found:
             return found, possible_matches
@@ -192,25 +318,29 @@ def check_member_of_parliament(
         # is an entry in STAMMDATEN for the correct person
         # without the location info, as there was only one
         # person with the last name before.
-        possible_matches = get_possible_matches(possible_matches, constituency="")
-        if check_unique(possible_matches, col="ui"):
-            set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+        possible_matches = get_possible_matches(politicians, possible_matches, constituency="")
+        if check_unique(politicians, possible_matches, col="ui"):
+            set_id(
+                df, index, politicians, possible_matches, col_set="politician_id", col_check="ui"
+            )
             return True, possible_matches
 
     # Check Gender.
-    found, possible_matches = check_woman(df, index, acad_title, possible_matches)
+    found, possible_matches = check_woman(df, index, acad_title, politicians, possible_matches)
     if found:
         return True, possible_matches
     else:
         return False, possible_matches
 
 
-def check_woman(df, index, acad_title, possible_matches):
+def check_woman(df, index, acad_title, politicians, possible_matches):
     if "Frau" in acad_title:
-        possible_matches = possible_matches.loc[possible_matches["gender"] == "weiblich"]
+        possible_matches = get_possible_matches(politicians, possible_matches, gender="weiblich")
 
-        if check_unique(possible_matches):
-            set_id(df, index, possible_matches, col_set="politician_id", col_check="ui")
+        if check_unique(politicians, possible_matches):
+            set_id(
+                df, index, politicians, possible_matches, col_set="politician_id", col_check="ui"
+            )
             return True, possible_matches
     return False, possible_matches
 
@@ -218,7 +348,11 @@ def check_woman(df, index, acad_title, possible_matches):
 def insert_politician_id_into_speech_content(
     df, politicians_electoral_term, mgs_electoral_term, politicians
 ):
-    "Appends a politician id column with matched IDs"
+    """Appends a politician id column with matched IDs. The politicians of the
+    term are a DataFrame or, to build it once per term, a PoliticianIndex."""
+
+    politicians_electoral_term = politician_index(politicians_electoral_term)
+    mgs_electoral_term = politician_index(mgs_electoral_term)
 
     df = df.fillna("")
 
@@ -239,6 +373,13 @@ def insert_politician_id_into_speech_content(
     df.insert(4, "politician_id", -1)
     df["position_long"] = df["position_long"].str.lower()
 
+    # The last names without an exact match are scored for the fuzzy search
+    # all at once.
+    politicians_electoral_term.add_fuzzy(df["last_name"])
+    mgs_electoral_term.add_fuzzy(
+        df.loc[df["position_short"].isin(["Minister", "Chancellor"]), "last_name"]
+    )
+
     for index, row in df.iterrows():
 
         # ##################################################################
@@ -463,7 +604,8 @@ def insert_politician_id_into_speech_content(
 def insert_politician_id_into_contributions_extended(
     df, politicians_electoral_term, mgs_electoral_term
 ):
-    "Appends a politician id column with matched IDs"
+    """Appends a politician id column with matched IDs. The politicians of the
+    term are a DataFrame or, to build it once per term, a PoliticianIndex."""
 
     assert {
         "last_name",
@@ -476,6 +618,8 @@ def insert_politician_id_into_contributions_extended(
     if len(df) == 0:
         return df, pd.DataFrame()
 
+    politicians_electoral_term = politician_index(politicians_electoral_term)
+
     last_name_copy = df["last_name"].copy()
     first_name_copy = df["first_name"].copy()
 
@@ -491,6 +635,10 @@ def insert_politician_id_into_contributions_extended(
     df["last_name"] = df["last_name"].str.replace("ß", "ss", regex=False)
     df.insert(4, "politician_id", -1)
 
+    # The last names without an exact match are scored for the fuzzy search
+    # all at once.
+    politicians_electoral_term.add_fuzzy(df["last_name"])
+
     for index, row in df.iterrows():
 
         # Start Matching
@@ -504,10 +652,11 @@ def insert_politician_id_into_contributions_extended(
                 df, index, politicians_electoral_term, row["last_name"]
             )
             if found:
-                if check_unique(possible_matches, col="faction_id"):
+                if check_unique(politicians_electoral_term, possible_matches, col="faction_id"):
                     set_id(
                         df,
                         index,
+                        politicians_electoral_term,
                         possible_matches,
                         col_set="faction_id",
                         col_check="faction_id",
@@ -522,6 +671,10 @@ def insert_politician_id_into_contributions_extended(
                 politicians_electoral_term, row["last_name"]
             )
 
+        # Names which sound alike, e.g. with a transliterated umlaut.
+        if len(possible_matches) == 0:
+            possible_matches = get_phonetic_names(politicians_electoral_term, row["last_name"])
+
         if len(possible_matches) == 0:
             problem_df.append(row)
             continue
@@ -529,11 +682,13 @@ def insert_politician_id_into_contributions_extended(
         # Check Faction ID.
         if row["faction_id"] >= 0:
             found, possible_matches = check_faction_id(
-                df, index, possible_matches, row["faction_id"]
+                df, index, politicians_electoral_term, possible_matches, row["faction_id"]
             )
             if found:
-                if check_unique(possible_matches, col="faction_id"):
-                    df["faction_id"].at[index] = int(possible_matches["faction_id"].iloc[0])
+                if check_unique(politicians_electoral_term, possible_matches, col="faction_id"):
+                    df["faction_id"].at[index] = int(
+                        politicians_electoral_term.faction_id[possible_matches[0]]
+                    )
                     continue
                 else:
                     continue
@@ -541,7 +696,7 @@ def insert_politician_id_into_contributions_extended(
         # Check First Name.
         if row["first_name"]:
             found, possible_matches = check_first_name(
-                df, index, possible_matches, row["first_name"]
+                df, index, politicians_electoral_term, possible_matches, row["first_name"]
             )
             if found:
                 continue
@@ -549,7 +704,7 @@ def insert_politician_id_into_contributions_extended(
         # Match with location info.
         if row["constituency"]:
             found, possible_matches = check_location_info(
-                df, index, possible_matches, row["constituency"]
+                df, index, politicians_electoral_term, possible_matches, row["constituency"]
             )
             if found:
                 continue
@@ -558,17 +713,24 @@ def insert_politician_id_into_contributions_extended(
             # is an entry in STAMMDATEN for the correct person
             # without the location info, as there was only one
             # person with the last name before.
-            possible_matches = get_possible_matches(possible_matches, constituency="")
+            possible_matches = get_possible_matches(
+                politicians_electoral_term, possible_matches, constituency=""
+            )
 
-            if check_unique(possible_matches):
+            if check_unique(politicians_electoral_term, possible_matches):
                 set_id(
-                    df, index, possible_matches, col_set="politician_id", col_check="ui"
+                    df,
+                    index,
+                    politicians_electoral_term,
+                    possible_matches,
+                    col_set="politician_id",
+                    col_check="ui",
                 )
                 continue
 
         # Check Gender.
         found, possible_matches = check_woman(
-            df, index, row["acad_title"], possible_matches
+            df, index, row["acad_title"], politicians_electoral_term, possible_matches
         )
         if found:
             continue
@@ -0,0 +1,422 @@
+from contextlib import contextmanager
+import os
+import regex
+import sys
+import time
+
+# Patterns are compiled once, when their module is imported, and handed out
+# by name:
+#
+#   bracket_pattern = patterns.register("clean_text.bracket", r"[()]")
+#   patterns.get("clean_text.bracket").finditer(text)
+#
+# Every call of a handle runs with a timeout (OD_REGEX_TIMEOUT seconds, 0
+# turns it off), so a pattern which backtracks on garbled text raises a
+# PatternTimeout instead of stalling its worker. Calls slower than
+# OD_REGEX_SLOW seconds and the timeouts are recorded as slow inputs together
+# with the session and speech set with located(). The callers which have a
+# cheaper parse catch the PatternTimeout, the others fail the session.
+#
+# With OD_REGEX_STATS=1 in the environment of a run, the handles also count
+# their calls, their matches and the time spent in them. The stage reports
+# then rank the patterns by their time and list the slow inputs (see
+# instrumentation.StageReport).
+
+STATS_ENV = "OD_REGEX_STATS"
+TIMEOUT_ENV = "OD_REGEX_TIMEOUT"
+SLOW_ENV = "OD_REGEX_SLOW"
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_SLOW = 1.0
+
+# {name: handle} and {name: (pattern, flags)} of all registered patterns.
+_patterns = {}
+_sources = {}
+
+# {name: [calls, matches, seconds]} of this process since the last take_stats().
+_stats = {}
+
+# Slow inputs of this process since the last take_slow_inputs() and the
+# location (e.g. session and speech) of the running calls.
+_slow_inputs = []
+_location = {}
+
+
+def stats_enabled():
+    return os.environ.get(STATS_ENV, "") not in ("", "0")
+
+
+def timeout():
+    """Timeout of a call in seconds, None if calls run without one."""
+    seconds = float(os.environ.get(TIMEOUT_ENV) or DEFAULT_TIMEOUT)
+    return seconds if seconds > 0 else None
+
+
+def slow_seconds():
+    return float(os.environ.get(SLOW_ENV) or DEFAULT_SLOW)
+
+
+class PatternTimeout(TimeoutError):
+    """A registered pattern ran into its timeout."""
+
+    def __init__(self, name, seconds, length):
+        super().__init__(f"{name} timed out after {seconds:.1f}s on {length} characters")
+        self.name = name
+        self.seconds = seconds
+        self.length = length
+
+
+@contextmanager
+def located(**location):
+    """Records the slow inputs of the calls within as coming from location,
+    e.g. located(session=session, speech=speech_id)."""
+    previous = dict(_location)
+    _location.update(location)
+    try:
+        yield
+    finally:
+        _location.clear()
+        _location.update(previous)
+
+
+def record_slow_input(name, seconds, length, timed_out):
+    _slow_inputs.append(
+        {"pattern": name, "seconds": seconds, "length": length, "timed_out": timed_out, **_location}
+    )
+
+
+class GuardedPattern:
+    """A compiled pattern whose calls run with a timeout, optionally counting
+    their calls, matches and time."""
+
+    def __init__(self, name, compiled, timeout=None, stats=False):
+        self.name = name
+        self.compiled = compiled
+        self.timeout = timeout
+        self.stats = stats
+        self.slow = slow_seconds()
+
+    def __getattr__(self, attribute):
+        return getattr(self.compiled, attribute)
+
+    def __repr__(self):
+        return f"GuardedPattern({self.name!r}, {self.compiled!r})"
+
+    def call(self, function, count, string, *args, **kwargs):
+        if self.timeout is not None:
+            kwargs.setdefault("timeout", self.timeout)
+        start = time.perf_counter()
+        try:
+            result = function(string, *args, **kwargs)
+        except TimeoutError:
+            seconds = time.perf_counter() - start
+            record_slow_input(self.name, seconds, len(string), True)
+            raise PatternTimeout(self.name, seconds, len(string)) from None
+        seconds = time.perf_counter() - start
+        if self.stats:
+            stats = _stats.setdefault(self.name, [0, 0, 0.0])
+            stats[0] += 1
+            stats[1] += count(result)
+            stats[2] += seconds
+        if seconds >= self.slow:
+            record_slow_input(self.name, seconds, len(string), False)
+        return result
+
+    def search(self, string, *args, **kwargs):
+        return self.call(self.compiled.search, bool, string, *args, **kwargs)
+
+    def match(self, string, *args, **kwargs):
+        return self.call(self.compiled.match, bool, string, *args, **kwargs)
+
+    def fullmatch(self, string, *args, **kwargs):
+        return self.call(self.compiled.fullmatch, bool, string, *args, **kwargs)
+
+    def subn(self, repl, string, *args, **kwargs):
+        def subn(string, *args, **kwargs):
+            return self.compiled.subn(repl, string, *args, **kwargs)
+
+        return self.call(subn, lambda result: result[1], string, *args, **kwargs)
+
+    def sub(self, repl, string, *args, **kwargs):
+        return self.subn(repl, string, *args, **kwargs)[0]
+
+    def findall(self, string, *args, **kwargs):
+        return self.call(self.compiled.findall, len, string, *args, **kwargs)
+
+    def finditer(self, string, *args, **kwargs):
+        # The matches are collected here, so the whole scan runs within the
+        # timeout and is measured.
+        def scan(*args, **kwargs):
+            return list(self.compiled.finditer(*args, **kwargs))
+
+        return iter(self.call(scan, len, string, *args, **kwargs))
+
+    def split(self, string, *args, **kwargs):
+        return self.call(
+            self.compiled.split, lambda result: len(result) - 1, string, *args, **kwargs
+        )
+
+
+def instrument(name, compiled):
+    """The handle of a compiled pattern, guarded and timed under name. For
+    patterns built at run time, e.g. from the speaker names of a session,
+    which share one entry in the statistics. Without timeout and statistics
+    the compiled pattern itself."""
+    seconds = timeout()
+    stats = stats_enabled()
+    if seconds is None and not stats:
+        return compiled
+    return GuardedPattern(name, compiled, seconds, stats)
+
+
+def register(name, pattern, flags=0):
+    """Compiles pattern and registers it under name. Registering the same
+    pattern twice returns the first handle, another pattern under a taken
+    name raises a ValueError."""
+    if name in _patterns:
+        if _sources[name] != (pattern, flags):
+            raise ValueError(f"Another pattern is registered as {name}.")
+        return _patterns[name]
+    _patterns[name] = instrument(name, regex.compile(pattern, flags))
+    _sources[name] = (pattern, flags)
+    return _patterns[name]
+
+
+def register_all(prefix, patterns, flags=0):
+    """Registers a dict of patterns as prefix.key, returns {key: handle} in
+    the same order."""
+    return {
+        key: register(f"{prefix}.{key}", pattern, flags) for key, pattern in patterns.items()
+    }
+
+
+def get(name):
+    return _patterns[name]
+
+
+def names():
+    return sorted(_patterns)
+
+
+def take_stats():
+    """Returns the statistics of this process since the last call,
+    {name: {"calls": ..., "matches": ..., "seconds": ...}}, and resets them."""
+    taken = {
+        name: {"calls": calls, "matches": matches, "seconds": seconds}
+        for name, (calls, matches, seconds) in _stats.items()
+    }
+    _stats.clear()
+    return taken
+
+
+def take_slow_inputs():
+    """Returns the slow inputs of this process since the last call, the
+    slowest first, and resets them."""
+    taken = sorted(_slow_inputs, key=lambda row: -row["seconds"])
+    _slow_inputs.clear()
+    return taken
+
+
+def merge_stats(total, stats):
+    """Adds the statistics stats (e.g. of a worker) to total."""
+    for name, values in stats.items():
+        entry = total.setdefault(name, {"calls": 0, "matches": 0, "seconds": 0.0})
+        for key, value in values.items():
+            entry[key] += value
+    return total
+
+
+def ranked(stats):
+    """The statistics as rows sorted by time, the slowest pattern first."""
+    rows = [{"pattern": name, **values} for name, values in stats.items()]
+    for row in rows:
+        row["seconds_per_call"] = row["seconds"] / row["calls"] if row["calls"] else None
+    return sorted(rows, key=lambda row: (-row["seconds"], row["pattern"]))
+
+
+def print_ranking(rows, top=20, file=sys.stderr):
+    print(f"{'pattern':<50} {'calls':>10} {'matches':>10} {'seconds':>10}", file=file)
+    for row in rows[:top]:
+        print(
+            f"{row['pattern']:<50} {row['calls']:>10} {row['matches']:>10} "
+            f"{row['seconds']:>10.3f}",
+            file=file,
+        )
+
+
+def print_slow_inputs(rows, top=20, file=sys.stderr):
+    print(f"{'pattern':<50} {'seconds':>10} {'length':>10}  location", file=file)
+    for row in rows[:top]:
+        location = ", ".join(
+            f"{key}={value}"
+            for key, value in row.items()
+            if key not in ("pattern", "seconds", "length", "timed_out")
+        )
+        timed_out = " (timed out)" if row["timed_out"] else ""
+        print(
+            f"{row['pattern']:<50} {row['seconds']:>10.3f} {row['length']:>10}  "
+            f"{location}{timed_out}",
+            file=file,
+        )
+
+
+# Faction patterns of the stages. They grew apart over time, so each stage
+# keeps its own set, the patterns are tried in this order.
+FACTION_PATTERNS = {
+    # helper_functions/contributions.py, clean_contributions.py
+    "contributions": {
+        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?",  # noqa: E501
+        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
+        "BP": r"^\[?BP\]?",
+        "DA": r"^\[?DA\]?",
+        "DP": r"^\[?DP\]?",
+        "DIE LINKE.": r"DIE ?LINKE|LINKEN|\[DIE ?LINKE.\]",
+        "DPB": r"^\[?DPB\]?",
+        "DRP": r"\[?DRP(\-Hosp\.)?\]?|^\[?SRP\]?|^\[?DBP\]?",
+        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+        "Fraktionslos": r"(?:fraktionslos|Parteilos)",
+        "FU": r"^\[?FU\]?",
+        "FVP": r"^\[?FVP\]?",
+        "Gast": r"\[?Gast\]?",
+        "GB/BHE": r"\[?(?:GB[/-]\s*)?BHE(?:-DG)?\]?",
+        "KPD": r"^\[?KPD\]?",
+        "NR": r"^\[?NR\]?$",
+        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+        "SSW": r"^\[?SSW\]?",
+        "SRP": r"^\[?SRP\]?",
+        "WAV": r"^\[?WAV\]?",
+        "Z": r"^\[?Z\]?$",
+        "AfD": r"^\[?AfD\]?$",
+        "DBP": r"^\[?DBP\]?$",
+    },
+    # helper_functions/speeches.py
+    "speeches": {
+        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/Die Grünen",  # noqa: E501
+        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
+        "BP": r"^BP",
+        "DA": r"^DA",
+        "DP": r"^DP",
+        "DIE LINKE.": r"DIE LINKE",
+        "DPB": r"(?:^DPB)",
+        "DRP": r"DRP(\-Hosp\.)?|SRP",
+        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+        "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
+        "FU": r"^FU",
+        "FVP": r"^FVP",
+        "Gast": r"Gast",
+        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+        "KPD": r"^KPD",
+        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+        "SSW": r"^SSW",
+        "SRP": r"^SRP",
+        "WAV": r"^WAV",
+        "Z": r"^Z$",
+        "DBP": r"^DBP$",
+        "NR": r"^NR$",
+    },
+    # clean_speeches.py, matched ignoring the case
+    "speeches_extended": {
+        "Bündnis 90/DIE GRÜNEN": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/DIE GRÜNEN|DIE GRÜNEN|GRÜNEN",  # noqa: E501
+        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)? | CDU/CSU?|CSU|CDU",  # noqa: E501
+        "BP": r"^BP",
+        "DA": r"^DA",
+        "DP": r"^DP",
+        "DIE LINKE.": r"DIE LINKE|LINKE|Die Linke|Linke",
+        "DPB": r"(?:^DPB)",
+        "DRP": r"DRP(\-Hosp\.)?|SRP",
+        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?|FDP",
+        "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
+        "FU": r"^FU",
+        "FVP": r"^FVP",
+        "Gast": r"Gast",
+        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+        "KPD": r"^KPD",
+        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?|SPD",
+        "SSW": r"^SSW",
+        "SRP": r"^SRP",
+        "WAV": r"^WAV",
+        "Z": r"^Z$",
+        "DBP": r"^DBP$",
+        "NR": r"^NR$",
+        "AfD": r"AfD|Alternative für Deutschland",
+        "BSW": r"BSW|Bündnis Sahra Wagenknecht",
+    },
+    # 05_electoral_term_19_20/01_extract_speeches_and_contributions_electoral_term_19_20.py
+    "electoral_term_19_20": {
+        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?",  # noqa: E501
+        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
+        "BP": r"^BP",
+        "DA": r"^DA",
+        "DP": r"^DP",
+        "DIE LINKE.": r"DIE LINKE",
+        "DPB": r"^DPB",
+        "DRP": r"DRP(\-Hosp\.)?|^SRP|^DBP",
+        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+        "Fraktionslos": r"(?:fraktionslos|Parteilos)",
+        "FU": r"^FU",
+        "FVP": r"^FVP",
+        "Gast": r"Gast",
+        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+        "KPD": r"^KPD",
+        "NR": r"^NR$",
+        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+        "SSW": r"^SSW",
+        "SRP": r"^SRP",
+        "WAV": r"^WAV",
+        "Z": r"^Z$",
+        "AfD": r"^AfD$",
+        "DBP": r"^DBP$",
+    },
+    # 03_politicians/03_merge_politicians.py, merge_government_members.py
+    "politicians": {
+        "Bündnis 90/Die Grünen": r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?|Bündnis 90/Die Grünen",  # noqa: E501
+        "CDU/CSU": r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",  # noqa: E501
+        "BP": r"^BP",
+        "DA": r"^DA",
+        "DP": r"^DP",
+        "DIE LINKE.": r"DIE LINKE",
+        "DPB": r"(?:^DPB)",
+        "DRP": r"DRP(\-Hosp\.)?|SRP",
+        "DSU": r"^DSU",
+        "FDP": r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+        "Fraktionslos": r"(?:fraktionslos|Parteilos|parteilos)",
+        "FU": r"^FU",
+        "FVP": r"^FVP",
+        "Gast": r"Gast",
+        "GB/BHE": r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+        "KPD": r"^KPD",
+        "PDS": r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+        "SPD": r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+        "SSW": r"^SSW",
+        "SRP": r"^SRP",
+        "WAV": r"^WAV",
+        "Z": r"^Z$",
+        "DBP": r"^DBP$",
+        "NR": r"^NR$",
+    },
+}
+
+
+def faction_patterns(variant, ignore_case=False):
+    """{faction abbreviation: handle} of a set of FACTION_PATTERNS."""
+    if ignore_case:
+        return register_all(
+            f"faction.{variant}.ignore_case", FACTION_PATTERNS[variant], regex.IGNORECASE
+        )
+    return register_all(f"faction.{variant}", FACTION_PATTERNS[variant])
+
+
+def get_faction_abbrev(faction, faction_patterns):
+    """matches the given faction and returns an id"""
+
+    for faction_abbrev, faction_pattern in faction_patterns.items():
+        try:
+            if faction_pattern.search(faction):
+                return faction_abbrev
+        except PatternTimeout:
+            # Counts as no match, the other factions are still tried.
+            continue
+    return None
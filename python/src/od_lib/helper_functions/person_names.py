@@ -0,0 +1,107 @@
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+# Academic titles and name particles which are split off the names of the
+# speakers and contributors. Titles have to be added: Like e.c. or when
+# mistakes occur like b.c. "Graf" is also a last name and left out for now.
+TITLES = [
+    "Dr",
+    "Frau",
+    "D",
+    "-Ing",
+    "von",
+    "und",
+    "zu",
+    "van",
+    "de",
+    "Baron",
+    "Freiherr",
+    "Prinz",
+    "h",
+    "c",
+]
+
+
+def row_lists(words, rows):
+    """The words of a Series with the row numbers 0 to rows - 1 as index,
+    sorted by row, as one list per row."""
+    values = words.tolist()
+    numbers = words.index.to_numpy()
+    starts = np.searchsorted(numbers, np.arange(rows), "left").tolist()
+    ends = np.searchsorted(numbers, np.arange(rows), "right").tolist()
+    return [values[start:end] for start, end in zip(starts, ends)]
+
+
+def split_names(names, titles=TITLES):
+    """Splits a Series of names at whitespace into the words in titles and the
+    other words, for all rows at once.
+
+    Returns a DataFrame with the index of names and the columns acad_title
+    (list of the titles in their order), first_name (list of the other words
+    but the last one), last_name (the last other word, "" if there is none)
+    and words (the number of other words).
+    """
+    rows = len(names)
+    words = pd.Series(names.to_numpy(), index=pd.RangeIndex(rows)).str.split().explode().dropna()
+    is_title = words.isin(titles)
+    others = row_lists(words[~is_title], rows)
+    return pd.DataFrame(
+        {
+            "acad_title": pd.Series(row_lists(words[is_title], rows), dtype=object),
+            "first_name": pd.Series([name[:-1] for name in others], dtype=object),
+            "last_name": pd.Series([name[-1] if name else "" for name in others], dtype=object),
+            "words": pd.Series([len(name) for name in others], dtype=int),
+        }
+    ).set_axis(names.index)
+
+
+# The Kölner Phonetik of the letters which do not depend on their neighbours.
+# Umlauts are vowels and ß is an s, so "Müller" and "Mueller" or "Strauß" and
+# "Strauss" get the same code.
+PHONETIC_CODES = {
+    **dict.fromkeys("aeijouyäöü", "0"),
+    "h": "",
+    "b": "1",
+    **dict.fromkeys("fvw", "3"),
+    **dict.fromkeys("gkq", "4"),
+    "l": "5",
+    **dict.fromkeys("mn", "6"),
+    "r": "7",
+    **dict.fromkeys("szß", "8"),
+}
+PHONETIC_LETTERS = set(PHONETIC_CODES) | set("cdptx")
+
+
+def letter_code(letters, i):
+    """The Kölner Phonetik code of the i-th letter of a list of letters."""
+    letter = letters[i]
+    previous = letters[i - 1] if i > 0 else None
+    following = letters[i + 1] if i + 1 < len(letters) else None
+    if letter in PHONETIC_CODES:
+        return PHONETIC_CODES[letter]
+    if letter == "p":
+        return "3" if following == "h" else "1"
+    if letter in "dt":
+        return "8" if following in ("c", "s", "z", "ß") else "2"
+    if letter == "x":
+        return "8" if previous in ("c", "k", "q") else "48"
+    # c
+    if previous is None:
+        return "4" if following is not None and following in "ahkloqrux" else "8"
+    if previous in ("s", "z", "ß"):
+        return "8"
+    return "4" if following is not None and following in "ahkoqux" else "8"
+
+
+@lru_cache(maxsize=65536)
+def cologne_phonetics(name):
+    """The Kölner Phonetik of a name, e.g. "Müller-Lüdenscheidt" is "65752682".
+    Letters which sound alike have the same digit, other characters are left
+    out. "" if the name has no letters."""
+    letters = [letter for letter in name.lower() if letter in PHONETIC_LETTERS]
+    digits = "".join(letter_code(letters, i) for i in range(len(letters)))
+    collapsed = [digit for i, digit in enumerate(digits) if i == 0 or digit != digits[i - 1]]
+    return "".join(
+        digit for i, digit in enumerate(collapsed) if digit != "0" or i == 0
+    )
@@ -0,0 +1,172 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+import os
+import subprocess
+import sys
+import threading
+import time
+
+
+class Stage:
+    """A single pipeline script together with the paths it reads and writes.
+
+    Inputs and outputs can be files or directories. A stage depends on every
+    earlier declared stage whose outputs overlap with its inputs.
+    """
+
+    def __init__(self, name, script, inputs=(), outputs=(), args=()):
+        self.name = name
+        self.script = Path(script)
+        self.inputs = [Path(path) for path in inputs]
+        self.outputs = [Path(path) for path in outputs]
+        self.args = [str(arg) for arg in args]
+
+    def command(self):
+        return [sys.executable, str(self.script), *self.args]
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+def paths_overlap(first, second):
+    """True if one path is equal to or contained in the other."""
+    first, second = Path(os.path.abspath(first)), Path(os.path.abspath(second))
+    return first == second or first in second.parents or second in first.parents
+
+
+def build_graph(stages):
+    """Returns a dict mapping every stage name to the names it depends on.
+
+    Only stages declared earlier can be dependencies, so a stage which reads
+    and writes the same directory never depends on itself or on later stages.
+    """
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError("Stage names have to be unique.")
+
+    graph = {}
+    for position, stage in enumerate(stages):
+        graph[stage.name] = [
+            previous.name
+            for previous in stages[:position]
+            if any(
+                paths_overlap(stage_input, previous_output)
+                for stage_input in stage.inputs
+                for previous_output in previous.outputs
+            )
+        ]
+    return graph
+
+
+def select_stages(stages, names):
+    """Returns the stages with the given names, keeping the declared order."""
+    known = {stage.name for stage in stages}
+    unknown = [name for name in names if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)}")
+    return [stage for stage in stages if stage.name in names]
+
+
+def run_stage(stage, cwd=None, env=None):
+    """Runs the script of a stage and returns the completed process. Its
+    usage attribute holds wall time and CPU time of the script and the worker
+    processes it waited for. The peak RSS of a child is not taken from here,
+    Linux carries the peak of the parent over fork and exec, the scripts
+    report their own in their stage report."""
+    start = time.perf_counter()
+    if not hasattr(os, "wait4"):
+        result = subprocess.run(
+            stage.command(), cwd=cwd, env=env, capture_output=True, text=True
+        )
+        result.usage = {"wall_seconds": time.perf_counter() - start}
+        return result
+
+    process = subprocess.Popen(
+        stage.command(),
+        cwd=cwd,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    # Read both pipes until the script closes them, then reap it with wait4
+    # to get its resource usage.
+    output = {}
+    readers = [
+        threading.Thread(target=lambda name=name, pipe=pipe: output.update({name: pipe.read()}))
+        for name, pipe in [("stdout", process.stdout), ("stderr", process.stderr)]
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    process.stdout.close()
+    process.stderr.close()
+    _, wait_status, rusage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(wait_status)
+
+    result = subprocess.CompletedProcess(
+        process.args, process.returncode, output["stdout"], output["stderr"]
+    )
+    result.usage = {
+        "wall_seconds": time.perf_counter() - start,
+        "cpu_seconds": rusage.ru_utime + rusage.ru_stime,
+        "returncode": process.returncode,
+    }
+    return result
+
+
+def run_stages(stages, workers=None, cwd=None, env=None, on_finish=None):
+    """Runs the stages on a bounded pool, starting each one as soon as all of
+    its dependencies succeeded. Stages depending on a failed stage are skipped.
+
+    Returns a dict mapping the stage name to "success", "failed" or "skipped".
+    on_finish(stage, result) is called with the completed process (or the
+    raised exception) after every stage.
+    """
+    workers = workers or os.cpu_count() or 1
+    graph = build_graph(stages)
+    by_name = {stage.name: stage for stage in stages}
+    status = {}
+    running = {}
+
+    def ready(name):
+        return name not in status and all(
+            status.get(dependency) == "success" for dependency in graph[name]
+        )
+
+    def blocked(name):
+        return any(
+            status.get(dependency) in ("failed", "skipped") for dependency in graph[name]
+        )
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # Skip everything downstream of a failure, in declaration order.
+            for stage in stages:
+                if stage.name not in status and blocked(stage.name):
+                    status[stage.name] = "skipped"
+
+            scheduled = {stage_name for stage_name in running.values()}
+            for stage in stages:
+                if stage.name not in scheduled and ready(stage.name):
+                    future = executor.submit(run_stage, stage, cwd, env)
+                    running[future] = stage.name
+                    scheduled.add(stage.name)
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                    status[name] = "success" if result.returncode == 0 else "failed"
+                except Exception as e:
+                    result = e
+                    status[name] = "failed"
+                if on_finish:
+                    on_finish(by_name[name], result)
+
+    return status
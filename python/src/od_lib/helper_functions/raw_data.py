@@ -0,0 +1,87 @@
+import od_lib.definitions.path_definitions as path_definitions
+from pathlib import Path
+import mmap
+import regex
+import xml.etree.ElementTree as et
+import zipfile
+
+# The protocols of an electoral term are either extracted into
+# RAW_XML/electoral_term_XX/ or kept as the downloaded archive
+# RAW_ZIP/electoral_term_XX.zip. A protocol inside an archive is addressed by
+# the path of the archive joined with the file name of the member, e.g.
+# RAW_ZIP/electoral_term_05.zip/05001.xml, so stem and parent.stem give session
+# and term for both layouts. The members are read straight from the memory
+# mapped archive, nothing is extracted to disk.
+
+ARCHIVE_SUFFIX = ".zip"
+
+# Open archives of this process, {path: (mmap, ZipFile, {file name: member})}.
+_archives = {}
+
+
+def term_number(path):
+    """The electoral term of an electoral_term_XX folder or archive, or None."""
+    match = regex.search(r"(?<=electoral_term_)\d{2}", Path(path).stem)
+    return None if match is None else int(match.group(0))
+
+
+def term_sources(raw_xml=None, raw_zip=None):
+    """Returns (term number, folder or archive) for every electoral term,
+    sorted by term. An extracted folder takes precedence over the archive."""
+    raw_xml = path_definitions.RAW_XML if raw_xml is None else Path(raw_xml)
+    raw_zip = path_definitions.RAW_ZIP if raw_zip is None else Path(raw_zip)
+    sources = {}
+    if raw_zip.exists():
+        for archive_path in raw_zip.glob("*" + ARCHIVE_SUFFIX):
+            sources[archive_path.stem] = archive_path
+    if raw_xml.exists():
+        # Skip e.g. the .DS_Store file.
+        for folder_path in raw_xml.iterdir():
+            if folder_path.is_dir():
+                sources[folder_path.stem] = folder_path
+    terms = [(term_number(name), source) for name, source in sources.items()]
+    return sorted((number, source) for number, source in terms if number is not None)
+
+
+def open_archive(archive_path):
+    archive_path = Path(archive_path)
+    if archive_path not in _archives:
+        with open(archive_path, "rb") as file:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        archive = zipfile.ZipFile(mapped)
+        members = {
+            Path(info.filename).name: info for info in archive.infolist() if not info.is_dir()
+        }
+        _archives[archive_path] = (mapped, archive, members)
+    return _archives[archive_path]
+
+
+def close_archives():
+    for mapped, archive, _ in _archives.values():
+        archive.close()
+        mapped.close()
+    _archives.clear()
+
+
+def protocol_paths(source):
+    """The xml protocols of a term folder or archive, sorted by name."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(path for path in source.iterdir() if path.suffix == ".xml")
+    _, _, members = open_archive(source)
+    return [source / name for name in sorted(members) if Path(name).suffix == ".xml"]
+
+
+def open_protocol(path):
+    """Opens a protocol for reading bytes, from disk or from its archive."""
+    path = Path(path)
+    if path.parent.suffix == ARCHIVE_SUFFIX and path.parent.is_file():
+        _, archive, members = open_archive(path.parent)
+        return archive.open(members[path.name])
+    return open(path, "rb")
+
+
+def parse_protocol(path):
+    """Parses a protocol into an ElementTree."""
+    with open_protocol(path) as file:
+        return et.parse(file)
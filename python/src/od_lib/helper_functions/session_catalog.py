@@ -0,0 +1,130 @@
+import od_lib.definitions.path_definitions as path_definitions
+from pathlib import Path
+import sqlite3
+
+# The splitters record every session they split in a SQLite catalog, so the
+# later stages get the date and the other meta data of a session without
+# parsing the protocol again. A session is identified by the file name of its
+# protocol, e.g. 5001 for 05001.xml.
+
+COLUMNS = [
+    "session",
+    "electoral_term",
+    "session_number",
+    "date",
+    "document_url",
+    "xml_size",
+    "xml_sha256",
+    "text_size",
+]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session INTEGER PRIMARY KEY,
+    electoral_term INTEGER NOT NULL,
+    session_number INTEGER NOT NULL,
+    date TEXT,
+    document_url TEXT,
+    xml_size INTEGER,
+    xml_sha256 TEXT,
+    text_size INTEGER
+)
+"""
+
+DOCUMENT_URL = "https://dip21.bundestag.de/dip21/btp/{0:02}/{0:02}{1:03}.pdf"
+
+
+def session_entry(session, term_number, parts):
+    """The catalog entry of a session split by split_xml. The date is kept as
+    written in the protocol (dd.mm.yyyy)."""
+    session_number = int(str(session)[-3:])
+    return {
+        "session": int(session),
+        "electoral_term": term_number,
+        "session_number": session_number,
+        "date": parts["meta_data"].get("date"),
+        "document_url": DOCUMENT_URL.format(term_number, session_number),
+        "xml_size": parts.get("source", {}).get("size"),
+        "xml_sha256": parts.get("source", {}).get("sha256"),
+        "text_size": len(parts["session_content"].encode("utf-8")),
+    }
+
+
+class SessionCatalog:
+    """Catalog of the split sessions.
+
+    Entries are added within one transaction which is committed when the
+    catalog is closed, use it as a context manager. A failed run leaves the
+    catalog as it was.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path_definitions.SESSION_CATALOG if path is None else path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        self.connection.close()
+
+    def add(self, entry):
+        self.connection.execute(
+            f"INSERT OR REPLACE INTO sessions ({', '.join(COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(COLUMNS))})",
+            [entry.get(column) for column in COLUMNS],
+        )
+
+    def remove_terms(self, electoral_terms):
+        """Removes the sessions of the terms, e.g. before they are split again."""
+        self.connection.executemany(
+            "DELETE FROM sessions WHERE electoral_term = ?",
+            [(term,) for term in electoral_terms],
+        )
+
+    def merge(self, other_path, electoral_terms):
+        """Replaces the sessions of the terms with those of another catalog,
+        e.g. of a shard."""
+        self.remove_terms(electoral_terms)
+        other = sqlite3.connect(other_path)
+        rows = other.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM sessions WHERE electoral_term IN "
+            f"({', '.join('?' * len(electoral_terms))})",
+            list(electoral_terms),
+        ).fetchall()
+        other.close()
+        self.connection.executemany(
+            f"INSERT OR REPLACE INTO sessions VALUES ({', '.join('?' * len(COLUMNS))})", rows
+        )
+
+    def query(self, columns=COLUMNS, electoral_terms=None):
+        """Returns a list of dicts with the columns of the sessions, sorted by
+        session and optionally restricted to the given terms."""
+        sql = f"SELECT {', '.join(columns)} FROM sessions"
+        parameters = []
+        if electoral_terms is not None:
+            parameters = list(electoral_terms)
+            sql += f" WHERE electoral_term IN ({', '.join('?' * len(parameters))})"
+        rows = self.connection.execute(sql + " ORDER BY session", parameters)
+        return [dict(zip(columns, row)) for row in rows]
+
+    def dates(self, electoral_terms=None):
+        """{session: date} of the sessions."""
+        return {
+            row["session"]: row["date"]
+            for row in self.query(["session", "date"], electoral_terms)
+        }
+
+
+def open_catalog(path=None):
+    """Opens an existing catalog for reading."""
+    path = Path(path_definitions.SESSION_CATALOG if path is None else path)
+    if not path.exists():
+        raise FileNotFoundError(f"{path} is missing, run the split stages first.")
+    return SessionCatalog(path)
@@ -0,0 +1,152 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from od_lib.helper_functions import patterns
+from od_lib.helper_functions.instrumentation import Measurement, StageReport
+from od_lib.helper_functions.progressbar import progressbar
+from pathlib import Path
+import argparse
+import os
+import sys
+import traceback
+
+
+def build_parser(description=None):
+    """Command line of the per-session stages: the electoral terms to process
+    (default: all) and the number of worker processes."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "electoral_terms",
+        nargs="*",
+        type=int,
+        help="Electoral terms to process (default: all).",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of worker processes, 1 runs everything in this process.",
+    )
+    return parser
+
+
+def parse_args(description=None):
+    return build_parser(description).parse_args()
+
+
+def selected(term_number, electoral_terms):
+    """True if the term should be processed, an empty selection means all."""
+    return not electoral_terms or term_number in electoral_terms
+
+
+def call(function, task, session=None):
+    """Runs a single task and turns an exception into its traceback, so one
+    broken session does not abort the whole run. Also returns the metrics of
+    the task, with OD_REGEX_STATS also the statistics of its patterns, and the
+    slow pattern inputs of the session."""
+    measurement = Measurement()
+    try:
+        with patterns.located(session=session):
+            success, result = True, function(*task)
+    except Exception:
+        success, result = False, traceback.format_exc()
+    metrics = measurement.stop()
+    if patterns.stats_enabled():
+        metrics["regex"] = patterns.take_stats()
+    slow_inputs = patterns.take_slow_inputs()
+    if slow_inputs:
+        metrics["slow_inputs"] = slow_inputs
+    return success, result, metrics
+
+
+def default_session_name(task):
+    """The file name of the first task argument, e.g. the protocol."""
+    return Path(str(task[0])).stem
+
+
+def run_sessions(
+    function,
+    tasks,
+    workers=None,
+    initializer=None,
+    initargs=(),
+    prefix="",
+    on_result=None,
+    report=None,
+    session_name=default_session_name,
+):
+    """Runs function(*task) for every task on a process pool.
+
+    initializer(*initargs) runs once in every worker and is meant to load the
+    read-only reference tables into module globals. function has to be defined
+    on module level of the calling script, which in turn has to guard its main
+    code with `if __name__ == "__main__"`.
+
+    Returns the results in the order of the tasks (None for failed tasks) and
+    a list of (task, traceback) tuples of the failed tasks. If on_result is
+    given, on_result(index, result) is called in this process as soon as a task
+    is done and its return value is kept instead of the result.
+
+    The metrics of every task are added to report under session_name(task).
+    Without a report, a StageReport of the calling script is written.
+    """
+    tasks = list(tasks)
+    results = [None] * len(tasks)
+    failures = []
+    if not tasks:
+        return results, failures
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    own_report = report is None
+    if own_report:
+        report = StageReport()
+
+    def collect(index, success, result, metrics):
+        # Tasks run in this process already counted into the report.
+        report.add(session_name(tasks[index]), metrics, external=workers > 1)
+        if not success:
+            failures.append((tasks[index], result))
+            result = None
+        if on_result is not None:
+            result = on_result(index, result)
+        results[index] = result
+
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for index in progressbar(range(len(tasks)), prefix):
+            collect(index, *call(function, tasks[index], session_name(tasks[index])))
+        if own_report:
+            report.save()
+        return results, failures
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        futures = {
+            executor.submit(call, function, task, session_name(task)): index
+            for index, task in enumerate(tasks)
+        }
+        completed = as_completed(futures)
+        for _ in progressbar(range(len(futures)), prefix):
+            future = next(completed)
+            index = futures[future]
+            try:
+                success, result, metrics = future.result()
+            except Exception:
+                # The worker process itself died, e.g. killed by the OS.
+                success, result, metrics = False, traceback.format_exc(), {}
+            collect(index, success, result, metrics)
+
+    if own_report:
+        report.save()
+    return results, failures
+
+
+def report_failures(failures):
+    """Prints the tracebacks of all failed tasks to stderr. Returns the exit
+    code for the stage."""
+    for task, error in failures:
+        print(f"Failed: {', '.join(str(item) for item in task)}\n{error}", file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} session(s) failed.", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,255 @@
+from od_lib.helper_functions.build_cache import write_pickle
+from od_lib.definitions.path_definitions import relocate
+from od_lib.helper_functions.raw_data import term_sources
+from od_lib.helper_functions.session_catalog import SessionCatalog
+from od_lib.helper_functions.stage_storage import get_storage, term_folders
+from od_lib.helper_functions.text_store import store_path
+import od_lib.definitions.path_definitions as path_definitions
+from pathlib import Path
+import json
+import os
+import shutil
+import pandas as pd
+
+# Sharded runs split the electoral terms over several data directories below
+# a shared directory:
+#
+#   <shared>/shards.json                   the terms of every shard
+#   <shared>/shard_XX/data/                OD_DATA_DIR of the shard
+#   <shared>/shard_XX/reports/             OD_REPORT_DIR of the shard
+#   <shared>/shard_XX/status.json          written when the shard finished
+#
+# The terms 19 and 20 are processed by the same scripts and share one range of
+# speech ids, so they are never split. The speech ids of the terms 1 to 18 run
+# over all terms, every shard starts them at 0. merge_shards renumbers them in
+# the order of the terms, so the merged outputs do not depend on how the terms
+# were sharded.
+
+PLAN = "shards.json"
+STATUS = "status.json"
+
+ELECTORAL_TERMS = range(1, 21)
+ELECTORAL_TERMS_19_20 = (19, 20)
+
+# Read by the stages of every shard, linked into the shard data directories.
+REFERENCE_FILES = [
+    path_definitions.DATA_FINAL / "factions.pkl",
+    path_definitions.DATA_FINAL / "politicians.csv",
+]
+
+# The electoral_term_XX folders collected from the shards, with the column
+# holding the speech id.
+TERM_OUTPUTS = [
+    (path_definitions.SPEECH_CONTENT_STAGE_01, None),
+    (path_definitions.SPEECH_CONTENT_STAGE_02, None),
+    (path_definitions.SPEECH_CONTENT_STAGE_03, None),
+    (path_definitions.SPEECH_CONTENT_STAGE_04, "speech_id"),
+    (path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_01, "id"),
+    (path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_02, "id"),
+    (path_definitions.CONTRIBUTIONS_EXTENDED_STAGE_03, "id"),
+    (path_definitions.CONTRIBUTIONS_SIMPLIFIED_STAGE_01, "speech_id"),
+    (path_definitions.ELECTORAL_TERM_19_20_STAGE_03, None),
+    (path_definitions.CONTRIBUTIONS_SIMPLIFIED, None),
+]
+
+
+def term_folder(term_number):
+    return f"electoral_term_{term_number:02}"
+
+
+def xml_folder(term_number):
+    """Folder (or downloaded archive) of the xml protocols of a term."""
+    if term_number in ELECTORAL_TERMS_19_20:
+        return path_definitions.ELECTORAL_TERM_19_20_STAGE_01 / term_folder(term_number)
+    sources = dict(term_sources())
+    return sources.get(term_number, path_definitions.RAW_XML / term_folder(term_number))
+
+
+def folder_size(path):
+    if not path.exists():
+        return 0
+    if path.is_file():
+        return path.stat().st_size
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+def plan_shards(electoral_terms, shard_count):
+    """Splits the terms into at most shard_count shards of about the same xml
+    size. Returns a list of sorted term lists, the same input always gives the
+    same plan."""
+    terms = sorted(set(electoral_terms))
+    units = [[term] for term in terms if term not in ELECTORAL_TERMS_19_20]
+    terms_19_20 = [term for term in terms if term in ELECTORAL_TERMS_19_20]
+    if terms_19_20:
+        units.append(terms_19_20)
+
+    weights = {
+        tuple(unit): sum(folder_size(xml_folder(term)) for term in unit) for unit in units
+    }
+    # Largest first onto the currently smallest shard.
+    shards = [[] for _ in range(min(shard_count, len(units)))]
+    sizes = [0] * len(shards)
+    for unit in sorted(units, key=lambda unit: (-weights[tuple(unit)], unit)):
+        index = sizes.index(min(sizes))
+        shards[index].extend(unit)
+        sizes[index] += weights[tuple(unit)]
+    return sorted(sorted(shard) for shard in shards)
+
+
+def write_json(path, data):
+    """Writes a json file atomically, other hosts never see half of it."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".tmp")
+    with open(temp_path, "w") as file:
+        json.dump(data, file, indent=1)
+    os.replace(temp_path, path)
+
+
+def read_json(path):
+    path = Path(path)
+    if not path.exists():
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def shard_dir(shared_dir, index):
+    return Path(shared_dir) / f"shard_{index:02}"
+
+
+def shard_data(shared_dir, index):
+    return shard_dir(shared_dir, index) / "data"
+
+
+def save_plan(shared_dir, shards):
+    write_json(Path(shared_dir) / PLAN, {"shards": shards})
+
+
+def load_plan(shared_dir):
+    plan = read_json(Path(shared_dir) / PLAN)
+    if plan is None:
+        raise FileNotFoundError(f"No shard plan in {shared_dir}, run the plan step first.")
+    return plan["shards"]
+
+
+def shard_status(shared_dir, index):
+    return read_json(shard_dir(shared_dir, index) / STATUS)
+
+
+def shard_finished(shared_dir, index, terms):
+    """True if the shard ran all stages for exactly these terms."""
+    status = shard_status(shared_dir, index)
+    return status is not None and status["status"] == "done" and status["terms"] == terms
+
+
+def link(source, target):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if target.is_symlink() or target.exists():
+        target.unlink()
+    os.symlink(source.resolve(), target)
+
+
+def prepare_shard(shared_dir, index, terms):
+    """Links the xml protocols of the terms and the reference tables into the
+    data directory of a shard. A shard which had other terms before is
+    cleared, so no stale term ends up in its outputs."""
+    data_dir = shard_data(shared_dir, index)
+    status = shard_status(shared_dir, index)
+    if status is not None and status["terms"] != terms:
+        shutil.rmtree(data_dir, ignore_errors=True)
+        (shard_dir(shared_dir, index) / STATUS).unlink()
+
+    for path in REFERENCE_FILES:
+        if not path.exists():
+            raise FileNotFoundError(f"{path} is missing, run the reference stages first.")
+        link(path, relocate(path, data_dir))
+    for term_number in terms:
+        folder = xml_folder(term_number)
+        if not folder.exists():
+            raise FileNotFoundError(f"{folder} is missing, download the protocols first.")
+        link(folder, relocate(folder, data_dir))
+    relocate(path_definitions.RAW_XML, data_dir).mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+
+def replace_tree(source, target):
+    """Replaces target with a copy of source."""
+    temp_path = target.with_name(target.name + ".tmp")
+    shutil.rmtree(temp_path, ignore_errors=True)
+    if source.is_dir():
+        shutil.copytree(source, temp_path)
+        shutil.rmtree(target, ignore_errors=True)
+    else:
+        shutil.copyfile(source, temp_path)
+    os.replace(temp_path, target)
+
+
+def shift_speech_ids(term_number, shift, storage):
+    """Adds shift to the speech ids of all outputs of a term."""
+    for stage_dir, column in TERM_OUTPUTS:
+        folder = stage_dir / term_folder(term_number)
+        if column is None or not folder.exists():
+            continue
+        for file_path in storage.files(folder):
+            df = storage.read(file_path)
+            df[column] = df[column] + shift
+            storage.write(df, file_path)
+
+
+def merge_shards(shared_dir, shards):
+    """Collects the term outputs of all shards into the data directory and
+    numbers the speeches of the terms 1 to 18 in the order of the terms, as a
+    single run over all terms does. Also rebuilds contributions_simplified.pkl
+    of these terms and merges the session catalogs. Returns the merged terms."""
+    storage = get_storage()
+    owners = {term: index for index, terms in enumerate(shards) for term in terms}
+
+    for term_number in sorted(owners):
+        data_dir = shard_data(shared_dir, owners[term_number])
+        store = store_path(path_definitions.RAW_TXT, term_folder(term_number))
+        outputs = [store] + [stage_dir / term_folder(term_number) for stage_dir, _ in TERM_OUTPUTS]
+        for target in outputs:
+            source = relocate(target, data_dir)
+            if source.exists():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                replace_tree(source, target)
+
+    with SessionCatalog() as catalog:
+        for index, terms in enumerate(shards):
+            shard_catalog = relocate(
+                path_definitions.SESSION_CATALOG, shard_data(shared_dir, index)
+            )
+            if shard_catalog.exists():
+                catalog.merge(shard_catalog, terms)
+
+    speech_id = 0
+    terms_1_to_18 = [term for term in sorted(owners) if term not in ELECTORAL_TERMS_19_20]
+    for term_number in terms_1_to_18:
+        folder = path_definitions.SPEECH_CONTENT_STAGE_04 / term_folder(term_number)
+        ids = [
+            storage.read(file_path, columns=["speech_id"])["speech_id"]
+            for file_path in storage.files(folder)
+        ]
+        ids = [session_ids for session_ids in ids if len(session_ids)]
+        if not ids:
+            continue
+        first_id = min(session_ids.min() for session_ids in ids)
+        if first_id != speech_id:
+            shift_speech_ids(term_number, speech_id - first_id, storage)
+        speech_id += sum(len(session_ids) for session_ids in ids)
+
+    simplified_list = [
+        storage.read(file_path)
+        for _, folder_path in term_folders(
+            path_definitions.CONTRIBUTIONS_SIMPLIFIED_STAGE_01, terms_1_to_18
+        )
+        for file_path in storage.files(folder_path)
+    ]
+    if simplified_list:
+        path_definitions.CONTRIBUTIONS_SIMPLIFIED.mkdir(parents=True, exist_ok=True)
+        write_pickle(
+            pd.concat(simplified_list, sort=False),
+            path_definitions.CONTRIBUTIONS_SIMPLIFIED / "contributions_simplified.pkl",
+        )
+    return sorted(owners)
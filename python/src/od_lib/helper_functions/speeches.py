@@ -0,0 +1,294 @@
+from od_lib.helper_functions.clean_text import clean_name_headers
+from od_lib.helper_functions import classify
+from od_lib.helper_functions import patterns
+from od_lib.helper_functions.person_names import split_names
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+president_pattern_str = r"(?P<position_raw>Präsident(?:in)?|Vizepräsident(?:in)?|Alterspräsident(?:in)?|Bundespräsident(?:in)?|Bundeskanzler(?:in)?)\s+(?P<name_raw>[A-ZÄÖÜß](?:[^:([}{\]\)\s]+\s?){1,5})\s?:\s?"
+
+faction_speaker_pattern_str = r"{3}(?P<name_raw>[A-ZÄÖÜß][^:([{{}}\]\)\n]+?)(\s*{0}(?P<constituency>[^:(){{}}[\]\n]+){1})*\s*{0}(?P<position_raw>{2}){1}(\s*{0}(?P<constituency>[^:(){{}}[\]\n]+){1})*\s?:\s?"
+
+minister_pattern_str = r"{0}(?P<name_raw>[A-ZÄÖÜß](?:[^:([{{}}\]\)\s]+\s?){{1,5}}?),\s?(?P<position_raw>(?P<short_position>Bundesminister(?:in)?|Staatsminister(?:in)?|(?:Parl\s?\.\s)?Staatssekretär(?:in)?|Präsident(?:in)?|Bundeskanzler(?:in)?|Schriftführer(?:in)?|Senator(?:in)?\s?(?:{1}(?P<constituency>[^:([{{}}\]\)\s]+){2})?|Berichterstatter(?:in)?)\s?([^:([\]{{}}\)\n]{{0,76}}?\n?){{1,2}})\s?:\s?"
+
+parties = [
+    r"(?:Gast|-)?(?:\s*C\s*[DSMU]\s*S?[DU]\s*(?:\s*[/,':!.-]?)*\s*(?:\s*C+\s*[DSs]?\s*[UÙ]?\s*)?)(?:-?Hosp\.|-Gast|1)?",
+    r"\s*'?S(?:PD|DP)(?:\.|-Gast)?",
+    r"\s*F\.?\s*[PDO][.']?[DP]\.?",
+    r"(?:BÜNDNIS\s*(?:90)?/?(?:\s*D[1I]E)?|Bündnis\s*90/(?:\s*D[1I]E)?)?\s*[GC]R[UÜ].?\s*[ÑN]EN?(?:/Bündnis 90)?",
+    r"DIE LINKE",
+    r"(?:Gruppe\s*der\s*)?PDS(?:/(?:LL|Linke Liste))?",
+    r"(fraktionslos|Parteilos)",
+    r"(?:GB[/-]\s*)?BHE(?:-DG)?",
+    "DP",
+    "KPD",
+    "Z",
+    "BP",
+    "FU",
+    "WAV",
+    r"DRP(\-Hosp\.)",
+    "FVP",
+    "SSW",
+    "SRP",
+    "DA",
+    "Gast",
+    "DBP",
+    "NR",
+]
+
+
+# Timeout of the scan of two lines in degraded_finditer, in seconds.
+WINDOW_TIMEOUT = 1.0
+
+
+def line_starts(text):
+    starts = [0]
+    index = text.find("\n")
+    while index != -1:
+        starts.append(index + 1)
+        index = text.find("\n", index + 1)
+    return starts
+
+
+def degraded_finditer(pattern, text):
+    """The matches of pattern in text, found line by line. Used when the scan
+    of the whole text timed out: a match may only span the line it starts in
+    and the next one, and lines on which the pattern times out again are
+    skipped (and recorded as slow inputs with their line number)."""
+    starts = line_starts(text)
+    ends = starts[1:] + [len(text)]
+    window_ends = starts[2:] + [len(text)] * min(2, len(starts))
+    matches = []
+    position = 0
+    for line, (line_end, window_end) in enumerate(zip(ends, window_ends), 1):
+        while position < line_end:
+            try:
+                with patterns.located(line=line):
+                    match = pattern.search(text, position, window_end, timeout=WINDOW_TIMEOUT)
+            except patterns.PatternTimeout:
+                position = line_end
+                break
+            # Matches starting in a later line are found in its own window.
+            if match is None or match.start() >= line_end:
+                position = line_end
+                break
+            matches.append(match)
+            position = max(match.end(), match.start() + 1)
+    return matches
+
+
+@lru_cache(maxsize=None)
+def term_patterns(term_number):
+    """Returns the compiled speaker patterns of an electoral term."""
+    if term_number <= 10:
+        terms = "1-10"
+        open_brackets = r"[({\[]"
+        close_brackets = r"[)}\]]"
+        prefix = r"(?<=\n)"
+    elif 10 < term_number <= 18:
+        terms = "11-18"
+        open_brackets = r"[(]"
+        close_brackets = r"[)]"
+        prefix = r"(?<=\n)"
+    else:
+        raise ValueError("You should not land here.")
+
+    faction_speaker_pattern = patterns.register(
+        f"speeches.faction_speaker.{terms}",
+        faction_speaker_pattern_str.format(
+            open_brackets, close_brackets, "|".join(parties), prefix
+        )
+    )
+    president_pattern = patterns.register("speeches.president", president_pattern_str)
+    minister_pattern = patterns.register(
+        f"speeches.minister.{terms}",
+        minister_pattern_str.format(prefix, open_brackets, close_brackets),
+    )
+
+    return [president_pattern, faction_speaker_pattern, minister_pattern]
+
+
+def extract_speeches(session_content, session, term_number):
+    """Splits the spoken content of a session into speeches. Returns a
+    DataFrame with the raw speaker name, position and constituency and the
+    content of every speech."""
+    speaker_patterns = term_patterns(term_number)
+
+    session_df = pd.DataFrame(
+        {
+            "session": [],
+            "name_raw": [],
+            "position_raw": [],
+            "constituency": [],
+            "speech_content": [],
+            "span_begin": [],
+            "span_end": [],
+        }
+    )
+
+    # Placeholders for the information of a speaker.
+    session_list = []
+    speaker_name = []
+    speaker_position = []  # faction like "SPD" or also "Präsident"
+    speaker_constituency = []
+    speaker_span_begin = []  # Character position beginning of match
+    speaker_span_end = []  # Character position ending of match
+    speech_content = []
+
+    # Search all parts where one of the patterns is matching.
+    for pattern in speaker_patterns:
+        try:
+            matches = pattern.finditer(session_content)
+        except patterns.PatternTimeout:
+            matches = degraded_finditer(pattern, session_content)
+        for match in matches:
+            session_list.append(session)
+            speaker_name.append(match.group("name_raw"))
+            speaker_position.append(match.group("position_raw"))
+            try:
+                speaker_constituency.append(match.group("constituency"))
+            except IndexError:
+                speaker_constituency.append(None)
+            spans = match.span()
+            speaker_span_begin.append(spans[0])
+            speaker_span_end.append(spans[1])
+
+    # Sort the speeches in the text.
+    session_df["session"] = session_list
+    session_df["name_raw"] = speaker_name
+    session_df["position_raw"] = speaker_position
+    session_df["constituency"] = speaker_constituency
+    session_df["span_begin"] = speaker_span_begin
+    session_df["span_end"] = speaker_span_end
+
+    session_df = session_df.sort_values(by="span_begin")
+
+    # Cut out the speech_contents between the matched patterns.
+    speech_beginnings = session_df["span_end"].to_list()
+    speech_endings = session_df["span_begin"].to_list()[1:]
+    speech_endings.append(len(session_content))
+
+    for begin, end in zip(speech_beginnings, speech_endings):
+        speech_content.append(session_content[begin:end])
+
+    session_df["speech_content"] = speech_content
+
+    return session_df
+
+
+faction_classifier = classify.classifier("speeches")
+
+
+def clean_speeches(speech_content, factions):
+    """Cleans the speaker names and positions of the speeches of a session and
+    inserts the faction ids."""
+    # Insert acad_title column and extract plain name and titles.
+    # ADD DOCUMENTATION HERE
+    speech_content.insert(3, "faction_id", -1)
+    speech_content.insert(3, "position_short", "")
+    speech_content.insert(4, "position_long", "")
+    speech_content.insert(5, "last_name", "")
+    speech_content.insert(6, "first_name", "")
+    speech_content.insert(7, "acad_title", "")
+
+    # Current workaround, because some speeches seem to not be matched
+    # correctly. If second stage works without mistakes (extracting the
+    # speech parts), this should not be necessary anymore.
+    speech_content = speech_content.fillna("")
+
+    # Clean all the names still remaining from PDF Header.
+    # KEEP IN MIND THIS ALSO DELETES NAMES IN VOTING LISTS!!!
+    # And I think not all names are cleaned because of their position, e.g.
+    # "Max Mustermann, Bundeskanzler"
+    # THIS PART IS IMPORTANT AND SHOULD WORK PROPERLY, AS REOCCURING NAMES
+    # CAN INTRODUCE A LARGE BIAS IN TEXT ANALYSIS
+    names = speech_content["name_raw"].to_list()
+    speech_content["speech_content"] = speech_content["speech_content"].apply(
+        clean_name_headers, args=(np.unique(names),)
+    )
+
+    speech_content.reset_index(inplace=True, drop=True)
+
+    # Delete all not alphabetical chars, keep "-" as it occurs often in
+    # names.
+    # Question: Is any other character deleted, which could be in a name?
+    # Answer: I don't think so.
+    speech_content["name_raw"] = speech_content["name_raw"].str.replace(
+        r"[^a-zA-ZÖÄÜäöüß\-]", " ", regex=True
+    )
+
+    # Replace more than two whitespaces with one.
+    speech_content["name_raw"] = speech_content["name_raw"].str.replace(
+        r"  +", " ", regex=True
+    )
+
+    # Split the names into academic titles, first names and last name. A
+    # single name is the last name, a name without any other word than titles
+    # is an error.
+    split = split_names(speech_content["name_raw"])
+    speech_content["acad_title"] = split["acad_title"]
+    speech_content["first_name"] = [
+        first_name if words >= 2 else "" if words == 1 else "ERROR"
+        for first_name, words in zip(split["first_name"], split["words"])
+    ]
+    speech_content["last_name"] = split["last_name"].where(split["words"] > 0, "ERROR")
+
+    # look for factions in the faction column and replace them with a
+    # standardized faction name
+    speakers = faction_classifier.speakers_of(speech_content["position_raw"])
+    speech_content["position_short"] = speakers["position_short"]
+    speech_content["position_long"] = speakers["position_long"]
+    speech_content["faction_id"] = classify.faction_ids(speakers["faction"], factions)
+
+    speech_content = speech_content.drop(columns=["position_raw", "name_raw"])
+
+    return speech_content
+
+
+def load_politicians(path):
+    """Reads politicians.csv and prepares it for matching the speakers."""
+    politicians = pd.read_csv(path)
+    politicians = politicians.loc[
+        :,
+        [
+            "ui",
+            "electoral_term",
+            "faction_id",
+            "first_name",
+            "last_name",
+            "gender",
+            "profession",
+            "constituency",
+            "institution_type",
+        ],
+    ].copy()
+
+    politicians = politicians.astype(dtype={"ui": "int64"})
+
+    # Some cleaning to make matching easier.
+    politicians["constituency"] = politicians["constituency"].fillna("")
+
+    politicians["first_name"] = politicians["first_name"].str.lower()
+    politicians["last_name"] = politicians["last_name"].str.lower()
+    politicians["constituency"] = politicians["constituency"].str.lower()
+
+    politicians["first_name"] = politicians["first_name"].str.replace("ß", "ss", regex=False)
+    politicians["last_name"] = politicians["last_name"].str.replace("ß", "ss", regex=False)
+
+    politicians["first_name"] = politicians["first_name"].apply(str.split)
+
+    politicians["profession"] = politicians["profession"].str.lower()
+
+    return politicians
+
+
+def politicians_of_term(politicians, term_number):
+    """Only select politicians and government members of the election period."""
+    politicians_electoral_term = politicians.loc[
+        politicians["electoral_term"] == term_number
+    ]
+    mgs_electoral_term = politicians_electoral_term.loc[
+        politicians_electoral_term["institution_type"] == "Regierungsmitglied"
+    ]
+    return politicians_electoral_term, mgs_electoral_term
@@ -0,0 +1,314 @@
+from od_lib.helper_functions.clean_text import clean
+from od_lib.helper_functions.raw_data import open_protocol
+from od_lib.helper_functions.text_store import TextStoreWriter, store_path
+import hashlib
+import regex
+import dicttoxml
+import xml.etree.ElementTree as et
+
+begin_pattern_electoral_term = regex.compile(
+    r"Beginn?:?\s?(\d){1,2}(\s?[.,]\s?(\d){1,2})?\s?Uhr"
+)
+appendix_pattern_electoral_term = regex.compile(
+    r"\(Schlu(ß|ss)\s?:?(.*?)\d{1,2}\D+(\d{1,2})?(.*?)\)?|\(Ende der Sitzung: \d{1,2}\D+(\d{1,2}) Uhr\.?\)"  # noqa: E501
+)
+
+begin_pattern_electoral_term_1_and_2 = regex.compile(
+    r"Die.*?Sitzung.*?wird.*?\d{1,2}.*?Uhr.*?(durch.*?den.*?)?eröffnet"
+)
+appendix_pattern_electoral_term_1_and_2 = regex.compile(r"\(Schluß.*?Sitzung.*?Uhr.*?\)")
+
+
+def split_electoral_term_3_to_18(tree):
+    """Splits a protocol of the electoral terms 3 to 18 into table of content,
+    spoken content and appendix. Returns None if the session could not be found."""
+    meta_data = {}
+
+    # Get the document number, the date of the session and the content.
+    meta_data["document_number"] = tree.find("NR").text
+    meta_data["date"] = tree.find("DATUM").text
+    text_corpus = tree.find("TEXT").text
+
+    # Default patterns, the documents below only cut the text corpus and used to
+    # inherit the patterns of the previously parsed file.
+    begin_pattern = begin_pattern_electoral_term
+    appendix_pattern = appendix_pattern_electoral_term
+
+    # Some files have issues which have to be handled mannualy
+    # like a duplicated text corpus or two sessions in one file.
+    if meta_data["document_number"] == "03/16":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(
+            r"\(Schluß der Sitzung: 16\.58 Uhr\.\)"
+        )
+    elif meta_data["document_number"] == "04/69":
+        begin_pattern = regex.compile(r"Beginn: 9\.01")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "04/176":
+        begin_pattern = regex.compile(r"Beginn: 16\.02 Uhr")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "04/196":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(
+            r"Beifall.*?Schluß der Sitzung: 14\.54 Uhr\.\)"
+        )
+    elif meta_data["document_number"] == "05/76":
+        begin_pattern = regex.compile(r"\(Beginn: 14\.32 Uhr\)")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "05/162":
+        begin_pattern = regex.compile(r"\(Beginn: 21\.13 Uhr\.\)")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "05/235":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(
+            r"\(Schluß der Sitzung: 16\.09 Uhr\.\)"
+        )
+    elif meta_data["document_number"] == "07/145":
+        # In this file the whole text is duplicated.
+        find_bundestag = list(
+            regex.finditer("Deutscher Bundestag\n", text_corpus)
+        )
+        text_corpus = text_corpus[: find_bundestag[1].span()[0]]
+    elif meta_data["document_number"] == "07/243":
+        begin_pattern = regex.compile(r"Beginn: 9\.00 Uhr(?=\nPräsident)")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "08/7":
+        begin_pattern = regex.compile(r"Beginn: 9\.00 Uhr(?=\nPräsident)")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "08/146":
+        begin_pattern = regex.compile(r"Beginn: 8\.00 Uhr")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "11/68":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(r"\(Schluß der Sitzung: 21\. 07 Uhr\)")
+    elif meta_data["document_number"] == "11/155":
+        begin_pattern = regex.compile(r"Beginn: 9\.00 Uhr(?=\nVize)")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] == "14/17":
+        begin_pattern = "Beginn: 9.00 Uhr"
+        appendix_pattern = (
+            r"Schluß: 12.06 Uhr\)\n\nDruck: Bonner Universitäts-Buchdruckerei, 53113 Bonn\n "  # noqa: E501
+            r"53003 Bonn, Telefon: 02 28/3 82 08 40, Telefax: 02 28/3 82 08 44\n\n20\n\nBun"
+            r"despräsident Dr. Roman Herzog\n\nDeutscher"
+        )
+    elif meta_data["document_number"] == "14/21":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = r"\(Schluß: 22.18 Uhr\)\n\nAdelheid Tröscher\n\n1594"
+    elif meta_data["document_number"] == "14/192":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(
+            r"Vizepräsidentin Petra Bläss: Ich schließe die Aus-\nsprache\.(?=\n\nInter)"
+        )
+    elif meta_data["document_number"] == "16/222":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(r"\(Schluss: 18\.54 Uhr\)")
+    elif meta_data["document_number"] == "17/250":
+        begin_pattern = regex.compile(r"Beginn: 9.02 Uhr(?=\nPräsident)")
+        appendix_pattern = r"\(Schluss: 0.52 Uhr\)\n\nIch"
+    elif meta_data["document_number"] == "18/142":
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = regex.compile(r"\(Schluss: 16 \.36 Uhr\)")
+    elif meta_data["document_number"] == "18/237":
+        begin_pattern = regex.compile(r"Beginn: 9 \.02 Uhr")
+        appendix_pattern = appendix_pattern_electoral_term
+    elif meta_data["document_number"] in [
+        "03/97",
+        "04/66",
+        "04/87",
+        "04/112",
+        "05/47",
+        "05/232",
+    ]:
+        # In these documents there are two sessions right after each
+        # other, and the following document is identical.
+        find_second = regex.search(
+            "(?<=\n)"
+            + str(int(meta_data["document_number"][3:]) + 1)
+            + r"\. Sitzung(?=\nBonn)",
+            text_corpus,
+        )
+        text_corpus = text_corpus[: find_second.span()[0]]
+    elif meta_data["document_number"] in [
+        "03/98",
+        "04/67",
+        "04/88",
+        "04/113",
+        "05/48",
+        "05/233",
+    ]:
+        find_second = regex.search(
+            "(?<=\n)"
+            + meta_data["document_number"][3:]
+            + r"\. Sitzung(?=\nBonn)",
+            text_corpus,
+        )
+        text_corpus = text_corpus[find_second.span()[0] :]
+    else:
+        begin_pattern = begin_pattern_electoral_term
+        appendix_pattern = appendix_pattern_electoral_term
+
+    # Clean text corpus.
+    text_corpus = clean(text_corpus)
+
+    # Find the beginning pattern in plenar file.
+    find_beginnings = list(regex.finditer(begin_pattern, text_corpus))
+
+    # If found more than once or none, handle depending on period.
+    if len(find_beginnings) != 1:
+        return None
+
+    beginning_of_session = find_beginnings[0].span()[1]
+
+    toc = text_corpus[:beginning_of_session]
+    session_content = text_corpus[beginning_of_session:]
+
+    # At this point the document has a unique beginning. The spoken
+    # content begins after the matched phrase.
+
+    # Append "END OF FILE" to document text, otherwise pattern is
+    # not found, when appearing at the end of the file.
+    session_content += "\n\nEND OF FILE"
+
+    find_endings = list(regex.finditer(appendix_pattern, session_content))
+
+    if len(find_endings) != 1:
+        return None
+
+    # Appendix begins before the matched phrase.
+    end_of_session = find_endings[0].span()[0]
+
+    appendix = session_content[end_of_session:]
+    session_content = session_content[:end_of_session]
+
+    return {
+        "toc": toc,
+        "session_content": session_content,
+        "appendix": appendix,
+        "meta_data": meta_data,
+    }
+
+
+def split_electoral_term_1_and_2(tree):
+    """Extracts the spoken content of a protocol of the electoral terms 1 and 2.
+    Returns None if the session could not be found."""
+    begin_pattern = begin_pattern_electoral_term_1_and_2
+    appendix_pattern = appendix_pattern_electoral_term_1_and_2
+
+    meta_data = {}
+
+    # Get the document number, the date of the session and the content.
+    meta_data["document_number"] = tree.find("NR").text
+    meta_data["date"] = tree.find("DATUM").text
+    text_corpus = tree.find("TEXT").text
+
+    # Clean text corpus.
+    text_corpus = clean(text_corpus)
+
+    # Find the beginnings and endings of the spoken contents in the
+    # pattern plenar files.
+    find_beginnings = list(regex.finditer(begin_pattern, text_corpus))
+    find_endings = list(regex.finditer(appendix_pattern, text_corpus))
+
+    # Append "END OF FILE" to document text, otherwise pattern is
+    # not found, when appearing at the end of the file.
+    text_corpus += "\n\nEND OF FILE"
+
+    session_content = ""
+
+    # Just extract spoken parts between the matching of the
+    # beginning and the ending pattern. TOC and APPENDIX is
+    # disregarded. For example: If a session is interrupted and
+    # continued on the next day, there is again a whole table of content
+    # section with the names of all the speakers, which should not be
+    # included in the usual spoken content.
+    if len(find_beginnings) == 0:
+        return None
+    elif len(find_beginnings) > len(find_endings) and len(find_endings) == 1:
+        session_content = text_corpus[
+            find_beginnings[0].span()[1] : find_endings[0].span()[0]
+        ]
+    elif len(find_beginnings) == len(find_endings):
+        for begin, end in zip(find_beginnings, find_endings):
+            session_content += text_corpus[begin.span()[1] : end.span()[0]]
+    else:
+        return None
+
+    return {"session_content": session_content, "meta_data": meta_data}
+
+
+def split_xml(xml_file_path, term_number):
+    """Splits the plenar protocol of the given electoral term (1 to 18). Returns
+    a dict with the session_content, the meta_data, size and hash of the
+    protocol (source) and for the terms 3 to 18 the toc and appendix, or None
+    if the protocol could not be split."""
+    with open_protocol(xml_file_path) as file:
+        content = file.read()
+    tree = et.ElementTree(et.fromstring(content))
+    if term_number <= 2:
+        parts = split_electoral_term_1_and_2(tree)
+    else:
+        parts = split_electoral_term_3_to_18(tree)
+    if parts is not None:
+        parts["source"] = {"size": len(content), "sha256": hashlib.sha256(content).hexdigest()}
+    return parts
+
+
+def save_session(writer, session, parts):
+    """Adds table of content, spoken content, appendix and meta data of a
+    session to a text store."""
+    texts = {name: parts[name] for name in ["toc", "session_content", "appendix"] if name in parts}
+    texts["meta_data"] = dicttoxml.dicttoxml(parts["meta_data"])
+    writer.add(session, texts)
+
+
+class SplitTerms:
+    """The text stores and session catalog entries of the terms split in one
+    run, collected while the sessions are split in any order.
+
+    finish() moves the stores of the terms into place and replaces their
+    sessions in the catalog. A term with a failed session keeps its old store
+    and catalog rows, so the text of the failed session from an earlier run is
+    not lost, and it is split again on the next run. Without a directory only
+    the catalog entries are collected.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.writers = {}
+        self.entries = {}
+
+    def add_term(self, term_number, source):
+        self.entries[term_number] = []
+        if self.directory is not None:
+            self.writers[term_number] = TextStoreWriter(store_path(self.directory, source.stem))
+
+    def add(self, term_number, session, entry, parts=None):
+        """Adds the catalog entry of a session and, with a directory, its
+        parts to the store of its term. Both may be None, e.g. for a protocol
+        which is not split."""
+        if parts is not None and term_number in self.writers:
+            save_session(self.writers[term_number], session, parts)
+        if entry is not None:
+            self.entries[term_number].append(entry)
+
+    def finish(self, catalog, failed_terms=()):
+        """Replaces the stores and catalog rows of the terms without failed
+        sessions. Returns the terms which were kept as they were."""
+        kept = sorted(set(failed_terms) & set(self.entries))
+        for term_number, entries in self.entries.items():
+            writer = self.writers.get(term_number)
+            if term_number in kept:
+                if writer is not None:
+                    writer.discard()
+                continue
+            if writer is not None:
+                writer.close()
+            catalog.remove_terms([term_number])
+            for entry in entries:
+                catalog.add(entry)
+        return kept
+
+    def discard(self):
+        """Keeps all stores as they were, e.g. after an exception."""
+        for writer in self.writers.values():
+            writer.discard()
@@ -0,0 +1,247 @@
+from od_lib.helper_functions.build_cache import atomic_output, write_pickle
+from od_lib.helper_functions.instrumentation import count_input, count_output
+from pathlib import Path
+import operator
+import os
+import pandas as pd
+import regex
+
+# Optional dependency, only needed for the parquet backend.
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = ds = pq = None
+
+STORAGE_ENV = "OD_STAGE_STORAGE"
+
+
+def term_folders(stage_dir, electoral_terms=None):
+    """Yields (term_number, folder) for every electoral_term_XX folder in the
+    stage directory, optionally restricted to the given terms."""
+    stage_dir = Path(stage_dir)
+    if not stage_dir.exists():
+        return
+    for folder_path in sorted(stage_dir.iterdir()):
+        if not folder_path.is_dir():
+            continue
+        term_number = regex.search(r"(?<=electoral_term_)\d{2}", folder_path.stem)
+        if term_number is None:
+            continue
+        term_number = int(term_number.group(0))
+        if electoral_terms is not None and term_number not in electoral_terms:
+            continue
+        yield term_number, folder_path
+
+
+def is_in(values, collection):
+    """values in collection, for every value of a Series."""
+    if isinstance(values, pd.Series):
+        return values.isin(collection)
+    return values in collection
+
+
+def is_not_in(values, collection):
+    """values not in collection, for every value of a Series."""
+    if isinstance(values, pd.Series):
+        return ~values.isin(collection)
+    return values not in collection
+
+
+# The operators of the (column, op, value) filters, for a value or a Series.
+OPERATORS = {
+    "==": operator.eq,
+    "=": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": is_in,
+    "not in": is_not_in,
+}
+
+
+def get_operator(op):
+    try:
+        return OPERATORS[op]
+    except KeyError:
+        raise ValueError(f"Unknown filter operator '{op}'.")
+
+
+def split_term_filters(filters, stage_dir):
+    """Splits the electoral_term predicates off the filters. They select the
+    terms among the folders of the stage, everything else is pushed down to
+    the reader."""
+    if not filters:
+        return None, None
+
+    functions = [get_operator(op) for _, op, _ in filters]
+    term_filters = [
+        (function, value)
+        for function, (column, _, value) in zip(functions, filters)
+        if column == "electoral_term"
+    ]
+    other_filters = [f for f in filters if f[0] != "electoral_term"]
+    terms = None
+    if term_filters:
+        terms = {
+            term
+            for term, _ in term_folders(stage_dir)
+            if all(function(term, value) for function, value in term_filters)
+        }
+    return terms, other_filters or None
+
+
+def apply_filters(df, filters):
+    """Applies (column, op, value) filters to a DataFrame."""
+    for column, op, value in filters or []:
+        df = df.loc[get_operator(op)(df[column], value)]
+    return df
+
+
+class PickleStorage:
+    """One pandas pickle per session, the original layout."""
+
+    name = "pickle"
+    extension = ".pkl"
+
+    def path(self, folder, session):
+        return Path(folder) / (str(session) + self.extension)
+
+    def files(self, folder):
+        return sorted(Path(folder).glob("*" + self.extension))
+
+    def write(self, df, path):
+        write_pickle(df, path)
+        count_output(path, len(df))
+
+    def read(self, path, columns=None):
+        df = pd.read_pickle(path)
+        count_input(path)
+        return df if columns is None else df.loc[:, columns]
+
+    def count_rows(self, path):
+        return len(pd.read_pickle(path))
+
+    def read_stage(self, stage_dir, columns=None, filters=None):
+        """Reads all sessions of a stage into one DataFrame. The
+        electoral_term column is added from the folder names."""
+        terms, filters = split_term_filters(filters, stage_dir)
+        frames = []
+        for term_number, folder_path in term_folders(stage_dir, terms):
+            for file_path in self.files(folder_path):
+                df = pd.read_pickle(file_path)
+                count_input(file_path)
+                df["electoral_term"] = term_number
+                frames.append(apply_filters(df, filters))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, sort=False)
+        return df if columns is None else df.loc[:, columns]
+
+
+class ParquetStorage:
+    """One parquet file per session inside the electoral_term_XX partition
+    folders. Reading a stage only opens the partitions matching the
+    electoral_term filter, pushes the other filters down to the row groups and
+    only deserializes the requested columns.
+    """
+
+    name = "parquet"
+    extension = ".parquet"
+
+    def __init__(self):
+        if pa is None:
+            raise ImportError("The parquet stage storage needs the 'pyarrow' package.")
+
+    def path(self, folder, session):
+        return Path(folder) / (str(session) + self.extension)
+
+    def files(self, folder):
+        return sorted(Path(folder).glob("*" + self.extension))
+
+    def write(self, df, path):
+        # Arrow needs one type per column. Missing values in a column holding
+        # lists (e.g. first_name) are stored as null and read back as None,
+        # any other value is refused instead of being rewritten.
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            values = df[column]
+            is_list = values.map(lambda x: isinstance(x, list))
+            if not is_list.any():
+                continue
+            other = values[~is_list & values.notna()]
+            if len(other):
+                raise ValueError(
+                    f"Column '{column}' mixes lists with {type(other.iloc[0]).__name__} "
+                    f"values like {other.iloc[0]!r}, which parquet can't store."
+                )
+            df[column] = values.where(is_list, None)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        with atomic_output(path) as temp_path:
+            pq.write_table(table, temp_path)
+        count_output(path, len(df))
+
+    def _to_pandas(self, table):
+        df = table.to_pandas()
+        # Arrow returns list columns as numpy arrays, the stages expect lists.
+        for field in table.schema:
+            if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+                df[field.name] = df[field.name].map(
+                    lambda x: None if x is None else list(x)
+                )
+        return df
+
+    def read(self, path, columns=None):
+        # Counts the whole file, even if only some columns are read.
+        count_input(path)
+        return self._to_pandas(pq.read_table(path, columns=columns))
+
+    def count_rows(self, path):
+        # Only the footer has to be read.
+        return pq.ParquetFile(path).metadata.num_rows
+
+    def read_stage(self, stage_dir, columns=None, filters=None):
+        """Reads all sessions of a stage into one DataFrame. The
+        electoral_term column is added from the folder names."""
+        terms, filters = split_term_filters(filters, stage_dir)
+        frames = []
+        expression = pq.filters_to_expression(filters) if filters else None
+        read_columns = None
+        if columns is not None:
+            read_columns = [column for column in columns if column != "electoral_term"]
+        for term_number, folder_path in term_folders(stage_dir, terms):
+            files = [str(file_path) for file_path in self.files(folder_path)]
+            if not files:
+                continue
+            for file_path in files:
+                count_input(file_path)
+            dataset = ds.dataset(files, format="parquet")
+            table = dataset.to_table(columns=read_columns, filter=expression)
+            df = self._to_pandas(table)
+            df["electoral_term"] = term_number
+            frames.append(df)
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        df = pd.concat(frames, sort=False)
+        return df if columns is None else df.loc[:, columns]
+
+
+storages = {
+    PickleStorage.name: PickleStorage,
+    ParquetStorage.name: ParquetStorage,
+}
+
+
+def get_storage(name=None):
+    """Returns the stage storage with the given name. Defaults to the
+    OD_STAGE_STORAGE environment variable and falls back to pickle."""
+    name = name or os.environ.get(STORAGE_ENV, PickleStorage.name)
+    try:
+        return storages[name]()
+    except KeyError:
+        raise ValueError(
+            f"Unknown stage storage '{name}', choose one of: {', '.join(storages)}"
+        )
@@ -0,0 +1,409 @@
+from od_lib.definitions.path_definitions import relocate
+import od_lib.definitions.path_definitions as path_definitions
+import xml.etree.ElementTree as et
+import datetime
+import random
+import textwrap
+import pandas as pd
+
+# Synthetic plenary protocols for benchmarks. The protocols follow the layout
+# of the real ones closely enough to pass every stage: NR/DATUM/TEXT documents
+# with the speaker headers of the speech extraction and bracketed
+# interjections for the electoral terms 1 to 18, rede/redner documents for the
+# terms 19 and 20. The content is random, but deterministic for a seed.
+
+# abbreviation (factions.pkl), faction name, name in the protocols, first term
+FACTIONS = [
+    ("CDU/CSU", "Fraktion der CDU/CSU", "CDU/CSU", 1),
+    ("SPD", "Fraktion der SPD", "SPD", 1),
+    ("FDP", "Fraktion der FDP", "FDP", 1),
+    ("Bündnis 90/Die Grünen", "Fraktion BÜNDNIS 90/DIE GRÜNEN", "BÜNDNIS 90/DIE GRÜNEN", 10),
+    ("DIE LINKE.", "Fraktion DIE LINKE.", "DIE LINKE", 16),
+    ("AfD", "Fraktion der AfD", "AfD", 19),
+]
+
+FIRST_NAMES = [
+    "Anna", "Karl", "Maria", "Heinrich", "Ursula", "Wolfgang", "Renate", "Hans",
+    "Monika", "Peter", "Elisabeth", "Jürgen", "Brigitte", "Gerhard", "Ingrid",
+    "Klaus", "Petra", "Helmut", "Sabine", "Walter", "Gisela", "Dieter", "Ute",
+    "Michael", "Katrin", "Thomas", "Claudia", "Stefan", "Barbara", "Rainer",
+]
+LAST_NAMES = [
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Meyer", "Wagner",
+    "Becker", "Schulz", "Hoffmann", "Schäfer", "Koch", "Bauer", "Richter",
+    "Klein", "Wolf", "Schröder", "Neumann", "Schwarz", "Zimmermann", "Braun",
+    "Krüger", "Hofmann", "Hartmann", "Lange", "Schmitt", "Werner", "Krause",
+    "Lehmann", "Köhler", "Maier", "Herrmann", "König", "Walter", "Kaiser",
+    "Fuchs", "Peters", "Lang", "Scholz", "Möller", "Weiß", "Jung", "Hahn",
+    "Vogel", "Friedrich", "Keller", "Günther", "Frank", "Berger", "Winkler",
+]
+CONSTITUENCIES = [
+    "Hamburg", "Bremen", "Köln", "München", "Frankfurt", "Hannover", "Kiel",
+    "Stuttgart", "Dortmund", "Essen", "Mainz", "Bonn", "Kassel", "Augsburg",
+]
+PROFESSIONS = ["Jurist", "Lehrer", "Landwirt", "Kaufmann", "Ingenieur", "Ärztin", "Journalistin"]
+MINISTRIES = [
+    "Bundesminister des Innern",
+    "Bundesminister der Finanzen",
+    "Bundesminister für Wirtschaft",
+    "Bundesminister der Justiz",
+    "Bundesminister für Arbeit und Sozialordnung",
+    "Bundesminister der Verteidigung",
+]
+# Plain words only, so the prose never contains a speaker header, a session
+# beginning or ending or an interjection.
+WORDS = [
+    "wir", "haben", "die", "Regierung", "Gesetz", "Entwurf", "Haushalt", "Länder",
+    "Bürger", "Frage", "Antwort", "heute", "morgen", "Ausschuss", "Antrag",
+    "Mehrheit", "Opposition", "Koalition", "Vorlage", "Debatte", "Kollegen",
+    "unsere", "wichtig", "richtig", "deshalb", "aber", "nicht", "mehr", "Jahr",
+    "Milliarden", "Arbeit", "Wirtschaft", "Zukunft", "Verantwortung", "Land",
+    "Bundesrepublik", "Steuern", "Rente", "Familien", "Schulen", "Forschung",
+    "Verkehr", "Umwelt", "Sicherheit", "Frieden", "Europa", "Gemeinden", "und",
+    "mit", "für", "über", "gegen", "nach", "vor", "dem", "einer", "diese",
+]
+INTERJECTIONS = [
+    "(Beifall bei der {faction})",
+    "(Beifall bei der {faction} und der {other})",
+    "(Zuruf von der {other}: {short})",
+    "(Heiterkeit bei der {faction})",
+    "(Widerspruch bei der {other})",
+    "(Lachen bei der {other})",
+    "(Abg. {name} [{other}]: {short})",
+    "(Beifall bei der {faction} – Zuruf von der {other}: {short})",
+    "(Sehr richtig! bei der {faction})",
+    "(Unruhe)",
+]
+
+# Document numbers which split_xml handles with their own patterns.
+SPECIAL_DOCUMENTS = {
+    "03/16", "03/97", "03/98", "04/66", "04/67", "04/69", "04/87", "04/88",
+    "04/112", "04/113", "04/176", "04/196", "05/47", "05/48", "05/76",
+    "05/162", "05/232", "05/233", "05/235", "07/145", "07/243", "08/7",
+    "08/146", "11/68", "11/155", "14/17", "14/21", "14/192", "16/222",
+    "17/250", "18/142", "18/237",
+}
+
+
+def faction_table():
+    """factions.pkl, ids are given by the sorted abbreviations."""
+    abbreviations = sorted(abbreviation for abbreviation, _, _, _ in FACTIONS)
+    return pd.DataFrame(
+        {
+            "id": [abbreviations.index(abbreviation) for abbreviation, _, _, _ in FACTIONS],
+            "abbreviation": [abbreviation for abbreviation, _, _, _ in FACTIONS],
+            "faction_name": [faction_name for _, faction_name, _, _ in FACTIONS],
+        }
+    )
+
+
+def term_factions(term_number):
+    return [faction for faction in FACTIONS if faction[3] <= term_number]
+
+
+def sentence(rng, length=None):
+    words = rng.choices(WORDS, k=length or rng.randint(6, 18))
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "!", "?"])
+
+
+def term_members(term_number, members_per_faction, rng):
+    """Members of parliament and government of an electoral term as rows of
+    politicians.csv."""
+    factions = faction_table()
+    rows = []
+    names = rng.sample(
+        [(first, last) for first in FIRST_NAMES for last in LAST_NAMES],
+        members_per_faction * len(term_factions(term_number)) + len(MINISTRIES) + 2,
+    )
+    for abbreviation, faction_name, _, _ in term_factions(term_number):
+        faction_id = int(factions.loc[factions["abbreviation"] == abbreviation, "id"].iloc[0])
+        for _ in range(members_per_faction):
+            first_name, last_name = names.pop()
+            rows.append(
+                {
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "faction_id": faction_id,
+                    "constituency": rng.choice(CONSTITUENCIES),
+                    "academic_title": rng.choice(["", "", "", "Dr."]),
+                    "institution_type": "Fraktion/Gruppe",
+                    "institution_name": faction_name,
+                }
+            )
+    for ministry in MINISTRIES:
+        first_name, last_name = names.pop()
+        rows.append(
+            {
+                "first_name": first_name,
+                "last_name": last_name,
+                "faction_id": -1,
+                "constituency": "",
+                "academic_title": rng.choice(["", "Dr."]),
+                "institution_type": "Regierungsmitglied",
+                "institution_name": ministry,
+            }
+        )
+    for position in ["Präsident", "Vizepräsident"]:
+        first_name, last_name = names.pop()
+        rows.append(
+            {
+                "first_name": first_name,
+                "last_name": last_name,
+                "faction_id": int(factions["id"].iloc[0]),
+                "constituency": "",
+                "academic_title": "Dr.",
+                "institution_type": "Fraktion/Gruppe",
+                "institution_name": position,
+            }
+        )
+    return rows
+
+
+def politician_table(electoral_terms, members_per_faction=30, seed=0):
+    """politicians.csv with the columns of 03_merge_politicians."""
+    rows = []
+    ui = 11000000
+    for term_number in electoral_terms:
+        rng = random.Random(f"{seed}-politicians-{term_number}")
+        for row in term_members(term_number, members_per_faction, rng):
+            ui += 1
+            rows.append(
+                {
+                    "ui": ui,
+                    "electoral_term": term_number,
+                    "faction_id": row["faction_id"],
+                    "first_name": row["first_name"],
+                    "last_name": row["last_name"],
+                    "birth_place": rng.choice(CONSTITUENCIES),
+                    "birth_country": "",
+                    "birth_date": (
+                        f"{rng.randint(1, 28):02}.{rng.randint(1, 12):02}.19{rng.randint(10, 80)}"
+                    ),
+                    "death_date": "",
+                    "gender": rng.choice(["männlich", "weiblich"]),
+                    "profession": rng.choice(PROFESSIONS),
+                    "constituency": row["constituency"],
+                    "aristocracy": "",
+                    "academic_title": row["academic_title"],
+                    "institution_type": row["institution_type"],
+                    "institution_name": row["institution_name"],
+                }
+            )
+    return pd.DataFrame(rows)
+
+
+def session_date(term_number, session_number):
+    date = datetime.date(1949 + 4 * (term_number - 1), 10, 1)
+    return date + datetime.timedelta(days=2 * session_number)
+
+
+def split_members(members):
+    """Splits the members of a term into (faction, member) pairs, ministers and
+    the presidium."""
+    factions = {abbreviation: name for abbreviation, _, name, _ in FACTIONS}
+    faction_ids = faction_table().set_index("id")["abbreviation"].to_dict()
+    speakers = members.loc[members["institution_type"] == "Fraktion/Gruppe"]
+    presidium = speakers.loc[speakers["institution_name"].isin(["Präsident", "Vizepräsident"])]
+    speakers = speakers.drop(presidium.index)
+    speakers = [
+        (factions[faction_ids[row.faction_id]], row) for row in speakers.itertuples()
+    ]
+    ministers = list(members.loc[members["institution_type"] == "Regierungsmitglied"].itertuples())
+    return speakers, ministers, list(presidium.itertuples())
+
+
+def title(row):
+    return (row.academic_title + " ") if row.academic_title else ""
+
+
+def interjection(rng, faction, speakers):
+    other, member = rng.choice(speakers)
+    return rng.choice(INTERJECTIONS).format(
+        faction=faction,
+        other=other,
+        name=member.last_name,
+        short=sentence(rng, rng.randint(2, 5)),
+    )
+
+
+def speech_text(rng, faction, speakers, paragraphs):
+    """Prose wrapped like the pdf conversions, interjections on own lines."""
+    lines = []
+    for _ in range(paragraphs):
+        paragraph = " ".join(sentence(rng) for _ in range(rng.randint(2, 6)))
+        lines.extend(textwrap.wrap(paragraph, 70))
+        if rng.random() < 0.6:
+            lines.append(interjection(rng, faction, speakers))
+    return "\n".join(lines)
+
+
+def protocol_electoral_term_1_to_18(term_number, session_number, members, speeches, rng):
+    """Returns the xml document of a session of the electoral terms 1 to 18."""
+    speakers, ministers, presidium = split_members(members)
+    president = presidium[0]
+    president_header = f"Präsident {title(president)}{president.last_name}: "
+    date = session_date(term_number, session_number)
+
+    toc = [
+        "Deutscher Bundestag",
+        f"{session_number}. Sitzung",
+        f"Bonn, den {date.strftime('%d.%m.%Y')}",
+        "",
+        "Inhalt:",
+    ]
+    body = []
+    for number in range(speeches):
+        if rng.random() < 0.15:
+            minister = rng.choice(ministers)
+            header = f"{title(minister)}{minister.last_name}, {minister.institution_name}: "
+            faction = speakers[0][0]
+        else:
+            faction, member = rng.choice(speakers)
+            constituency = f" ({member.constituency})" if rng.random() < 0.3 else ""
+            header = f"{title(member)}{member.last_name}{constituency} ({faction}): "
+        toc.append(f"{header.rstrip(': ')} . . . . . . {100 + number}")
+        body.append(header + speech_text(rng, faction, speakers, rng.randint(2, 8)))
+        if rng.random() < 0.5:
+            body.append(president_header + sentence(rng))
+
+    if term_number <= 2:
+        opening = (
+            f"Die Sitzung wird um 9 Uhr {rng.randint(1, 30)} Minuten durch den "
+            f"Präsidenten {title(president)}{president.last_name} eröffnet."
+        )
+    else:
+        opening = "Beginn: 9.00 Uhr"
+    text = "\n".join(
+        toc
+        + [opening, president_header + "Die Sitzung ist eröffnet."]
+        + body
+        + [
+            "(Schluß der Sitzung: 18.12 Uhr.)",
+            "",
+            "Anlage 1",
+            "Liste der entschuldigten Abgeordneten",
+            "\n".join(f"{row.last_name} {row.first_name}" for _, row in speakers[:10]),
+        ]
+    )
+
+    document = et.Element("DOKUMENT")
+    et.SubElement(document, "WAHLPERIODE").text = str(term_number)
+    et.SubElement(document, "DOKUMENTART").text = "PLENARPROTOKOLL"
+    et.SubElement(document, "NR").text = f"{term_number:02}/{session_number}"
+    et.SubElement(document, "DATUM").text = date.strftime("%d.%m.%Y")
+    et.SubElement(document, "TITEL").text = f"Plenarprotokoll vom {date.strftime('%d.%m.%Y')}"
+    et.SubElement(document, "TEXT").text = text
+    return et.tostring(document, encoding="utf-8", xml_declaration=True)
+
+
+def protocol_electoral_term_19_20(term_number, session_number, members, speeches, rng):
+    """Returns the xml document of a session of the electoral terms 19 and 20."""
+    speakers, ministers, presidium = split_members(members)
+    president = presidium[0]
+    date = session_date(term_number, session_number).strftime("%d.%m.%Y")
+
+    protocol = et.Element(
+        "dbtplenarprotokoll",
+        {"wahlperiode": str(term_number), "sitzung-nr": str(session_number), "sitzung-datum": date},
+    )
+    et.SubElement(protocol, "vorspann").text = f"Deutscher Bundestag\n{session_number}. Sitzung"
+    course = et.SubElement(protocol, "sitzungsverlauf")
+    speaker_list = et.SubElement(protocol, "rednerliste", {"sitzung-datum": date})
+
+    def speaker(parent, row, faction=None, role=None):
+        element = et.SubElement(parent, "redner", {"id": str(row.ui)})
+        name = et.SubElement(element, "name")
+        if row.academic_title:
+            et.SubElement(name, "titel").text = row.academic_title
+        et.SubElement(name, "vorname").text = row.first_name
+        et.SubElement(name, "nachname").text = row.last_name
+        if faction is not None:
+            et.SubElement(name, "fraktion").text = faction
+        else:
+            et.SubElement(et.SubElement(name, "rolle"), "rolle_lang").text = role
+        return element
+
+    for top_number in range(max(1, speeches // 5)):
+        top = et.SubElement(
+            course, "tagesordnungspunkt", {"top-id": f"Tagesordnungspunkt {top_number + 1}"}
+        )
+        et.SubElement(top, "p", {"klasse": "T_fett"}).text = sentence(rng)
+        for number in range(min(5, speeches - 5 * top_number)):
+            rede_id = f"ID{term_number}{session_number:03}{top_number:02}{number:02}"
+            rede = et.SubElement(top, "rede", {"id": rede_id})
+            header = et.SubElement(rede, "p", {"klasse": "redner"})
+            if rng.random() < 0.15:
+                row = rng.choice(ministers)
+                faction = rng.choice(speakers)[0]
+                speaker(header, row, role=row.institution_name).tail = (
+                    f"{row.first_name} {row.last_name}, {row.institution_name}:"
+                )
+                speaker(speaker_list, row, role=row.institution_name)
+            else:
+                faction, row = rng.choice(speakers)
+                speaker(header, row, faction=faction).tail = (
+                    f"{row.first_name} {row.last_name} ({faction}):"
+                )
+                speaker(speaker_list, row, faction=faction)
+            for _ in range(rng.randint(2, 8)):
+                et.SubElement(rede, "p", {"klasse": "J_1"}).text = " ".join(
+                    sentence(rng) for _ in range(rng.randint(2, 6))
+                )
+                if rng.random() < 0.6:
+                    et.SubElement(rede, "kommentar").text = interjection(rng, faction, speakers)
+            if rng.random() < 0.3:
+                et.SubElement(rede, "name").text = (
+                    f"Präsident {title(president)}{president.first_name} {president.last_name}:"
+                )
+                et.SubElement(rede, "p", {"klasse": "J_1"}).text = sentence(rng)
+
+    et.SubElement(protocol, "anlagen").text = "Anlage 1\nEntschuldigte Abgeordnete"
+    return et.tostring(protocol, encoding="utf-8", xml_declaration=True)
+
+
+def generate_corpus(
+    data_dir,
+    electoral_terms,
+    sessions_per_term,
+    speeches_per_session,
+    members_per_faction=30,
+    seed=0,
+):
+    """Writes synthetic protocols of the given electoral terms together with
+    factions.pkl and politicians.csv into data_dir, laid out like
+    path_definitions. Returns the number of sessions and written bytes of the
+    protocols per term."""
+    if sessions_per_term > 900:
+        raise ValueError("The session numbers of a term have three digits.")
+    data_dir = data_dir.resolve()
+    final = relocate(path_definitions.DATA_FINAL, data_dir)
+    final.mkdir(parents=True, exist_ok=True)
+
+    faction_table().to_pickle(final / "factions.pkl")
+    politicians = politician_table(electoral_terms, members_per_faction, seed)
+    politicians.to_csv(final / "politicians.csv", index=False)
+
+    summary = {}
+    for term_number in electoral_terms:
+        rng = random.Random(f"{seed}-protocols-{term_number}")
+        members = politicians.loc[politicians["electoral_term"] == term_number]
+        if term_number <= 18:
+            folder = relocate(path_definitions.RAW_XML, data_dir)
+            protocol = protocol_electoral_term_1_to_18
+        else:
+            folder = relocate(path_definitions.ELECTORAL_TERM_19_20_STAGE_01, data_dir)
+            protocol = protocol_electoral_term_19_20
+        folder = folder / f"electoral_term_{term_number:02}"
+        folder.mkdir(parents=True, exist_ok=True)
+
+        sessions, size, session_number = 0, 0, 0
+        while sessions < sessions_per_term:
+            session_number += 1
+            if f"{term_number:02}/{session_number}" in SPECIAL_DOCUMENTS:
+                continue
+            document = protocol(term_number, session_number, members, speeches_per_session, rng)
+            (folder / f"{term_number:02}{session_number:03}.xml").write_bytes(document)
+            sessions += 1
+            size += len(document)
+        summary[term_number] = {"sessions": sessions, "bytes": size}
+    return summary
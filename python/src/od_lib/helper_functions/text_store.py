@@ -0,0 +1,133 @@
+from od_lib.helper_functions.instrumentation import count
+from pathlib import Path
+import hashlib
+import json
+import mmap
+import os
+import struct
+
+# A text store packs the text parts (toc, session_content, appendix,
+# meta_data) of all sessions of an electoral term into a single file:
+#
+#   [part data ...][index json][index length: uint64][MAGIC]
+#
+# The index maps session -> part -> [offset, length, sha256]. As everything
+# lives in one file, a store is replaced atomically and readers never see a
+# blob that does not fit its index.
+
+EXTENSION = ".pack"
+MAGIC = b"ODTXTPK1"
+FOOTER = struct.Struct("<Q")
+
+
+def store_path(directory, name):
+    """Path of the text store of e.g. an electoral_term_XX folder."""
+    return Path(directory) / (str(name) + EXTENSION)
+
+
+def store_paths(directory):
+    """All text stores in a directory, sorted by name."""
+    directory = Path(directory)
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("*" + EXTENSION))
+
+
+class TextStoreWriter:
+    """Writes a text store. Sessions are appended with add(), the store is
+    only moved into place by close(). Use it as a context manager, on an
+    exception the old store is kept."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.temp_path = self.path.with_name(self.path.name + ".tmp")
+        self.file = open(self.temp_path, "wb")
+        self.offset = 0
+        self.index = {}
+
+    def add(self, session, parts):
+        """Appends the parts of a session, str is stored as UTF-8."""
+        entry = {}
+        for name, value in parts.items():
+            data = value.encode("utf-8") if isinstance(value, str) else bytes(value)
+            self.file.write(data)
+            count(output_bytes=len(data))
+            entry[name] = [self.offset, len(data), hashlib.sha256(data).hexdigest()]
+            self.offset += len(data)
+        self.index[str(session)] = entry
+
+    def close(self):
+        index = json.dumps(self.index, separators=(",", ":")).encode("utf-8")
+        self.file.write(index)
+        self.file.write(FOOTER.pack(len(index)))
+        self.file.write(MAGIC)
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def discard(self):
+        self.file.close()
+        self.temp_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class TextStore:
+    """Read access to a text store. The file is memory mapped, so the parts
+    are sliced out of the page cache, which is shared by all processes
+    reading the same store."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        tail = len(MAGIC) + FOOTER.size
+        if len(self.buffer) < tail or self.buffer[-len(MAGIC):] != MAGIC:
+            self.buffer.close()
+            raise ValueError(f"{self.path} is not a text store.")
+        (index_length,) = FOOTER.unpack(self.buffer[-tail:-len(MAGIC)])
+        index_begin = len(self.buffer) - tail - index_length
+        self.index = json.loads(self.buffer[index_begin:-tail])
+
+    def sessions(self):
+        return sorted(self.index)
+
+    def __contains__(self, session):
+        return str(session) in self.index
+
+    def parts(self, session):
+        return list(self.index[str(session)])
+
+    def view(self, session, part):
+        """Zero-copy memoryview of the raw bytes of a part."""
+        offset, length, _ = self.index[str(session)][part]
+        count(input_bytes=length)
+        return memoryview(self.buffer)[offset:offset + length]
+
+    def read(self, session, part):
+        """Returns a part decoded as str."""
+        return str(self.view(session, part), "utf-8")
+
+    def read_bytes(self, session, part):
+        return bytes(self.view(session, part))
+
+    def digest(self, session, part):
+        """sha256 of a part, e.g. for BuildManifest.key."""
+        return self.index[str(session)][part][2]
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
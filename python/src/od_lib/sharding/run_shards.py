@@ -0,0 +1,292 @@
+from od_lib.helper_functions.instrumentation import REPORT_ENV
+from od_lib.helper_functions.pipeline import Stage, run_stage, run_stages
+from od_lib.helper_functions.sharding import (
+    ELECTORAL_TERMS,
+    ELECTORAL_TERMS_19_20,
+    STATUS,
+    load_plan,
+    merge_shards,
+    plan_shards,
+    prepare_shard,
+    save_plan,
+    shard_dir,
+    shard_finished,
+    write_json,
+)
+import od_lib.definitions.path_definitions as path_definitions
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import os
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+
+# Runs the per-term stages of the electoral terms on several shards and merges
+# their outputs. Every shard works in its own data directory below a shared
+# directory, so the shards can run as local processes or on other hosts which
+# mount the shared directory (and the repository) at the same path.
+#
+#   run_shards.py plan SHARED --shards 4       split the terms into shards
+#   run_shards.py work SHARED --shard 0        run the stages of one shard
+#   run_shards.py merge SHARED                 merge and concat everything
+#   run_shards.py run SHARED --shards 4 --hosts node1 node2
+#
+# The reference tables (factions.pkl, politicians.csv) and the downloads have
+# to exist in the data directory before.
+
+OD_LIB = Path(__file__).resolve().parents[1]
+
+
+def shard_stages(terms, workers):
+    """The per-term stages needed for the given terms. The inputs and outputs
+    only order the stages, the scripts find their terms in the shard."""
+    pool = ["--workers", workers]
+    p = path_definitions
+    terms_1_to_18 = [term for term in terms if term not in ELECTORAL_TERMS_19_20]
+    stages = []
+    if any(term > 2 for term in terms_1_to_18):
+        stages.append(Stage(
+            "split_xml", OD_LIB / "01_preprocessing/03_split_xml.py",
+            inputs=[p.RAW_XML, p.RAW_ZIP], outputs=[p.RAW_TXT, p.SESSION_CATALOG], args=pool,
+        ))
+    if any(term <= 2 for term in terms_1_to_18):
+        stages.append(Stage(
+            "split_xml_electoral_term_1_and_2",
+            OD_LIB / "01_preprocessing/04_split_xml_electoral_term_1_and_2.py",
+            inputs=[p.RAW_XML, p.RAW_ZIP], outputs=[p.RAW_TXT, p.SESSION_CATALOG],
+        ))
+    if terms_1_to_18:
+        stages += [
+            Stage(
+                "extract_speeches", OD_LIB / "04_speech_content/01_extract_speeches.py",
+                inputs=[p.RAW_TXT], outputs=[p.SPEECH_CONTENT_STAGE_01], args=pool,
+            ),
+            Stage(
+                "clean_speeches", OD_LIB / "04_speech_content/02_clean_speeches.py",
+                inputs=[p.SPEECH_CONTENT_STAGE_01], outputs=[p.SPEECH_CONTENT_STAGE_02],
+                args=pool,
+            ),
+            Stage(
+                "match_names_speeches",
+                OD_LIB / "04_speech_content/03_match_names_speeches.py",
+                inputs=[p.SPEECH_CONTENT_STAGE_02], outputs=[p.SPEECH_CONTENT_STAGE_03],
+                args=pool,
+            ),
+            Stage(
+                "extract_contributions", OD_LIB / "06_contributions/01_extract_contributions.py",
+                inputs=[p.SPEECH_CONTENT_STAGE_03],
+                outputs=[p.SPEECH_CONTENT_STAGE_04, p.CONTRIBUTIONS_EXTENDED_STAGE_01],
+                args=pool,
+            ),
+        ]
+    if len(terms_1_to_18) < len(terms):
+        stages += [
+            Stage(
+                "extract_speeches_and_contributions_electoral_term_19_20",
+                OD_LIB / "05_electoral_term_19_20/"
+                "01_extract_speeches_and_contributions_electoral_term_19_20.py",
+                inputs=[p.ELECTORAL_TERM_19_20_STAGE_01],
+                outputs=[p.ELECTORAL_TERM_19_20_STAGE_03, p.CONTRIBUTIONS_EXTENDED_STAGE_01],
+            ),
+        ]
+    stages += [
+        Stage(
+            "clean_contributions_extended",
+            OD_LIB / "06_contributions/02_clean_contributions_extended.py",
+            inputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_01],
+            outputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_02],
+        ),
+        Stage(
+            "match_contributions_extended",
+            OD_LIB / "06_contributions/03_match_contributions_extended.py",
+            inputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_02],
+            outputs=[p.CONTRIBUTIONS_EXTENDED_STAGE_03],
+        ),
+    ]
+    return stages
+
+
+def plan(args):
+    shards = plan_shards(args.electoral_terms or ELECTORAL_TERMS, args.shards)
+    save_plan(args.shared_dir, shards)
+    for index, terms in enumerate(shards):
+        print(f"shard {index:02}: {' '.join(str(term) for term in terms)}")
+    return shards
+
+
+def work(args):
+    """Runs the stages of one shard and records the result in its status."""
+    terms = load_plan(args.shared_dir)[args.shard]
+    data_dir = prepare_shard(args.shared_dir, args.shard, terms)
+    env = dict(
+        os.environ,
+        OD_DATA_DIR=str(data_dir),
+        **{REPORT_ENV: str(shard_dir(args.shared_dir, args.shard) / "reports")},
+    )
+
+    def print_failure(stage, result):
+        if isinstance(result, Exception) or result.returncode != 0:
+            print(f"{stage.name} failed:\n{getattr(result, 'stderr', result)}", file=sys.stderr)
+
+    status = run_stages(
+        shard_stages(terms, args.workers), workers=1, env=env, on_finish=print_failure
+    )
+    success = all(state == "success" for state in status.values())
+    write_json(
+        shard_dir(args.shared_dir, args.shard) / STATUS,
+        {
+            "terms": terms,
+            "status": "done" if success else "failed",
+            "host": socket.gethostname(),
+            "stages": status,
+        },
+    )
+    return 0 if success else 1
+
+
+def merge(args):
+    shards = load_plan(args.shared_dir)
+    unfinished = [
+        index
+        for index, terms in enumerate(shards)
+        if not shard_finished(args.shared_dir, index, terms)
+    ]
+    if unfinished:
+        print(f"Shards not done: {' '.join(str(index) for index in unfinished)}", file=sys.stderr)
+        return 1
+
+    terms = merge_shards(args.shared_dir, shards)
+    print(f"Merged electoral terms {' '.join(str(term) for term in terms)}.")
+    if args.no_concat:
+        return 0
+
+    result = run_stage(
+        Stage("concat_everything", OD_LIB / "07_database/01_concat_everything.py")
+    )
+    if result.returncode != 0:
+        print(f"concat_everything failed:\n{result.stderr}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def worker_command(args, index, host):
+    command = [
+        sys.executable,
+        str(Path(__file__).resolve()),
+        "work",
+        str(args.shared_dir),
+        "--shard",
+        str(index),
+        "--workers",
+        str(args.workers),
+    ]
+    if host == "local":
+        return command
+    return shlex.split(args.remote_command.format(host=host)) + [shlex.join(command)]
+
+
+def run(args):
+    """Plans the shards, runs them on the hosts and merges them. Every host
+    runs one shard at a time and takes the next one when it is done."""
+    shards = plan(args)
+    pending = [
+        index
+        for index, terms in enumerate(shards)
+        if not (args.resume and shard_finished(args.shared_dir, index, terms))
+    ]
+    lock = threading.Lock()
+    failed = []
+
+    def host_loop(host):
+        while True:
+            with lock:
+                if not pending:
+                    return
+                index = pending.pop(0)
+            print(f"shard {index:02} on {host}")
+            result = subprocess.run(worker_command(args, index, host))
+            if result.returncode != 0:
+                with lock:
+                    failed.append(index)
+
+    hosts = args.hosts or ["local"] * args.parallel
+    with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
+        list(executor.map(host_loop, hosts))
+
+    if failed:
+        print(
+            f"Shards failed: {' '.join(str(index) for index in sorted(failed))}",
+            file=sys.stderr,
+        )
+        return 1
+    return merge(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the per-term stages sharded by electoral term and merge them."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, function, help):
+        command = commands.add_parser(name, help=help)
+        command.add_argument("shared_dir", type=Path, help="Directory shared by all shards.")
+        command.set_defaults(function=function)
+        return command
+
+    def add_planning(command):
+        command.add_argument(
+            "--electoral-terms", nargs="+", type=int, help="Electoral terms (default: all)."
+        )
+        command.add_argument("--shards", type=int, required=True, help="Number of shards.")
+
+    def add_workers(command):
+        command.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count(),
+            help="Worker processes of the pooled stages of a shard.",
+        )
+
+    add_planning(add_command("plan", plan, "Split the electoral terms into shards."))
+
+    command = add_command("work", work, "Run the stages of one shard.")
+    command.add_argument("--shard", type=int, required=True)
+    add_workers(command)
+
+    command = add_command("merge", merge, "Merge the shards into the data directory.")
+    command.add_argument("--no-concat", action="store_true", help="Skip concat_everything.")
+
+    command = add_command("run", run, "Plan, run all shards and merge them.")
+    add_planning(command)
+    add_workers(command)
+    command.add_argument("--no-concat", action="store_true", help="Skip concat_everything.")
+    command.add_argument(
+        "--hosts", nargs="+", help="Hosts running the shards (default: local processes)."
+    )
+    command.add_argument(
+        "--parallel", type=int, default=1, help="Shards running locally at the same time."
+    )
+    command.add_argument(
+        "--remote-command",
+        default="ssh {host}",
+        help="Command prefix starting a shard on a host, gets the worker command appended.",
+    )
+    command.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip shards which already finished with the same terms.",
+    )
+
+    args = parser.parse_args()
+    # The workers may run in another directory or on another host.
+    args.shared_dir = args.shared_dir.resolve()
+    result = args.function(args)
+    sys.exit(result if isinstance(result, int) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from od_lib.helper_functions import build_cache
+from od_lib.helper_functions.build_cache import BuildManifest, ProgressJournal
+import pytest
+
+
+@pytest.fixture
+def source_root(tmp_path, monkeypatch):
+    """A source tree with a stage which imports a helper, which imports
+    another one relatively."""
+    root = tmp_path / "src"
+    helpers = root / "od_lib" / "helper_functions"
+    helpers.mkdir(parents=True)
+    (root / "od_lib" / "__init__.py").write_text("")
+    (helpers / "__init__.py").write_text("")
+    (helpers / "speeches.py").write_text("from . import patterns\n")
+    (helpers / "patterns.py").write_text("PATTERN = 'a'\n")
+    (helpers / "unused.py").write_text("")
+    (root / "stage.py").write_text("from od_lib.helper_functions import speeches\nimport os\n")
+    monkeypatch.setattr(build_cache, "SOURCE_ROOT", root)
+    return root
+
+
+def test_code_files(source_root):
+    helpers = source_root / "od_lib" / "helper_functions"
+    assert build_cache.code_files([source_root / "stage.py"]) == sorted(
+        [source_root / "stage.py", helpers / "speeches.py", helpers / "patterns.py"]
+    )
+
+
+def test_manifest_outputs(tmp_path):
+    stage_dir = tmp_path / "stage"
+    input_path = tmp_path / "input.txt"
+    input_path.write_text("a")
+    output_path = stage_dir / "output.pkl"
+    stage_dir.mkdir()
+    output_path.write_text("")
+
+    manifest = BuildManifest(stage_dir)
+    key = manifest.key(input_path, 1)
+    assert not manifest.is_current(output_path, key)
+    manifest.update(output_path, key, rows=3)
+    assert manifest.is_current(output_path, key)
+    assert manifest.key(input_path, 2) != key
+
+    # Without save the journal still has the output.
+    manifest = BuildManifest(stage_dir)
+    assert manifest.is_current(output_path, key)
+    assert manifest.info(output_path)["rows"] == 3
+    manifest.save()
+    assert not manifest.journal.path.exists()
+
+    input_path.write_text("b")
+    manifest = BuildManifest(stage_dir)
+    assert manifest.is_current(output_path, key)
+    assert manifest.key(input_path, 1) != key
+
+
+def test_manifest_code_change(source_root, tmp_path):
+    code = [source_root / "stage.py"]
+    reference = tmp_path / "factions.pkl"
+    reference.write_text("a")
+    fingerprint = BuildManifest(tmp_path / "stage", code, [reference]).fingerprint
+    assert BuildManifest(tmp_path / "stage", code, [reference]).fingerprint == fingerprint
+
+    (source_root / "od_lib" / "helper_functions" / "unused.py").write_text("x = 1\n")
+    assert BuildManifest(tmp_path / "stage", code, [reference]).fingerprint == fingerprint
+
+    (source_root / "od_lib" / "helper_functions" / "patterns.py").write_text("PATTERN = 'b'\n")
+    changed = BuildManifest(tmp_path / "stage", code, [reference]).fingerprint
+    assert changed != fingerprint
+
+    reference.write_text("b")
+    assert BuildManifest(tmp_path / "stage", code, [reference]).fingerprint != changed
+
+
+def test_journal_sessions(tmp_path):
+    input_path = tmp_path / "01001.txt"
+    input_path.write_text("a")
+    journal = ProgressJournal(tmp_path / "out")
+    key = ProgressJournal.key(input_path)
+    assert not journal.is_done("01001", key)
+    journal.complete("01001", key, speeches=3)
+
+    journal = ProgressJournal(tmp_path / "out")
+    assert journal.is_done("01001", key)
+    assert journal.info("01001") == {"speeches": 3}
+
+    input_path.write_text("ab")
+    assert not journal.is_done("01001", ProgressJournal.key(input_path))
+
+    journal.finish()
+    assert not ProgressJournal(tmp_path / "out").is_done("01001", key)
+
+
+def test_journal_code_change(source_root, tmp_path):
+    code = [source_root / "stage.py"]
+    journal = ProgressJournal(tmp_path / "out", code)
+    journal.complete("01001")
+    assert ProgressJournal(tmp_path / "out", code).is_done("01001")
+
+    (source_root / "od_lib" / "helper_functions" / "patterns.py").write_text("PATTERN = 'b'\n")
+    assert not ProgressJournal(tmp_path / "out", code).is_done("01001")
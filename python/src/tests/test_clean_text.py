@@ -0,0 +1,89 @@
+from od_lib.helper_functions import clean_text
+import pytest
+import regex
+
+BRACKET_PATTERN = regex.compile(r"\(([^(\)]*(\(([^(\)]*)\))*[^(\)]*)\)")
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "(Beifall bei der SPD)",
+        "a (b) c (d)",
+        "(Zuruf (SPD)(CDU) Ja)",
+        "(a (b) c (d) e)",
+        "((a))",
+        "(a (b (c) d) e)",
+        "(a (b",
+        "a) b) (c",
+        "(" * 50 + "x" + ")" * 3,
+        ")(",
+        "",
+    ],
+)
+def test_bracket_spans_same_as_regex(text):
+    expected = [match.span() for match in BRACKET_PATTERN.finditer(text)]
+    assert clean_text.bracket_spans(text) == expected
+
+
+def test_bracket_spans_unbalanced_is_linear():
+    text = "(" * 100000 + "a)"
+    assert clean_text.bracket_spans(text) == [(99999, 100002)]
+
+
+def test_clean_joins_lines_in_brackets():
+    text = "Rede\n(Beifall bei der\nSPD und Zu-\nruf)\nweiter"
+    assert clean_text.clean(text) == "Rede\n(Beifall bei der SPD und Zuruf)\nweiter"
+
+
+def test_clean_keeps_hyphen_after_abg():
+    text = "(Abg. Müller-\nLüdenscheidt)"
+    assert clean_text.clean(text) == "(Abg. Müller- Lüdenscheidt)"
+
+
+def test_clean_unbalanced_brackets():
+    text = "(a\nb (c\nd) e\nf"
+    assert clean_text.clean(text) == "(a\nb (c d) e\nf"
+
+
+def test_trie_pattern():
+    names = [list("Ab"), list("Ac"), list("Ed")]
+    assert clean_text.trie_pattern(names) == "(?:A(?:b|c)|Ed)"
+
+
+def test_trie_pattern_prefix():
+    names = [list("Ab"), list("Abc")]
+    assert regex.match(clean_text.trie_pattern(names), "Abcd").group() == "Abc"
+    assert regex.match(clean_text.trie_pattern(names, shortest=True), "Abcd").group() == "Ab"
+
+
+def test_trie_pattern_long_name():
+    name = "a" * 1000
+    pattern = clean_text.trie_pattern([list(name), list("ab")])
+    assert regex.fullmatch(pattern, name)
+    assert regex.fullmatch(pattern, "ab")
+    assert not regex.fullmatch(pattern, name[:-1])
+
+
+def test_clean_name_headers():
+    names = ["Präsident Dr. Lammert", "Dr. Müller (Berlin)", "Vizepräsident Solms"]
+    text = "Rede\nPräsident Dr. Lammert\nweiter\nDr. Müller Berlin \nund\n12\nEnde"
+    assert clean_text.clean_name_headers(text, names) == "Rede\nweiter\nund\nEnde"
+
+
+def test_clean_name_headers_long_name():
+    name = "Dr. " + "x" * 1000
+    text = "Rede\n" + name + "\nweiter"
+    assert clean_text.clean_name_headers(text, [name, "Solms"]) == "Rede\nweiter"
+
+
+def test_remove_names():
+    names = ["Müller-Lüdenscheidt", "Müller", "Dr. (Berlin)"]
+    text = "Müller-Lüdenscheidt und Dr. (Berlin) sagen"
+    assert clean_text.remove_names(text, names) == "-Lüdenscheidt und  sagen"
+    assert clean_text.remove_names(text, []) == text
+
+
+def test_remove_names_long_name():
+    name = "x" * 1000
+    assert clean_text.remove_names("a" + name + "b" + name, [name, "b"]) == "a"
@@ -0,0 +1,107 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from od_lib.helper_functions.download import PART_SUFFIX, Downloader
+import pytest
+import threading
+
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves server.files ({path: (content, etag)}) with ETag, Last-Modified,
+    conditional and Range requests, and records the request headers."""
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        content, etag = self.server.files[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and self.headers.get("If-Range") in (etag, LAST_MODIFIED):
+            start = int(range_header[len("bytes="):].rstrip("-"))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(content) - 1}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(content) - start))
+        self.end_headers()
+        self.wfile.write(content[start:])
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.files = {}
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_address[1]}"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_new_and_skipped(server, tmp_path):
+    server.files["/a.xml"] = (b"<a/>", '"1"')
+    downloader = Downloader(tmp_path, workers=1)
+    assert downloader.fetch(server.url + "/a.xml", "a.xml") == "new"
+    assert (tmp_path / "a.xml").read_bytes() == b"<a/>"
+    downloader.save()
+
+    # The manifest of the earlier run is enough, nothing is requested.
+    downloader = Downloader(tmp_path, workers=1)
+    assert downloader.files["a.xml"]["etag"] == '"1"'
+    assert downloader.fetch(server.url + "/a.xml", "a.xml") == "skipped"
+    assert len(server.requests) == 1
+
+
+def test_revalidate(server, tmp_path):
+    server.files["/a.xml"] = (b"<a/>", '"1"')
+    downloader = Downloader(tmp_path, workers=1)
+    downloader.fetch(server.url + "/a.xml", "a.xml")
+
+    assert downloader.fetch(server.url + "/a.xml", "a.xml", revalidate=True) == "unchanged"
+    assert server.requests[-1]["If-None-Match"] == '"1"'
+    assert server.requests[-1]["If-Modified-Since"] == LAST_MODIFIED
+
+    server.files["/a.xml"] = (b"<b/>", '"2"')
+    assert downloader.fetch(server.url + "/a.xml", "a.xml", revalidate=True) == "updated"
+    assert (tmp_path / "a.xml").read_bytes() == b"<b/>"
+    assert downloader.files["a.xml"]["etag"] == '"2"'
+
+
+def test_resume(server, tmp_path):
+    content = bytes(range(256)) * 10
+    server.files["/a.xml"] = (content, '"1"')
+    downloader = Downloader(tmp_path, workers=1)
+    # A download which broke off after 1000 bytes.
+    (tmp_path / ("a.xml" + PART_SUFFIX)).write_bytes(content[:1000])
+    downloader.update(
+        "a.xml",
+        {"url": server.url + "/a.xml", "part": {"etag": '"1"', "last_modified": LAST_MODIFIED}},
+    )
+
+    assert downloader.fetch(server.url + "/a.xml", "a.xml") == "new"
+    assert server.requests[-1]["Range"] == "bytes=1000-"
+    assert server.requests[-1]["If-Range"] == '"1"'
+    assert (tmp_path / "a.xml").read_bytes() == content
+    assert not (tmp_path / ("a.xml" + PART_SUFFIX)).exists()
+    assert downloader.files["a.xml"]["size"] == len(content)
+
+
+def test_resume_changed_file(server, tmp_path):
+    server.files["/a.xml"] = (b"<new/>", '"2"')
+    downloader = Downloader(tmp_path, workers=1)
+    (tmp_path / ("a.xml" + PART_SUFFIX)).write_bytes(b"<ol")
+    downloader.update("a.xml", {"url": server.url + "/a.xml", "part": {"etag": '"1"'}})
+
+    # If-Range does not match, the server sends the whole new file.
+    assert downloader.fetch(server.url + "/a.xml", "a.xml") == "new"
+    assert (tmp_path / "a.xml").read_bytes() == b"<new/>"
@@ -0,0 +1,71 @@
+from od_lib.helper_functions import fuzzy_names
+from od_lib.helper_functions.fuzzy_names import FuzzyNames
+from od_lib.helper_functions.match_names import levenshtein_ratio
+import numpy as np
+import pytest
+
+LAST_NAMES = ["müller", "mueller", "möller", "schmidt", "schmitt", "meyer", "maier", "wagner"]
+NAMES = ["müler", "schmid", "meier", "wegner", "xyz", "müller"]
+
+
+def brute_force(name, threshold):
+    return [
+        position
+        for position, last_name in enumerate(LAST_NAMES)
+        if levenshtein_ratio(last_name, name) >= threshold
+    ]
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.5, 0.7, 0.8, 1.0])
+def test_matches_same_as_pairwise(threshold):
+    fuzzy = FuzzyNames(LAST_NAMES, levenshtein_ratio)
+    fuzzy.add(NAMES)
+    for name in NAMES:
+        assert fuzzy.matches(name, threshold) == brute_force(name, threshold)
+
+
+def test_names_not_added():
+    fuzzy = FuzzyNames(LAST_NAMES, levenshtein_ratio)
+    assert fuzzy.matches("schmid", 0.7) == brute_force("schmid", 0.7)
+    assert "schmid" in fuzzy.candidates
+    assert fuzzy.matches(float("nan"), 0.7) == []
+    fuzzy.add([None, float("nan")])
+    assert list(fuzzy.candidates) == ["schmid"]
+
+
+def test_score_matrix_without_rapidfuzz(monkeypatch):
+    expected = fuzzy_names.score_matrix(NAMES, LAST_NAMES, levenshtein_ratio)
+    monkeypatch.setattr(fuzzy_names, "process", None)
+    scores = fuzzy_names.score_matrix(NAMES, LAST_NAMES, levenshtein_ratio)
+    assert scores.shape == (len(NAMES), len(LAST_NAMES))
+    assert np.array_equal(scores, expected)
+    assert fuzzy_names.score_matrix([], LAST_NAMES, levenshtein_ratio).shape == (0, 8)
+
+
+@pytest.mark.parametrize("threshold", [0.3, 0.7])
+def test_scores_same_as_pairwise(threshold):
+    fuzzy = FuzzyNames(LAST_NAMES, levenshtein_ratio)
+    fuzzy.add(NAMES)
+    for name in NAMES:
+        positions, scores = fuzzy.scores(name, threshold)
+        assert positions == brute_force(name, threshold)
+        assert scores == [levenshtein_ratio(LAST_NAMES[p], name) for p in positions]
+
+
+def prefix_score(query, choice, **kwargs):
+    """Asymmetric: how much of the query the choice starts with."""
+    length = 0
+    while length < min(len(query), len(choice)) and query[length] == choice[length]:
+        length += 1
+    return length / len(query)
+
+
+@pytest.mark.parametrize("rapidfuzz", [True, False])
+def test_scorer_argument_order(rapidfuzz, monkeypatch):
+    if not rapidfuzz:
+        monkeypatch.setattr(fuzzy_names, "process", None)
+    fuzzy = FuzzyNames(["mü", "müllerin"], prefix_score)
+    fuzzy.add(["müller"])
+    assert fuzzy.scores("müller", 0.5) == ([1], [1.0])
+    # Below the cutoff every last name is scored one by one.
+    assert fuzzy.scores("müller", 0.3) == ([0, 1], [2 / 6, 1.0])
@@ -0,0 +1,69 @@
+from od_lib.helper_functions import match_names
+from od_lib.helper_functions.person_names import cologne_phonetics
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize(
+    "name, code",
+    [
+        ("Müller-Lüdenscheidt", "65752682"),
+        ("Wikipedia", "3412"),
+        ("Breschnew", "17863"),
+        ("Müller", "657"),
+        ("Mueller", "657"),
+        ("Strauß", "8278"),
+        ("Strauss", "8278"),
+        ("Xaver", "4837"),
+        ("", ""),
+        ("-", ""),
+    ],
+)
+def test_cologne_phonetics(name, code):
+    assert cologne_phonetics(name) == code
+
+
+@pytest.fixture
+def politicians():
+    return pd.DataFrame(
+        {
+            "ui": [1, 2, 3, 4],
+            "faction_id": [3, 1, 2, 2],
+            "first_name": [["petra"], ["kai"], ["hans"], ["jörg"]],
+            "last_name": ["werner", "wagner", "hofer", "heber"],
+            "constituency": ["", "", "", ""],
+            "gender": ["weiblich", "männlich", "männlich", "männlich"],
+        }
+    )
+
+
+def test_fuzzy_names_closest_in_block(politicians):
+    index = match_names.PoliticianIndex(politicians)
+    # "hofer" sounds alike and is closer than "heber".
+    assert match_names.get_fuzzy_names(index, "hoefer") == [2]
+
+
+def test_fuzzy_names_consonant_typo(politicians):
+    index = match_names.PoliticianIndex(politicians)
+    # "wegner" sounds like "wagner", but "werner" is just as close.
+    assert match_names.get_fuzzy_names(index, "wegner") == [0, 1]
+
+    contributions = pd.DataFrame(
+        {
+            "last_name": ["Wegner"],
+            "first_name": [[]],
+            "faction_id": [3],
+            "acad_title": [[]],
+            "constituency": [""],
+        }
+    )
+    matched, _ = match_names.insert_politician_id_into_contributions_extended(
+        contributions, politicians, None
+    )
+    assert matched["politician_id"].tolist() == [1]
+
+
+def test_phonetic_first_names(politicians):
+    index = match_names.PoliticianIndex(politicians)
+    assert index.first_name_codes[3] == frozenset({cologne_phonetics("joerg")})
+    assert match_names.first_name_codes(["j", "joerg", ""]) == {"074"}
@@ -0,0 +1,28 @@
+from od_lib.helper_functions.person_names import split_names
+import pandas as pd
+
+
+def test_split_names():
+    names = pd.Series(
+        ["Dr Hans Peter Müller", "Frau Merkel", "von und zu Guttenberg", "", None, "Dr"],
+        index=[10, 11, 12, 13, 14, 15],
+    )
+    split = split_names(names)
+    assert split.index.tolist() == [10, 11, 12, 13, 14, 15]
+    assert split["acad_title"].tolist() == [["Dr"], ["Frau"], ["von", "und", "zu"], [], [], ["Dr"]]
+    assert split["first_name"].tolist() == [["Hans", "Peter"], [], [], [], [], []]
+    assert split["last_name"].tolist() == ["Müller", "Merkel", "Guttenberg", "", "", ""]
+    assert split["words"].tolist() == [3, 1, 1, 0, 0, 0]
+
+
+def test_split_names_titles():
+    split = split_names(pd.Series(["Graf Lambsdorff", "Prof Schmidt"]), titles=["Prof"])
+    assert split["acad_title"].tolist() == [[], ["Prof"]]
+    assert split["first_name"].tolist() == [["Graf"], []]
+    assert split["last_name"].tolist() == ["Lambsdorff", "Schmidt"]
+
+
+def test_split_names_empty():
+    split = split_names(pd.Series([], dtype=object))
+    assert len(split) == 0
+    assert split.columns.tolist() == ["acad_title", "first_name", "last_name", "words"]
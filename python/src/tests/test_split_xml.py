@@ -0,0 +1,79 @@
+from od_lib.helper_functions.session_catalog import SessionCatalog, session_entry
+from od_lib.helper_functions.text_store import TextStore, TextStoreWriter, store_path
+from pathlib import Path
+import importlib
+import od_lib.definitions.path_definitions as path_definitions
+import pytest
+import sys
+
+split_stage = importlib.import_module("od_lib.01_preprocessing.03_split_xml")
+
+
+def split_parts(text):
+    return {
+        "toc": "",
+        "session_content": text,
+        "appendix": "",
+        "meta_data": {"date": "01.01.1970"},
+    }
+
+
+def fake_split_xml(xml_file_path, term_number):
+    if xml_file_path.stem == "05002":
+        raise ValueError("broken protocol")
+    return split_parts("neu")
+
+
+@pytest.fixture
+def previous_run(tmp_path, monkeypatch):
+    """The text stores and catalog of a run which split the terms 5 and 6."""
+    raw_txt = tmp_path / "txt"
+    catalog_path = tmp_path / "sessions.sqlite"
+    with SessionCatalog(catalog_path) as catalog:
+        for term_number, sessions in [(5, ["05001", "05002"]), (6, ["06001"])]:
+            with TextStoreWriter(store_path(raw_txt, f"electoral_term_{term_number:02}")) as writer:
+                for session in sessions:
+                    writer.add(session, {"session_content": "alter Text"})
+                    catalog.add(session_entry(session, term_number, split_parts("alter Text")))
+
+    monkeypatch.setattr(path_definitions, "SESSION_CATALOG", catalog_path)
+    monkeypatch.setattr(split_stage, "RAW_TXT", raw_txt)
+    monkeypatch.setattr(
+        split_stage,
+        "term_sources",
+        lambda: [(5, Path("electoral_term_05")), (6, Path("electoral_term_06"))],
+    )
+    monkeypatch.setattr(
+        split_stage,
+        "protocol_paths",
+        lambda source: [source / f"{source.stem[-2:]}00{number}.xml" for number in (1, 2)],
+    )
+    monkeypatch.setattr(split_stage, "split_xml", fake_split_xml)
+    monkeypatch.setattr(sys, "argv", ["03_split_xml.py", "--workers", "1"])
+    return raw_txt, catalog_path
+
+
+def test_failed_session_keeps_term(previous_run):
+    raw_txt, catalog_path = previous_run
+    with pytest.raises(SystemExit) as exit_info:
+        split_stage.main()
+    assert exit_info.value.code == 1
+
+    # The term with the failed session is kept as it was.
+    with TextStore(store_path(raw_txt, "electoral_term_05")) as store:
+        assert store.sessions() == ["05001", "05002"]
+        assert store.read("05002", "session_content") == "alter Text"
+        assert store.read("05001", "session_content") == "alter Text"
+    with TextStore(store_path(raw_txt, "electoral_term_06")) as store:
+        assert store.sessions() == ["06001", "06002"]
+        assert store.read("06001", "session_content") == "neu"
+
+    with SessionCatalog(catalog_path) as catalog:
+        sessions = catalog.query(["session", "text_size"])
+    assert sessions == [
+        {"session": 5001, "text_size": 10},
+        {"session": 5002, "text_size": 10},
+        {"session": 6001, "text_size": 3},
+        {"session": 6002, "text_size": 3},
+    ]
+    assert not list(raw_txt.glob("*.tmp"))
@@ -0,0 +1,44 @@
+from od_lib.helper_functions import stage_storage
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(params=["pickle", "parquet"])
+def stage(request, tmp_path):
+    """A stage with two sessions in each of the terms 1, 2 and 19."""
+    if request.param == "parquet" and stage_storage.pa is None:
+        pytest.skip("pyarrow is not installed")
+    storage = stage_storage.get_storage(request.param)
+    for term_number in (1, 2, 19):
+        folder = tmp_path / f"electoral_term_{term_number:02}"
+        folder.mkdir()
+        for number in (1, 2):
+            session = f"{term_number:02}{number:03}"
+            df = pd.DataFrame({"session": [int(session)], "speech": [f"Rede {session}"]})
+            storage.write(df, storage.path(folder, session))
+    return storage, tmp_path
+
+
+@pytest.mark.parametrize(
+    "filters, sessions",
+    [
+        ([("electoral_term", "==", 2)], [2001, 2002]),
+        ([("electoral_term", ">=", 2)], [2001, 2002, 19001, 19002]),
+        ([("electoral_term", "in", [1, 19])], [1001, 1002, 19001, 19002]),
+        ([("electoral_term", "not in", [1, 19])], [2001, 2002]),
+        ([("electoral_term", "<", 19), ("session", "!=", 1002)], [1001, 2001, 2002]),
+        ([("session", "in", [2002, 19001])], [2002, 19001]),
+    ],
+)
+def test_read_stage_filters(stage, filters, sessions):
+    storage, stage_dir = stage
+    df = storage.read_stage(stage_dir, filters=filters)
+    assert sorted(df["session"].tolist()) == sessions
+    assert (df["electoral_term"] == df["session"] // 1000).all()
+
+
+@pytest.mark.parametrize("column", ["electoral_term", "session"])
+def test_read_stage_unknown_operator(stage, column):
+    storage, stage_dir = stage
+    with pytest.raises(ValueError):
+        storage.read_stage(stage_dir, filters=[(column, "~", 1)])
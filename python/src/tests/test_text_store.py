@@ -0,0 +1,53 @@
+from od_lib.helper_functions.text_store import TextStore, TextStoreWriter, store_path, store_paths
+import hashlib
+import pytest
+
+
+def write_store(path, sessions):
+    with TextStoreWriter(path) as writer:
+        for session, parts in sessions.items():
+            writer.add(session, parts)
+
+
+def test_round_trip(tmp_path):
+    path = store_path(tmp_path, "electoral_term_01")
+    write_store(
+        path,
+        {
+            "01002": {"toc": "Inhalt", "session_content": "Rede über Größe", "meta": b"\x00\xff"},
+            "01001": {"toc": "", "session_content": "Erste Sitzung"},
+        },
+    )
+    assert store_paths(tmp_path) == [path]
+
+    with TextStore(path) as store:
+        assert store.sessions() == ["01001", "01002"]
+        assert "01002" in store and 1001 not in store
+        assert store.parts("01002") == ["toc", "session_content", "meta"]
+        assert store.read("01002", "session_content") == "Rede über Größe"
+        assert store.read("01001", "toc") == ""
+        assert store.read_bytes("01002", "meta") == b"\x00\xff"
+        assert store.digest("01001", "session_content") == hashlib.sha256(
+            "Erste Sitzung".encode("utf-8")
+        ).hexdigest()
+
+
+def test_failed_write_keeps_old_store(tmp_path):
+    path = store_path(tmp_path, "electoral_term_01")
+    write_store(path, {"01001": {"toc": "alt"}})
+
+    with pytest.raises(RuntimeError):
+        with TextStoreWriter(path) as writer:
+            writer.add("01001", {"toc": "neu"})
+            raise RuntimeError()
+
+    assert store_paths(tmp_path) == [path]
+    with TextStore(path) as store:
+        assert store.read("01001", "toc") == "alt"
+
+
+def test_not_a_store(tmp_path):
+    path = tmp_path / "electoral_term_01.pack"
+    path.write_bytes(b"no text store")
+    with pytest.raises(ValueError):
+        TextStore(path)